@@ -0,0 +1,203 @@
+"""同時チャットリクエストのスループットを、同期処理と非同期処理で比較するベンチマーク
+
+APIサーバーと同じく1つのイベントループでチャットエンドポイントを処理し、
+同時に届いたリクエスト数ごとにリクエスト/秒とp95レイテンシを計測する。
+同期版はイベントループ上でRAGService.chatを呼び出していた従来のエンドポイント、
+非同期版はRAGService.achatを待つ現在のエンドポイント。
+LLMは指定した時間だけ応答を待つ合成モデル、データベースは一時ディレクトリのSQLiteを使う。
+
+実行方法:
+    uv run python -m benchmarks.bench_chat_concurrency [--concurrency N ...] [--llm-latency-ms N]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import statistics
+import tempfile
+import time
+from typing import Any, List, Optional
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.api.chat import get_rag_service, router
+from src.config.settings import Settings
+from src.models.database import DatabaseManager
+from src.models.schemas import ChatRequest, ChatResponse
+from src.services.numpy_vector_store import NumpyVectorStore
+from src.services.rag_service import RAGService
+
+
+class SyntheticEmbeddings(Embeddings):
+    """テキストのハッシュ値から、互いに近い合成ベクトルを返す埋め込み"""
+
+    def __init__(self, dimension: int = 256):
+        self.base = np.random.default_rng(0).standard_normal(dimension)
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8])
+        noise = np.random.default_rng(seed).standard_normal(self.base.shape)
+        vector = self.base + 0.1 * noise
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class SlowChatModel(BaseChatModel):
+    """指定した時間だけ応答を待つ、上流のLLM APIを模したチャットモデル"""
+
+    latency: float
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-chat-model"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content="回答です。"))]
+        )
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def _create_rag_service(
+    directory: str, llm_latency: float, documents: int
+) -> RAGService:
+    """合成の埋め込み・LLMと一時ディレクトリのストアで動くRAGServiceを作成
+
+    APIサーバーと同じくRAGServiceのコンストラクタで組み立て、埋め込みモデル・LLM・
+    データベースだけを差し替える。ベクトルストアは仕様書の代わりに合成文書から作る。
+    """
+    settings = Settings(
+        openai_api_key="benchmark",
+        similarity_threshold=0.0,
+        coalesce_generations=False,
+        chroma_persist_directory=f"{directory}/vector_store",
+    )
+    embeddings = SyntheticEmbeddings()
+    db_manager = DatabaseManager(f"sqlite:///{directory}/conversations.db")
+    with (
+        patch("src.services.rag_service.EmbeddingService", return_value=embeddings),
+        patch(
+            "src.services.rag_service.ChatOpenAI",
+            return_value=SlowChatModel(latency=llm_latency),
+        ),
+        patch(
+            "src.services.rag_service.get_database_manager_singleton"
+        ) as mock_singleton,
+        patch("src.services.rag_service.RAGService._initialize_vector_store"),
+    ):
+        mock_singleton.return_value.get_database_manager.return_value = db_manager
+        service = RAGService(settings)
+
+    service.vector_store = NumpyVectorStore.from_texts(
+        [f"仕様{index}" for index in range(documents)],
+        embeddings,
+        metadatas=[{"section": f"セクション{index}"} for index in range(documents)],
+        persist_directory=settings.chroma_persist_directory,
+    )
+    return service
+
+
+def _create_app(rag_service: RAGService, blocking: bool) -> FastAPI:
+    app = FastAPI()
+    if blocking:
+        # 従来のエンドポイント：同期版の処理がイベントループを塞ぐ
+        @app.post("/api/v1/chat", response_model=ChatResponse)
+        async def chat(request: ChatRequest) -> ChatResponse:
+            return rag_service.chat(
+                question=request.question,
+                max_results=request.max_results,
+                session_id=request.session_id,
+            )
+
+    else:
+        app.include_router(router)
+        app.dependency_overrides[get_rag_service] = lambda: rag_service
+    return app
+
+
+async def _run(app: FastAPI, concurrency: int, rounds: int) -> tuple:
+    """concurrency件の同時リクエストをrounds回送り、(リクエスト/秒, p95, p50) を返す"""
+    transport = httpx.ASGITransport(app=app)
+    latencies: List[float] = []
+
+    async def request(client: httpx.AsyncClient, question: str) -> Any:
+        start = time.perf_counter()
+        response = await client.post("/api/v1/chat", json={"question": question})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        start = time.perf_counter()
+        for round_index in range(rounds):
+            await asyncio.gather(
+                *(
+                    request(client, f"質問{round_index}-{index}")
+                    for index in range(concurrency)
+                )
+            )
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+    return concurrency * rounds / elapsed, p95, statistics.median(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--documents", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"LLMの応答待ち: {args.llm_latency_ms:.0f} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        service = _create_rag_service(
+            directory, args.llm_latency_ms / 1000, args.documents
+        )
+        for concurrency in args.concurrency:
+            print(f"同時リクエスト数: {concurrency}")
+            for label, blocking in (("同期 (chat)", True), ("非同期 (achat)", False)):
+                throughput, p95, p50 = asyncio.run(
+                    _run(_create_app(service, blocking), concurrency, args.rounds)
+                )
+                print(
+                    f"  {label:16s}: {throughput:7.1f} リクエスト/秒, "
+                    f"p50={p50:7.1f} ms, p95={p95:7.1f} ms"
+                )
+        # 非同期版でスレッドプールの空き待ちが発生していないかを確認する
+        for name, stats in service.executors.stats().items():
+            print(
+                f"スレッドプール {name:9s}: スレッド数={stats['max_workers']}, "
+                f"平均待ち={stats['average_wait_ms']:.2f} ms, "
+                f"最大待ち={stats['max_wait_ms']:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""複数ファイルの仕様書コーパス読み込みを逐次処理とプロセスプールで比較するベンチマーク
+
+実行方法:
+    uv run python -m benchmarks.bench_corpus_loader [--files N] [--scale N] [--workers N]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from src.services.corpus_loader import CorpusLoader
+
+SPEC_FILE_PATH = "docs/spec/仕様書.md"
+
+
+def _build_corpus(files: int, scale: int, directory: str) -> int:
+    """仕様書をscale回連結したファイルをfiles個作成し、合計バイト数を返す"""
+    with open(SPEC_FILE_PATH, encoding="utf-8") as f:
+        content = f.read() * scale
+
+    for index in range(files):
+        system_directory = os.path.join(directory, f"system{index:02d}")
+        os.makedirs(system_directory)
+        with open(
+            os.path.join(system_directory, "spec.md"), "w", encoding="utf-8"
+        ) as f:
+            f.write(content)
+
+    return len(content.encode("utf-8")) * files
+
+
+def _measure(corpus_dir: str, workers: int, repeat: int) -> tuple:
+    """最良の所要時間（秒）と生成チャンク数を返す"""
+    best = float("inf")
+    chunks = 0
+    for _ in range(repeat):
+        # アセットの書き出しは初回のみ発生するため、毎回空の出力先を使う
+        asset_directory = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            documents = CorpusLoader(
+                corpus_dir, asset_directory=asset_directory, max_workers=workers
+            ).load_documents()
+            best = min(best, time.perf_counter() - start)
+            chunks = len(documents)
+        finally:
+            shutil.rmtree(asset_directory)
+    return best, chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--scale", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        total_bytes = _build_corpus(args.files, args.scale, corpus_dir)
+        print(f"コーパス: {args.files}ファイル, 合計{total_bytes / 1024 / 1024:.1f}MB")
+
+        serial_time, serial_chunks = _measure(corpus_dir, 1, args.repeat)
+        print(
+            f"  逐次処理      : {serial_time * 1000:8.1f} ms ({serial_chunks}チャンク)"
+        )
+
+        for workers in sorted({2, args.workers} - {1}):
+            parallel_time, parallel_chunks = _measure(corpus_dir, workers, args.repeat)
+            print(
+                f"  {workers:2d}プロセス    : {parallel_time * 1000:8.1f} ms "
+                f"({parallel_chunks}チャンク, x{serial_time / parallel_time:.2f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""DocumentLoaderのチャンク化性能を旧実装と比較するマイクロベンチマーク
+
+- チャンク化段階: 行追加ごとにチャンク全体を結合する旧実装 vs 差分で長さを追跡する実装
+- load_documents全体: 自前チャンク化 + RecursiveCharacterTextSplitter の2パス vs 1パス分割
+
+実行方法:
+    uv run python -m benchmarks.bench_document_loader [--repeat N] [--scale N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+
+from src.services.document_loader import DocumentLoader
+
+SPEC_FILE_PATH = "docs/spec/仕様書.md"
+
+
+class LegacyDocumentLoader(DocumentLoader):
+    """比較用: ファイル全体を読み込み、行追加のたびにチャンク全体を結合する旧実装"""
+
+    def load_documents(self):
+        return self.text_splitter.split_documents(self.load_chunks())
+
+    def load_chunks(self):
+        loader = TextLoader(self.file_path, encoding="utf-8")
+        documents = loader.load()
+        chunks = []
+        for document in documents:
+            # 比較条件を揃えるため、埋め込みアセットは両実装とも除去しておく
+            content = self.asset_extractor.replace(document.page_content)
+            chunks.extend(self._create_chunks_from_lines(content.split("\n")))
+        return self._convert_chunks_to_documents(chunks)
+
+    def _create_chunks_from_lines(self, lines: List[str]) -> List[dict]:
+        current_section = ""
+        current_subsection = ""
+        chunks = []
+        current_chunk = []
+
+        for line in lines:
+            section_info = self._detect_section_headers(line)
+            if section_info["is_main_section"]:
+                current_section = section_info["section"]
+                current_subsection = ""
+            elif section_info["is_subsection"]:
+                current_subsection = section_info["section"]
+
+            current_chunk.append(line)
+
+            if len("\n".join(current_chunk)) > self.chunk_size:
+                chunk_content = "\n".join(current_chunk[:-1])
+                if chunk_content.strip():
+                    chunks.append(
+                        self._create_chunk_dict(
+                            chunk_content, current_section, current_subsection
+                        )
+                    )
+                current_chunk = [line]
+
+        if current_chunk:
+            chunk_content = "\n".join(current_chunk)
+            if chunk_content.strip():
+                chunks.append(
+                    self._create_chunk_dict(
+                        chunk_content, current_section, current_subsection
+                    )
+                )
+
+        return chunks
+
+
+class StreamingDocumentLoader(DocumentLoader):
+    """計測用: 行ストリームからのチャンク化段階のみを実行"""
+
+    def load_chunks(self):
+        lines = map(self.asset_extractor.replace, self._iter_lines())
+        return list(self._iter_chunks(lines))
+
+
+class TwoPassDocumentLoader(DocumentLoader):
+    """比較用: 行単位のチャンク化後、RecursiveCharacterTextSplitterで再分割する2パス実装"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=["\n## ", "\n### ", "\n\n", "\n", " ", ""],
+            keep_separator=True,
+        )
+
+    def load_documents(self):
+        lines = map(self.asset_extractor.replace, self._iter_lines())
+        documents = self._convert_chunks_to_documents(self._iter_line_chunks(lines))
+        return self.text_splitter.split_documents(documents)
+
+    def _iter_line_chunks(self, lines):
+        current_section = ""
+        current_subsection = ""
+        current_chunk = []
+        current_length = 0
+
+        for line in lines:
+            section_info = self._detect_section_headers(line)
+            if section_info["is_main_section"]:
+                current_section = section_info["section"]
+                current_subsection = ""
+            elif section_info["is_subsection"]:
+                current_subsection = section_info["section"]
+
+            if current_chunk:
+                current_length += 1
+            current_chunk.append(line)
+            current_length += len(line)
+
+            if current_length > self.chunk_size:
+                chunk_content = "\n".join(current_chunk[:-1])
+                if chunk_content.strip():
+                    yield self._create_chunk_dict(
+                        chunk_content, current_section, current_subsection
+                    )
+                current_chunk = [line]
+                current_length = len(line)
+
+        chunk_content = "\n".join(current_chunk)
+        if chunk_content.strip():
+            yield self._create_chunk_dict(
+                chunk_content, current_section, current_subsection
+            )
+
+
+def _measure(func: Callable[[], list], repeat: int) -> dict:
+    """実行時間（最良値）とピークメモリを計測"""
+    best = float("inf")
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": best, "peak_bytes": peak, "count": len(result)}
+
+
+def _build_scaled_spec(scale: int, directory: str) -> str:
+    """仕様書を指定倍数だけ連結した大きな入力ファイルを作成"""
+    with open(SPEC_FILE_PATH, encoding="utf-8") as f:
+        content = f.read()
+
+    path = os.path.join(directory, f"spec_x{scale}.md")
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(scale):
+            f.write(content)
+            f.write("\n")
+    return path
+
+
+def _build_long_paragraph_spec(scale: int, directory: str) -> str:
+    """改行の少ない長い段落（1段落数千文字）で構成された入力ファイルを作成"""
+    sentence = "プレイヤーは属性相性とチェインを考慮して編成を組み、レイドボスに挑む。"
+    path = os.path.join(directory, f"long_paragraphs_x{scale}.md")
+    with open(path, "w", encoding="utf-8") as f:
+        for section in range(scale * 10):
+            f.write(f"## **{section + 1}. セクション**\n\n")
+            for _ in range(5):
+                f.write(sentence * 100 + "\n\n")
+    return path
+
+
+def _report(label: str, file_path: str, chunk_size: int, repeat: int) -> None:
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    print(f"\n## {label} ({size_mb:.2f} MB, chunk_size={chunk_size})")
+
+    for name, loader_cls in (
+        ("legacy", LegacyDocumentLoader),
+        ("streaming", StreamingDocumentLoader),
+    ):
+        loader = loader_cls(file_path, chunk_size=chunk_size, chunk_overlap=200)
+        stats = _measure(loader.load_chunks, repeat)
+        print(
+            f"{name:>10}: {stats['seconds'] * 1000:9.1f} ms"
+            f"  ({stats['seconds'] / size_mb * 1000:8.1f} ms/MB)"
+            f"  peak={stats['peak_bytes'] / (1024 * 1024):7.2f} MB"
+            f"  chunks={stats['count']}"
+        )
+
+
+def _report_pipeline(label: str, file_path: str, chunk_size: int, repeat: int) -> None:
+    """load_documents全体の所要時間とピークメモリを2パス/1パスで比較"""
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    print(
+        f"\n## load_documents 全体: {label} ({size_mb:.2f} MB, chunk_size={chunk_size})"
+    )
+
+    results = {}
+    for name, loader_cls in (
+        ("two-pass", TwoPassDocumentLoader),
+        ("single-pass", DocumentLoader),
+    ):
+        loader = loader_cls(file_path, chunk_size=chunk_size, chunk_overlap=200)
+        stats = _measure(loader.load_documents, repeat)
+        results[name] = stats
+        print(
+            f"{name:>11}: {stats['seconds'] * 1000:9.1f} ms"
+            f"  ({stats['seconds'] / size_mb * 1000:8.1f} ms/MB)"
+            f"  peak={stats['peak_bytes'] / (1024 * 1024):7.2f} MB"
+            f"  ({stats['peak_bytes'] / size_mb / (1024 * 1024):5.2f} MB/MB)"
+            f"  chunks={stats['count']}"
+        )
+
+    # 1未満なら1パスの方が速い／省メモリ
+    two_pass, single_pass = results["two-pass"], results["single-pass"]
+    print(
+        f"{'ratio':>11}: time x{single_pass['seconds'] / two_pass['seconds']:.2f}"
+        f"  peak x{single_pass['peak_bytes'] / two_pass['peak_bytes']:.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    _report("仕様書", SPEC_FILE_PATH, args.chunk_size, args.repeat)
+
+    _report_pipeline("仕様書", SPEC_FILE_PATH, args.chunk_size, args.repeat)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scaled_path = _build_scaled_spec(args.scale, temp_dir)
+        _report(f"仕様書 x{args.scale}", scaled_path, args.chunk_size, args.repeat)
+        # 1チャンクあたりの行数が多いほど旧実装の二乗オーダーが顕在化する
+        _report(
+            f"仕様書 x{args.scale}",
+            scaled_path,
+            args.chunk_size * 8,
+            args.repeat,
+        )
+        _report_pipeline(
+            f"仕様書 x{args.scale}", scaled_path, args.chunk_size, args.repeat
+        )
+
+        # 長い行はRecursiveCharacterTextSplitterによる再分割の負荷が大きい
+        long_paragraph_path = _build_long_paragraph_spec(args.scale, temp_dir)
+        _report_pipeline("長い段落", long_paragraph_path, args.chunk_size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""埋め込みバックエンドごとのクエリ埋め込みレイテンシをCPUで比較するベンチマーク
+
+- torch: sentence-transformers（PyTorch）
+- onnx: ONNX Runtime（fp32）
+- onnx-int8: ONNX Runtime（int8動的量子化）
+
+初回はONNXへの変換が行われるため、torchとtransformersが必要。
+
+実行方法:
+    uv run python -m benchmarks.bench_embedding_backends [--iterations N]
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.services.embeddings import EmbeddingService
+
+QUERIES = [
+    "バトルシステムについて教えて",
+    "キャラクターのHP上限はいくつ？",
+    "火属性の敵に有効な属性は何ですか",
+    "ギルドに加入する条件と特典を詳しく説明してください",
+]
+
+BACKENDS = [
+    ("torch", {"backend": "torch"}),
+    ("onnx", {"backend": "onnx", "onnx_quantize": False}),
+    ("onnx-int8", {"backend": "onnx", "onnx_quantize": True}),
+]
+
+
+def _latencies(service: EmbeddingService, iterations: int) -> List[float]:
+    """クエリキャッシュを通さずにモデルのレイテンシ（ミリ秒）を計測"""
+    model = service.embeddings
+    model.embed_query(QUERIES[0])  # ウォームアップ
+
+    latencies = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        model.embed_query(QUERIES[index % len(QUERIES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    reference = None
+
+    for label, options in BACKENDS:
+        service = EmbeddingService(
+            settings.embedding_model_name,
+            onnx_model_directory=settings.onnx_model_directory,
+            **options,
+        )
+        latencies = sorted(_latencies(service, args.iterations))
+        vectors = np.array(service.embeddings.embed_documents(QUERIES))
+
+        if reference is None:
+            reference = vectors
+        parity = (reference * vectors).sum(axis=1).min()
+
+        print(
+            f"{label:10s}: p50={statistics.median(latencies):7.1f} ms, "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1]:7.1f} ms, "
+            f"torch版との最小コサイン類似度={parity:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""文書埋め込みのスループット（チャンク/秒）をCPUで計測するベンチマーク
+
+- 元の順序のままバッチに分割して埋め込む方式
+- トークン長でソートしてからバッチに分割する方式（EmbeddingService）
+
+埋め込みモデルのダウンロードとsentence-transformersが必要。
+
+実行方法:
+    uv run python -m benchmarks.bench_embeddings [--batch-size N] [--repeat N]
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+from src.config.settings import get_settings
+from src.services.corpus_loader import CorpusLoader
+from src.services.embeddings import EmbeddingService
+
+
+def _load_texts(repeat: int) -> List[str]:
+    """現在の仕様書のチャンクをrepeat回繰り返したテキスト列を返す"""
+    settings = get_settings()
+    documents = CorpusLoader(
+        settings.spec_file_path, settings.chunk_size, settings.chunk_overlap
+    ).load_documents()
+    return [document.page_content for document in documents] * repeat
+
+
+def _embed_in_original_order(
+    service: EmbeddingService, texts: List[str]
+) -> List[List[float]]:
+    """比較用: 元の順序のままバッチに分割して埋め込む"""
+    vectors = []
+    for start in range(0, len(texts), service.batch_size):
+        vectors.extend(
+            service.embeddings.embed_documents(
+                texts[start : start + service.batch_size]
+            )
+        )
+    return vectors
+
+
+def _throughput(func: Callable[[List[str]], list], texts: List[str]) -> float:
+    start = time.perf_counter()
+    func(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=4)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    # 永続キャッシュを使うと2回目以降はモデルを通らないため無効にする
+    service = EmbeddingService(
+        settings.embedding_model_name, batch_size=args.batch_size
+    )
+    texts = _load_texts(args.repeat)
+
+    # モデルの読み込みとウォームアップ
+    service.embeddings.embed_documents(texts[: args.batch_size])
+    service._get_token_length()
+
+    print(f"{len(texts)}チャンク, バッチサイズ{args.batch_size}")
+    unsorted = _throughput(lambda t: _embed_in_original_order(service, t), texts)
+    print(f"  元の順序       : {unsorted:8.1f} チャンク/秒")
+    sorted_ = _throughput(service.embed_documents, texts)
+    print(f"  トークン長ソート: {sorted_:8.1f} チャンク/秒 (x{sorted_ / unsorted:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""PCAによる埋め込みの次元削減で、メモリ・検索レイテンシ・recall@kがどう変わるかを計測するベンチマーク
+
+既定では1024次元の埋め込みを模した合成データ（低ランク構造 + ノイズ + 共通の偏り）を使う。
+--real を指定すると設定されたChromaのインデックスに格納済みのベクトルで計測する
+（クエリには格納済みのベクトルを使い、自身は正解から除く）。
+
+実行方法:
+    uv run python -m benchmarks.bench_projection [--dimensions 384 256] [--real]
+"""
+
+import argparse
+import statistics
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from src.services.projection import PCAProjection
+from src.services.quantized_index import normalize_rows
+
+
+def _synthetic_vectors(
+    count: int, dimension: int = 1024, rank: int = 128
+) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    latent = rng.standard_normal((count, rank)) * np.linspace(3.0, 0.3, rank)
+    mixing = rng.standard_normal((rank, dimension)) / np.sqrt(rank)
+    vectors = latent @ mixing + 0.1 * rng.standard_normal((count, dimension))
+    return normalize_rows(vectors + 0.5)
+
+
+def _stored_vectors() -> np.ndarray:
+    from langchain_chroma import Chroma
+
+    from src.config.settings import get_settings
+
+    settings = get_settings()
+    store = Chroma(persist_directory=settings.chroma_persist_directory)
+    return np.asarray(store.get(include=["embeddings"])["embeddings"], np.float32)
+
+
+def _search(
+    matrix: np.ndarray, queries: np.ndarray, query_ids: np.ndarray, k: int
+) -> Tuple[List[set], List[float]]:
+    """総当たりで上位k件を求め、(各クエリの結果, 1クエリあたりのレイテンシ[ms]) を返す"""
+    results, latencies = [], []
+    for query, query_id in zip(queries, query_ids):
+        start = time.perf_counter()
+        scores = matrix @ query
+        scores[query_id] = -np.inf  # クエリ自身は除く
+        top = np.argpartition(-scores, k)[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(top.tolist()))
+    return results, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[384, 256])
+    parser.add_argument("--real", action="store_true")
+    args = parser.parse_args()
+
+    vectors = _stored_vectors() if args.real else _synthetic_vectors(args.documents)
+    rng = np.random.default_rng(1)
+    query_ids = rng.choice(len(vectors), min(args.queries, len(vectors)), False)
+
+    full = normalize_rows(vectors)
+    expected, latencies = _search(full, full[query_ids], query_ids, args.k)
+    print(f"文書数: {len(vectors)}, クエリ数: {len(query_ids)}, k={args.k}")
+    print(
+        f"  {full.shape[1]:4d}次元: メモリ={full.nbytes / 1024 / 1024:7.2f} MB, "
+        f"p50={statistics.median(latencies):6.3f} ms, recall@{args.k}=1.000"
+    )
+
+    for dimension in args.dimensions:
+        projection = PCAProjection.fit(vectors, dimension)
+        reduced = projection.transform(vectors)
+        actual, latencies = _search(reduced, reduced[query_ids], query_ids, args.k)
+        recall = statistics.mean(len(e & a) / args.k for e, a in zip(expected, actual))
+        print(
+            f"  {dimension:4d}次元: メモリ={reduced.nbytes / 1024 / 1024:7.2f} MB, "
+            f"p50={statistics.median(latencies):6.3f} ms, recall@{args.k}={recall:.3f}, "
+            f"寄与率={projection.explained_variance_ratio:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
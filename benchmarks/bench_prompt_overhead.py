@@ -0,0 +1,86 @@
+"""回答生成のプロンプト・LLMチェーンの準備にかかるリクエストあたりの時間を計測するベンチマーク
+
+LLMの呼び出しを除き、プロンプトテンプレートの取得からメッセージの整形までを比較する。
+従来はリクエストごとにPromptTemplates・ChatPromptTemplate・LLMChainを作り直し、
+回答キャッシュのキーのためにテンプレートのハッシュ値を計算していた。
+PromptRegistryでは設定ごとに1回だけ組み立てたものを使い回す。
+
+実行方法:
+    uv run python -m benchmarks.bench_prompt_overhead [--requests N]
+"""
+
+import argparse
+import time
+from typing import Callable
+
+from langchain.chains import LLMChain
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.config.prompts import get_default_prompt_templates
+from src.config.settings import Settings
+from src.services.answer_cache import prompt_template_hash
+from src.services.prompt_registry import HISTORY_PROMPT_SUFFIX, PromptRegistry
+
+CONTEXT = "【ガチャ】\nピックアップ召喚は100回で天井交換が可能です。" * 10
+HISTORY = "USER: ガチャの天井は？\nASSISTANT: 100回です。"
+
+
+def _per_request_us(prepare: Callable[[], object], requests: int) -> float:
+    """prepareをrequests回実行し、1回あたりのマイクロ秒を返す"""
+    prepare()
+    start = time.perf_counter()
+    for _ in range(requests):
+        prepare()
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    settings = Settings(openai_api_key="benchmark")
+    llm = FakeListChatModel(responses=["回答"])
+    registry = PromptRegistry()
+
+    def rebuild(with_history: bool) -> None:
+        # 従来の処理：リクエストごとにテンプレート・プロンプト・チェーンを作成する
+        templates = get_default_prompt_templates()
+        prompt_template_hash(templates)
+        system_prompt = templates.system_prompt
+        if with_history:
+            system_prompt += HISTORY_PROMPT_SUFFIX
+        prompt = ChatPromptTemplate.from_messages(
+            [("system", system_prompt), ("human", templates.human_prompt)]
+        )
+        LLMChain(llm=llm, prompt=prompt)
+        prompt.format_messages(context=CONTEXT, question="質問", history=HISTORY)
+
+    def reuse(with_history: bool) -> None:
+        templates = settings.prompt_templates
+        registry.template_hash(templates)
+        compiled = registry.get(
+            templates,
+            llm,
+            settings.openai_model,
+            settings.openai_temperature,
+            with_history=with_history,
+        )
+        assert compiled.chain is not None
+        compiled.prompt.format_messages(
+            context=CONTEXT, question="質問", history=HISTORY
+        )
+
+    print(f"リクエスト数: {args.requests}")
+    for label, with_history in (("会話履歴なし", False), ("会話履歴あり", True)):
+        before = _per_request_us(lambda h=with_history: rebuild(h), args.requests)
+        after = _per_request_us(lambda h=with_history: reuse(h), args.requests)
+        print(
+            f"  {label}: 毎回作成={before:8.1f} us, 使い回し={after:8.1f} us "
+            f"(x{before / after:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
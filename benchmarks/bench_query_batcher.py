@@ -0,0 +1,91 @@
+"""同時クエリのマイクロバッチ化によるスループットの変化を計測するベンチマーク
+
+既定ではnumpyの行列積で埋め込みモデルの計算を模した合成モデルを使う。
+--real を指定すると設定された実際の埋め込みモデルで計測する。
+
+実行方法:
+    uv run python -m benchmarks.bench_query_batcher [--concurrency N] [--real]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from src.services.query_batcher import QueryBatcher
+
+
+class SyntheticEncoder:
+    """トークンごとに全結合層を通す、埋め込みモデルを模した計算"""
+
+    def __init__(self, dimension: int = 1024, layers: int = 4, tokens: int = 32):
+        rng = np.random.default_rng(0)
+        self.weights = [
+            rng.standard_normal((dimension, dimension)).astype(np.float32)
+            for _ in range(layers)
+        ]
+        self.tokens = tokens
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        hidden = np.ones(
+            (len(texts) * self.tokens, self.weights[0].shape[0]), np.float32
+        )
+        for weight in self.weights:
+            hidden = np.tanh(hidden @ weight)
+        pooled = hidden.reshape(len(texts), self.tokens, -1).mean(axis=1)
+        return pooled.tolist()
+
+
+async def _run(
+    encode: Callable[[List[str]], List[List[float]]],
+    max_batch_size: int,
+    max_wait_ms: float,
+    concurrency: int,
+    rounds: int,
+) -> float:
+    """concurrency件の同時クエリをrounds回発行し、クエリ/秒を返す"""
+    batcher = QueryBatcher(encode, max_batch_size, max_wait_ms)
+    start = time.perf_counter()
+    for round_index in range(rounds):
+        await asyncio.gather(
+            *(
+                batcher.submit(f"質問{round_index}-{index}")
+                for index in range(concurrency)
+            )
+        )
+    return concurrency * rounds / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--real", action="store_true")
+    args = parser.parse_args()
+
+    if args.real:
+        from src.config.settings import get_settings
+        from src.services.embeddings import EmbeddingService
+
+        settings = get_settings()
+        encode = EmbeddingService(settings.embedding_model_name)._encode_queries
+    else:
+        encode = SyntheticEncoder()
+    encode(["ウォームアップ"])
+
+    print(f"同時クエリ数: {args.concurrency}")
+    baseline = asyncio.run(
+        _run(encode, 1, args.max_wait_ms, args.concurrency, args.rounds)
+    )
+    print(f"  バッチなし      : {baseline:8.1f} クエリ/秒")
+    batched = asyncio.run(
+        _run(encode, args.concurrency, args.max_wait_ms, args.concurrency, args.rounds)
+    )
+    print(f"  マイクロバッチ  : {batched:8.1f} クエリ/秒 (x{batched / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""ChromaとNumpyVectorStoreの起動時間・検索レイテンシ・メモリを比較するベンチマーク
+
+1024次元の正規化済み合成ベクトルを両方のストアに格納し、保存先から読み込み直して
+最初の検索が返るまでの時間と、検索1回あたりのレイテンシを計測する。
+
+実行方法:
+    uv run python -m benchmarks.bench_vector_store [--documents N] [--queries N]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.services.numpy_vector_store import NumpyVectorStore
+from src.services.quantized_index import normalize_rows
+
+
+class LookupEmbeddings(Embeddings):
+    """テキスト（連番）に対応する合成ベクトルを返す埋め込み"""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[int(text)].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[int(text)].tolist()
+
+
+def _measure(
+    label: str, open_store: Callable[[], object], queries: np.ndarray, k: int
+) -> None:
+    start = time.perf_counter()
+    store = open_store()
+    store.similarity_search_by_vector_with_relevance_scores(queries[0].tolist(), k=k)
+    startup = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for query in queries:
+        vector = query.tolist()
+        start = time.perf_counter()
+        store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    print(
+        f"  {label:18s}: 起動+初回検索={startup:8.1f} ms, "
+        f"p50={statistics.median(latencies):6.2f} ms, "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1]:6.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.standard_normal((args.documents, args.dimension)))
+    queries = normalize_rows(rng.standard_normal((args.queries, args.dimension)))
+    embeddings = LookupEmbeddings(vectors)
+    texts = [str(index) for index in range(args.documents)]
+    ids = [f"chunk-{index}" for index in range(args.documents)]
+
+    print(f"文書数: {args.documents}, 次元数: {args.dimension}, k={args.k}")
+    with tempfile.TemporaryDirectory() as directory:
+        Chroma.from_texts(
+            texts, embeddings, ids=ids, persist_directory=f"{directory}/chroma"
+        )
+        for dtype in ("float32", "float16"):
+            NumpyVectorStore.from_texts(
+                texts,
+                embeddings,
+                ids=ids,
+                persist_directory=f"{directory}/{dtype}",
+                dtype=dtype,
+            )
+
+        _measure(
+            "chroma",
+            lambda: Chroma(
+                persist_directory=f"{directory}/chroma", embedding_function=embeddings
+            ),
+            queries,
+            args.k,
+        )
+        for dtype in ("float32", "float16"):
+            _measure(
+                f"numpy ({dtype})",
+                lambda dtype=dtype: NumpyVectorStore(
+                    f"{directory}/{dtype}", embeddings, dtype=dtype
+                ),
+                queries,
+                args.k,
+            )
+            size = np.dtype(dtype).itemsize * vectors.size / 1024 / 1024
+            print(f"  {'':18s}  行列サイズ={size:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import Annotated
+from fastapi.responses import StreamingResponse
+from typing import Annotated, AsyncIterator, Tuple
+import json
 import logging
 
-from src.models.schemas import ChatRequest, ChatResponse, HealthResponse
+from src.models.schemas import (
+    ChatRequest,
+    ChatResponse,
+    HealthResponse,
+    MetricsResponse,
+)
 from src.services.rag_service import RAGService
 from src.config.settings import Settings, get_settings
 
@@ -63,7 +70,7 @@ async def chat(
         logger.info(
             f"チャットリクエストを受信: {request.question[:50]}... (session_id: {request.session_id})"
         )
-        response = rag_service.chat(
+        response = await rag_service.achat(
             question=request.question,
             max_results=request.max_results,
             session_id=request.session_id,
@@ -77,6 +84,49 @@ async def chat(
         raise HTTPException(status_code=500, detail="内部サーバーエラーが発生しました")
 
 
+async def _server_sent_events(
+    events: AsyncIterator[Tuple[str, dict]],
+) -> AsyncIterator[str]:
+    """(イベント名, データ) の組をServer-Sent Eventsの形式に変換"""
+    try:
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        # レスポンスの送信開始後はステータスコードを変えられないため、エラーイベントで通知する
+        logger.error(f"ストリーミングチャット処理中にエラーが発生しました: {e}")
+        detail = json.dumps(
+            {"detail": "内部サーバーエラーが発生しました"}, ensure_ascii=False
+        )
+        yield f"event: error\ndata: {detail}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest, rag_service: Annotated[RAGService, Depends(get_rag_service)]
+) -> StreamingResponse:
+    """
+    /chat と同じ処理の結果を、生成中のトークンから順にServer-Sent Eventsで返します。
+
+    - **sources**: 検索された関連情報（回答の生成前に送信）
+    - **token**: 回答のトークン（生成された順に送信）
+    - **done**: 信頼度とセッションID（最後に送信）
+    - **error**: 処理中にエラーが発生した場合に送信
+    """
+    logger.info(
+        f"ストリーミングチャットリクエストを受信: {request.question[:50]}... (session_id: {request.session_id})"
+    )
+    events = rag_service.astream_chat(
+        question=request.question,
+        max_results=request.max_results,
+        session_id=request.session_id,
+    )
+    return StreamingResponse(
+        _server_sent_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check(
     settings: Annotated[Settings, Depends(get_settings)],
@@ -90,3 +140,13 @@ async def health_check(
         version=settings.version,
         vector_store_ready=rag_service.is_ready(),
     )
+
+
+@router.get("/metrics", response_model=MetricsResponse)
+async def metrics(
+    rag_service: Annotated[RAGService, Depends(get_rag_service)],
+) -> MetricsResponse:
+    """
+    キャッシュのヒット率などの稼働状況を返します。
+    """
+    return MetricsResponse(**rag_service.get_metrics())
@@ -1,3 +1,4 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -16,17 +17,91 @@ class Settings(BaseSettings):
     openai_temperature: float = 0.3
 
     # ベクトルストア設定
+    # ベクトルストアの保存先（numpyバックエンドや量子化インデックスもここに保存する）
     chroma_persist_directory: str = "data/chroma"
+    # ベクトルストアの実装（"chroma" または "numpy"：正規化済みベクトルの行列を全件走査）
+    vector_store_backend: str = "chroma"
+    # numpyバックエンドの格納精度（"float32" または "float16"）と、メモリマップでの読み込み
+    # （float16はメモリが半分になるが、検索のたびにfloat32へ変換するため走査は遅くなる）
+    numpy_vector_dtype: str = "float32"
+    numpy_vector_mmap: bool = True
     embedding_model_name: str = "intfloat/multilingual-e5-large"
+    # 埋め込みの推論バックエンド（"torch" または "onnx"）
+    embedding_backend: str = "torch"
+    # ONNX変換済みモデルの保存先と、int8動的量子化の有無（onnxバックエンドのみ）
+    onnx_model_directory: str = "data/onnx"
+    onnx_quantize: bool = True
+    # 埋め込みベクトルの永続キャッシュ（空文字列で無効化）
+    embedding_cache_path: Optional[str] = "data/embedding_cache.sqlite3"
+    # クエリ埋め込みのメモリ内LRUキャッシュ（件数0で無効化、有効期限は秒）
+    query_cache_size: int = 1024
+    query_cache_ttl_seconds: Optional[float] = 3600.0
+    # 文書埋め込み時のバッチサイズ（トークン長の近いテキスト同士でまとめる）
+    embedding_batch_size: int = 32
+    # 非同期クエリ埋め込みのマイクロバッチ（最大件数と最大待ち時間）
+    query_batch_max_size: int = 16
+    query_batch_max_wait_ms: float = 5.0
+    # 指定時は埋め込みモデルを読み込まず、このUnixソケットの埋め込みサーバーを利用する
+    # （サーバーは python -m src.services.embedding_server で起動）
+    embedding_server_socket: Optional[str] = None
+    # 指定時は最後の利用からこの秒数が経過した埋め込みモデルを解放し、次のクエリで再読み込みする
+    # （0以下は未指定と同じく解放しない）
+    embedding_idle_unload_seconds: Optional[float] = None
+    # 指定時は量子化したベクトル（"int8" または "binary"）で候補を絞り込み、
+    # 上位k×rescore_multiplier件を元のベクトルで再スコアリングする
+    vector_quantization: Optional[str] = None
+    quantization_rescore_multiplier: int = 4
+    # 指定時はインデックス構築時に学習したPCAで埋め込みをこの次元数（256、384など）に削減する
+    embedding_projection_dimension: Optional[int] = None
+    # 有効時はキャラクター名・アイテム名などの完全一致を拾うため、文字2/3-gramのBM25検索の
+    # 上位hybrid_candidates件とベクトル検索の上位件をReciprocal Rank Fusion（定数k）で統合する
+    hybrid_search: bool = False
+    hybrid_candidates: int = 20
+    hybrid_rrf_k: int = 60
 
     # ドキュメント設定
+    # 単一ファイル、ディレクトリ（配下の*.mdを再帰的に読み込む）、またはglobパターン
     spec_file_path: str = "docs/spec/仕様書.md"
+    # 複数ファイルを並列に読み込む際の最大プロセス数（未指定時はCPUコア数）
+    corpus_max_workers: Optional[int] = None
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    # chunk_size/chunk_overlapの単位（"chars": 文字数, "tokens": 埋め込みモデルのトークン数）
+    chunk_size_unit: str = "chars"
+    # 埋め込みモデルが一度に扱える最大トークン数（超過分は切り捨てられる）
+    embedding_max_tokens: int = 512
+    # 埋め込み画像（データURI）の抽出先ディレクトリ
+    asset_directory: str = "data/assets"
 
     # RAG設定
     max_context_length: int = 4000
+    # 指定時はmax_context_lengthの代わりにOpenAIモデルのトークン数でコンテキストを制限
+    max_context_tokens: Optional[int] = None
     similarity_threshold: float = 0.35
+    # 指定時は上位rerank_candidates件を取得し、このクロスエンコーダーで並べ替えて
+    # max_results件に絞る（例: "hotchpotch/japanese-reranker-cross-encoder-xsmall-v1"）
+    reranker_model_name: Optional[str] = None
+    rerank_candidates: int = 20
+    rerank_batch_size: int = 16
+    # (クエリ, チャンク) ごとの採点結果のキャッシュ件数（0で無効化）
+    rerank_cache_size: int = 4096
+    # 会話履歴のない質問の意味的キャッシュ（件数0で無効化）。クエリベクトルのコサイン距離が
+    # max_distance以内で、検索されたチャンクの集合が一致する過去の質問の回答を返す
+    semantic_cache_size: int = 0
+    semantic_cache_max_distance: float = 0.05
+    semantic_cache_ttl_seconds: Optional[float] = 3600.0
+    # 会話履歴のない質問の回答の完全一致キャッシュ（"memory": プロセス内LRU,
+    # "sqlite": 全ワーカーで共有）。インデックスが再構築されると破棄される
+    answer_cache_backend: Optional[str] = None
+    answer_cache_size: int = 1024
+    answer_cache_path: str = "data/answer_cache.sqlite3"
+    # 会話履歴のない同じ質問・検索結果の回答生成が同時に実行中であれば、LLMの呼び出しを共有する
+    coalesce_generations: bool = True
+    # 用途ごとのスレッドプールのスレッド数。埋め込みなどのCPU処理（Noneの場合はtorchの
+    # 演算スレッド数）、SQLiteの読み書き、外部（埋め込みサーバー・LLM）への呼び出しを分ける
+    embedding_executor_workers: Optional[int] = None
+    db_executor_workers: int = 4
+    upstream_executor_workers: int = 8
 
     # プロンプト設定
     game_name: str = "スゲリス・サーガ"
@@ -35,11 +110,15 @@ class Settings(BaseSettings):
         env_file = ".env"
         env_file_encoding = "utf-8"
 
-    @property
+    @cached_property
     def prompt_templates(self) -> PromptTemplates:
-        """プロンプトテンプレートを取得"""
+        """プロンプトテンプレートを取得（イミュータブルなため、初回に作成したものを使い回す）"""
         return get_default_prompt_templates()
 
+    def reload_prompt_templates(self) -> None:
+        """次回の取得時にプロンプトテンプレートを作り直す"""
+        self.__dict__.pop("prompt_templates", None)
+
 
 def get_settings() -> Settings:
     return Settings()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class ChatRequest(BaseModel):
@@ -29,6 +29,91 @@ class HealthResponse(BaseModel):
     vector_store_ready: bool = Field(..., description="ベクトルストアの準備状態")
 
 
+class CacheStats(BaseModel):
+    hits: int = Field(..., description="ヒット数")
+    misses: int = Field(..., description="ミス数")
+    hit_rate: float = Field(..., description="ヒット率")
+    size: int = Field(..., description="現在のエントリ数")
+    max_size: int = Field(..., description="最大エントリ数")
+
+
+class BatcherStats(BaseModel):
+    batches: int = Field(..., description="処理したバッチ数")
+    queries: int = Field(..., description="処理したクエリ数")
+    average_batch_size: float = Field(..., description="平均バッチサイズ")
+
+
+class EmbeddingModelStats(BaseModel):
+    loaded: bool = Field(..., description="モデルがメモリに読み込まれているか")
+    load_count: int = Field(..., description="モデルを読み込んだ回数")
+    unload_count: int = Field(..., description="アイドルなどでモデルを解放した回数")
+    last_load_seconds: float = Field(..., description="直近の読み込み時間（秒）")
+    total_load_seconds: float = Field(..., description="読み込み時間の合計（秒）")
+    model_resident_bytes: int = Field(
+        ..., description="直近の読み込みで増えた常駐メモリ量（バイト）"
+    )
+    process_resident_bytes: int = Field(
+        ..., description="プロセス全体の常駐メモリ量（バイト）"
+    )
+
+
+class RerankerStats(BaseModel):
+    reranks: int = Field(..., description="リランキングの実行回数")
+    scored_pairs: int = Field(
+        ..., description="モデルで採点した(クエリ, チャンク)の組の数"
+    )
+    average_latency_ms: float = Field(..., description="平均処理時間（ミリ秒）")
+    last_latency_ms: float = Field(..., description="直近の処理時間（ミリ秒）")
+    score_cache: CacheStats = Field(..., description="採点結果のキャッシュの統計")
+
+
+class CoalescingStats(BaseModel):
+    in_flight: int = Field(..., description="実行中の回答生成の数")
+    executions: int = Field(..., description="LLMを呼び出して回答を生成した回数")
+    coalesced: int = Field(..., description="実行中の回答生成の結果を共有した回数")
+
+
+class ExecutorStats(BaseModel):
+    max_workers: int = Field(..., description="スレッド数")
+    queue_depth: int = Field(..., description="実行を待っている処理の数")
+    active: int = Field(..., description="実行中の処理の数")
+    submitted: int = Field(..., description="投入された処理の数")
+    completed: int = Field(..., description="完了した処理の数")
+    average_wait_ms: float = Field(
+        ..., description="投入から実行開始までの平均待ち時間（ミリ秒）"
+    )
+    max_wait_ms: float = Field(
+        ..., description="投入から実行開始までの最大待ち時間（ミリ秒）"
+    )
+
+
+class MetricsResponse(BaseModel):
+    query_embedding_cache: CacheStats = Field(
+        ..., description="クエリ埋め込みキャッシュの統計"
+    )
+    query_batcher: BatcherStats = Field(
+        ..., description="クエリ埋め込みのマイクロバッチの統計"
+    )
+    embedding_model: EmbeddingModelStats = Field(
+        ..., description="埋め込みモデルの読み込み状況の統計"
+    )
+    reranker: Optional[RerankerStats] = Field(
+        None, description="リランキングの統計（無効時はnull）"
+    )
+    semantic_answer_cache: Optional[CacheStats] = Field(
+        None, description="回答の意味的キャッシュの統計（無効時はnull）"
+    )
+    answer_cache: Optional[CacheStats] = Field(
+        None, description="回答の完全一致キャッシュの統計（無効時はnull）"
+    )
+    generation_coalescing: Optional[CoalescingStats] = Field(
+        None, description="同時に届いた同じ質問の回答生成の共有の統計（無効時はnull）"
+    )
+    executors: Optional[Dict[str, ExecutorStats]] = Field(
+        None, description="用途ごとのスレッドプールの統計（embedding・db・upstream）"
+    )
+
+
 # セッション管理関連のスキーマ
 class SessionCreate(BaseModel):
     title: Optional[str] = Field(None, description="セッションタイトル")
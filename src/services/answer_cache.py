@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Sequence
+
+from pydantic import BaseModel
+
+from src.services.embeddings import normalize_query
+from src.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_BACKENDS = ("memory", "sqlite")
+
+
+def prompt_template_hash(templates: BaseModel) -> str:
+    """プロンプトテンプレートの内容のハッシュ値（テンプレートを変えると別のキーになる）"""
+    payload = json.dumps(templates.model_dump(), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def answer_cache_key(
+    question: str, chunk_ids: Sequence[str], template_hash: str, model: str
+) -> str:
+    """質問（表記ゆれを吸収）・検索されたチャンク・テンプレート・モデルから回答のキーを算出
+
+    チャンクの順序はコンテキストの並びに影響するため、順序も区別する。
+    """
+    payload = json.dumps(
+        [normalize_query(question), list(chunk_ids), template_hash, model],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryAnswerCache:
+    """プロセス内のLRUキャッシュに生成済みの回答を保持する"""
+
+    def __init__(self, max_size: int):
+        self.cache: LRUCache[dict] = LRUCache(max_size)
+        self.index_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str, index_version: Optional[str]) -> Optional[dict]:
+        """回答を取得（未登録、またはインデックスが変わった場合はNone）"""
+        self._check_index_version(index_version)
+        return self.cache.get(key)
+
+    def put(self, key: str, index_version: Optional[str], value: dict) -> None:
+        self._check_index_version(index_version)
+        self.cache.put(key, value)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def _check_index_version(self, index_version: Optional[str]) -> None:
+        with self._lock:
+            if index_version != self.index_version:
+                self.cache.clear()
+                self.index_version = index_version
+
+
+class SQLiteAnswerCache:
+    """生成済みの回答をSQLiteに保存し、すべてのAPIワーカーで共有するキャッシュ
+
+    各行にインデックスのバージョンを記録し、異なるバージョンの行は返さない。
+    新しいバージョンで登録した時点で古いバージョンの行を削除する。
+    """
+
+    def __init__(self, path: str, max_size: int = 10000):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.index_version: Optional[str] = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # 複数ワーカーの同時起動でも読み込みがブロックされないようにする
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                index_version TEXT,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, key: str, index_version: Optional[str]) -> Optional[dict]:
+        """回答を取得（未登録、またはインデックスが変わった場合はNone）"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM answers WHERE key = ? AND index_version IS ?",
+                (key, index_version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, index_version: Optional[str], value: dict) -> None:
+        """回答を登録し、上限を超えた場合は古いものから削除する"""
+        if self.max_size <= 0:
+            return
+
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            if index_version != self.index_version:
+                # インデックスが再構築された場合は古い回答をまとめて削除する
+                self._connection.execute(
+                    "DELETE FROM answers WHERE index_version IS NOT ?",
+                    (index_version,),
+                )
+                self.index_version = index_version
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answers (key, index_version, value, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, index_version, payload, time.time()),
+            )
+            self._connection.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+            self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM answers").fetchone()[
+                0
+            ]
+
+    def stats(self) -> dict:
+        """ヒット数・ミス数などの統計情報を返す（件数は全ワーカーの合計）"""
+        size = len(self)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": size,
+                "max_size": self.max_size,
+            }
+
+    def close(self) -> None:
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._connection.close()
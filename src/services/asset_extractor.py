@@ -0,0 +1,98 @@
+import base64
+import binascii
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# data:image/png;base64,xxxx 形式のデータURI
+DATA_URI_PATTERN = re.compile(
+    r"data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?:;[\w.+-]+=[\w.+-]+)*;base64,"
+    r"(?P<payload>[A-Za-z0-9+/]+={0,2})"
+)
+
+# データURIで包まれていない長大なbase64ブロブ
+BASE64_BLOB_PATTERN = re.compile(r"[A-Za-z0-9+/]{%d,}={0,2}")
+
+# 置換後のプレースホルダー（チャンク本文からアセット参照を復元するために使用）
+ASSET_PLACEHOLDER_PATTERN = re.compile(r"asset:(?P<name>[0-9a-f]{16}\.[\w]+)")
+
+
+class InlineAssetExtractor:
+    """テキスト中に埋め込まれたバイナリ（データURI等）をアセットとして切り出す
+
+    抽出したバイナリは内容のハッシュを名前としてアセットディレクトリに保存し、
+    本文中は短いプレースホルダー ``asset:<hash>.<ext>`` に置き換える。
+    """
+
+    def __init__(
+        self, asset_directory: Optional[str] = None, min_blob_length: int = 512
+    ):
+        self.asset_directory = asset_directory
+        self.min_blob_length = min_blob_length
+        self._blob_pattern = re.compile(BASE64_BLOB_PATTERN.pattern % min_blob_length)
+
+    def replace(self, text: str) -> str:
+        """テキスト中のデータURI・base64ブロブをプレースホルダーに置換"""
+        if len(text) < self.min_blob_length and "data:" not in text:
+            return text
+
+        text = DATA_URI_PATTERN.sub(self._replace_data_uri, text)
+        return self._blob_pattern.sub(self._replace_blob, text)
+
+    def _replace_data_uri(self, match: re.Match) -> str:
+        placeholder = self._store(match.group("payload"), match.group("mime"))
+        return placeholder or match.group(0)
+
+    def _replace_blob(self, match: re.Match) -> str:
+        placeholder = self._store(match.group(0), None)
+        return placeholder or match.group(0)
+
+    def _store(self, payload: str, mime_type: Optional[str]) -> Optional[str]:
+        """base64ペイロードをデコードして保存し、プレースホルダーを返す"""
+        try:
+            data = base64.b64decode(payload, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+
+        extension = (
+            mimetypes.guess_extension(mime_type) if mime_type else None
+        ) or ".bin"
+        name = f"{hashlib.sha256(data).hexdigest()[:16]}{extension}"
+
+        if self.asset_directory:
+            self._write_asset(name, data)
+
+        return f"asset:{name}"
+
+    def _write_asset(self, name: str, data: bytes) -> None:
+        """コンテンツアドレスでアセットを書き出す（同一内容は再書き込みしない）"""
+        path = os.path.join(self.asset_directory, name)
+        if os.path.exists(path):
+            return
+
+        os.makedirs(self.asset_directory, exist_ok=True)
+        # 複数のワーカープロセスが同じアセットを同時に書き出すことがあるため、
+        # 書き込み中のファイルはプロセスごとに一意な名前にする
+        fd, temp_path = tempfile.mkstemp(dir=self.asset_directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # 名前は内容のハッシュのため、先に書き出されていれば同じ内容である
+            if os.path.exists(path):
+                return
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"埋め込みアセットを抽出しました: {path} ({len(data)} bytes)")
+
+
+def find_asset_references(text: str) -> List[str]:
+    """テキスト中のアセットプレースホルダーから参照名を出現順に取得"""
+    return list(dict.fromkeys(ASSET_PLACEHOLDER_PATTERN.findall(text)))
@@ -0,0 +1,133 @@
+import glob
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from langchain.schema import Document
+
+from src.services.document_loader import DocumentLoader
+from src.services.token_counter import get_embedding_token_counter
+
+logger = logging.getLogger(__name__)
+
+# ディレクトリ指定時に読み込む仕様書ファイルのパターン
+CORPUS_FILE_PATTERN = os.path.join("**", "*.md")
+
+GLOB_CHARACTERS = ("*", "?", "[")
+
+
+def resolve_spec_files(spec_path: str) -> List[str]:
+    """仕様書のパス（ファイル・ディレクトリ・globパターン）を対象ファイルの一覧に展開"""
+    if any(character in spec_path for character in GLOB_CHARACTERS):
+        file_paths = glob.glob(spec_path, recursive=True)
+    elif os.path.isdir(spec_path):
+        file_paths = glob.glob(
+            os.path.join(spec_path, CORPUS_FILE_PATTERN), recursive=True
+        )
+    elif os.path.exists(spec_path):
+        return [spec_path]
+    else:
+        return []
+
+    # 読み込み順（=チャンク順）を実行環境によらず一定にする
+    return sorted(path for path in file_paths if os.path.isfile(path))
+
+
+def _corpus_root(spec_path: str) -> str:
+    """source_fileメタデータの基準となるディレクトリ"""
+    if os.path.isdir(spec_path):
+        return spec_path
+
+    # globパターンの場合はワイルドカードを含まない先頭部分を基準にする
+    prefix = spec_path
+    for character in GLOB_CHARACTERS:
+        prefix = prefix.split(character, 1)[0]
+    return os.path.dirname(prefix)
+
+
+def load_file_documents(
+    file_path: str,
+    source_file: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    asset_directory: Optional[str] = None,
+    token_counter_model: Optional[str] = None,
+) -> List[Document]:
+    """1ファイルを読み込んでチャンクに分割（ワーカープロセスから呼び出される）"""
+    token_counter = (
+        get_embedding_token_counter(token_counter_model)
+        if token_counter_model
+        else None
+    )
+    loader = DocumentLoader(
+        file_path,
+        chunk_size,
+        chunk_overlap,
+        asset_directory=asset_directory,
+        token_counter=token_counter,
+    )
+
+    documents = loader.load_documents()
+    for document in documents:
+        document.metadata["source_file"] = source_file
+    return documents
+
+
+class CorpusLoader:
+    """複数の仕様書ファイルをプロセスプールで並列にチャンク化するローダー"""
+
+    def __init__(
+        self,
+        spec_path: str,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        asset_directory: Optional[str] = None,
+        token_counter_model: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ):
+        self.spec_path = spec_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.asset_directory = asset_directory
+        # 指定時は埋め込みモデルのトークン数でチャンクサイズを測る
+        # （トークナイザーは各ワーカープロセスで読み込む）
+        self.token_counter_model = token_counter_model
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def load_documents(self) -> List[Document]:
+        """対象ファイルをすべて読み込み、ファイル順にチャンクを連結して返す"""
+        file_paths = resolve_spec_files(self.spec_path)
+        if not file_paths:
+            raise FileNotFoundError(f"仕様書ファイルが見つかりません: {self.spec_path}")
+
+        root = _corpus_root(self.spec_path)
+        tasks = [
+            (
+                file_path,
+                os.path.relpath(file_path, root) if root else file_path,
+                self.chunk_size,
+                self.chunk_overlap,
+                self.asset_directory,
+                self.token_counter_model,
+            )
+            for file_path in file_paths
+        ]
+
+        workers = min(self.max_workers, len(tasks))
+        if workers <= 1:
+            # 単一ファイルではプロセス起動のコストの方が大きいため直接処理する
+            results = [load_file_documents(*task) for task in tasks]
+        else:
+            logger.info(
+                f"{len(tasks)}個の仕様書ファイルを{workers}プロセスで読み込み中..."
+            )
+            # API サーバーなどスレッドを持つプロセスからforkするとデッドロックの
+            # おそれがある（Python 3.12以降はDeprecationWarning）ため、spawnで起動する
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results = list(executor.map(load_file_documents, *zip(*tasks)))
+
+        return [document for documents in results for document in documents]
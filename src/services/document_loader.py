@@ -1,105 +1,232 @@
 import os
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import Iterable, Iterator, List, Optional
 from langchain.schema import Document
-from langchain_community.document_loaders import TextLoader
 import re
 
+from src.services.asset_extractor import InlineAssetExtractor, find_asset_references
+from src.services.token_counter import TokenCounter
+
+# 長い行を分割する際に優先して区切る文字
+SOFT_BREAK_CHARACTERS = ("。", "、", " ", "|")
+
+# セクション見出し（## **1 / ### **1.1 形式）のパターン
+MAIN_SECTION_PATTERN = re.compile(r"^## \*\*\d+")
+SUBSECTION_PATTERN = re.compile(r"^### \*\*\d+")
+
 
 class DocumentLoader:
     def __init__(
-        self, file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200
+        self,
+        file_path: str,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        asset_directory: Optional[str] = None,
+        extract_inline_assets: bool = True,
+        token_counter: Optional[TokenCounter] = None,
     ):
+        # オーバーラップがチャンクサイズと等しいと、長い行の分割が1文字ずつしか進まない
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"チャンクオーバーラップ({chunk_overlap})はチャンクサイズ({chunk_size})より小さくしてください"
+            )
+
         self.file_path = file_path
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=["\n## ", "\n### ", "\n\n", "\n", " ", ""],
-            keep_separator=True,
+        # 埋め込み画像などのバイナリはチャンク化・ベクトル化の前に除去する
+        self.asset_extractor: Optional[InlineAssetExtractor] = (
+            InlineAssetExtractor(asset_directory) if extract_inline_assets else None
         )
+        # 指定された場合、chunk_size/chunk_overlapを文字数ではなくトークン数として扱う
+        self.token_counter = token_counter
 
     def load_documents(self) -> List[Document]:
         """仕様書ドキュメントを読み込み、チャンクに分割する"""
+        return list(self.iter_documents())
+
+    def iter_documents(self) -> Iterator[Document]:
+        """仕様書ドキュメントを行単位でストリーミングし、チャンクを逐次生成する"""
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"仕様書ファイルが見つかりません: {self.file_path}")
 
-        # ドキュメントを読み込む
-        loader = TextLoader(self.file_path, encoding="utf-8")
-        documents = loader.load()
+        lines = self._iter_lines()
+        if self.asset_extractor:
+            lines = map(self.asset_extractor.replace, lines)
 
-        # メタデータを追加（セクション情報など）
-        enriched_documents = self._enrich_documents(documents)
+        return self._iter_split_documents(lines)
 
-        # チャンクに分割
-        chunks = self.text_splitter.split_documents(enriched_documents)
+    def _iter_lines(self) -> Iterator[str]:
+        """ファイルを一括で読み込まずに1行ずつ返す"""
+        with open(self.file_path, encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
 
-        return chunks
+    def _iter_split_documents(self, lines: Iterable[str]) -> Iterator[Document]:
+        """行のストリームからチャンク化済みのDocumentを逐次生成"""
+        for chunk in self._iter_chunks(lines):
+            yield from self._convert_chunks_to_documents([chunk])
 
-    def _enrich_documents(self, documents: List[Document]) -> List[Document]:
-        """ドキュメントにセクション情報などのメタデータを追加"""
-        enriched = []
+    def _iter_chunks(self, lines: Iterable[str]) -> Iterator[dict]:
+        """行のストリームからチャンクを1パスで生成
 
-        for doc in documents:
-            enriched_chunks = self._process_single_document(doc)
-            enriched.extend(enriched_chunks)
+        - ``##`` / ``###`` のセクション見出しで必ずチャンクを区切る
+        - チャンク長は行を追加するたびに差分で更新し、chunk_sizeを超える前に区切る
+        - 同一セクション内では直前チャンク末尾の行をchunk_overlapの範囲で引き継ぐ
+        - chunk_sizeを超える1行は、区切りの良い位置でオーバーラップ付きに分割する
+        """
+        current_section = ""
+        current_subsection = ""
+        current_chunk: List[str] = []
+        # "\n".join(current_chunk) の長さを保持する
+        current_length = 0
+        # オーバーラップとして引き継いだ行を除いた、新規に追加された行数
+        new_line_count = 0
+        # 見出し・空行以外の本文を含むかどうか
+        has_body = False
+        # 行ごとに呼ばれるため、文字数単位ではメソッド呼び出しを挟まずlenで測る
+        measure = self.token_counter.count if self.token_counter else len
 
-        return enriched
+        for line in lines:
+            # セクション見出しでは直前のチャンクを確定させ、オーバーラップも引き継がない
+            # 見出しは必ず "##" で始まるため、それ以外の行は正規表現を通さない
+            is_header = False
+            if line.startswith("##"):
+                section_info = self._detect_section_headers(line)
+                is_header = (
+                    section_info["is_main_section"] or section_info["is_subsection"]
+                )
+            if is_header:
+                if has_body:
+                    yield from self._emit_chunk(
+                        current_chunk, current_section, current_subsection
+                    )
+                    current_chunk, current_length, new_line_count = [], 0, 0
+                elif section_info["is_main_section"]:
+                    # 本文のない見出しだけのチャンクは作らない
+                    current_chunk, current_length, new_line_count = [], 0, 0
+                # 直後にサブセクションが続く親見出しは、文脈としてチャンクに残す
+                has_body = False
 
-    def _process_single_document(self, doc: Document) -> List[Document]:
-        """単一ドキュメントを処理してチャンクに分割"""
-        content = doc.page_content
-        lines = content.split("\n")
+                if section_info["is_main_section"]:
+                    current_section = section_info["section"]
+                    current_subsection = ""
+                else:
+                    current_subsection = section_info["section"]
 
-        chunks = self._create_chunks_from_lines(lines)
-        return self._convert_chunks_to_documents(chunks)
+            # chunk_sizeに収まる行（大半の行）は分割用のジェネレータを作らない
+            if self.token_counter is None and len(line) <= self.chunk_size:
+                pieces: Iterable[str] = (line,)
+            else:
+                pieces = self._split_long_line(line)
 
-    def _create_chunks_from_lines(self, lines: List[str]) -> List[dict]:
-        """行のリストからチャンクを作成"""
-        current_section = ""
-        current_subsection = ""
-        chunks = []
-        current_chunk = []
+            for piece in pieces:
+                piece_length = measure(piece)
+                separator_length = 1 if current_chunk else 0
 
-        for line in lines:
-            # セクション情報を更新
-            section_info = self._detect_section_headers(line)
-            if section_info["is_main_section"]:
-                current_section = section_info["section"]
-                current_subsection = ""
-            elif section_info["is_subsection"]:
-                current_subsection = section_info["section"]
-
-            current_chunk.append(line)
-
-            # チャンクサイズをチェックして必要に応じて分割
-            if self._should_create_chunk(current_chunk):
-                chunk_content = "\n".join(current_chunk[:-1])
-                if chunk_content.strip():
-                    chunks.append(
-                        self._create_chunk_dict(
-                            chunk_content, current_section, current_subsection
-                        )
+                # チャンクサイズをチェックして必要に応じて分割
+                if new_line_count and self._should_create_chunk(
+                    current_length + separator_length + piece_length
+                ):
+                    yield from self._emit_chunk(
+                        current_chunk, current_section, current_subsection
                     )
-                current_chunk = [line]
+                    current_chunk = self._overlap_tail(current_chunk)
+                    current_length = self._measure("\n".join(current_chunk))
+                    new_line_count = 0
+                    has_body = False
+                    separator_length = 1 if current_chunk else 0
+
+                    # オーバーラップを含めると収まらない場合は引き継がない
+                    if self._should_create_chunk(
+                        current_length + separator_length + piece_length
+                    ):
+                        current_chunk, current_length, separator_length = [], 0, 0
+
+                current_chunk.append(piece)
+                current_length += separator_length + piece_length
+                new_line_count += 1
+                has_body = has_body or (not is_header and bool(piece.strip()))
 
         # 最後のチャンクを処理
-        if current_chunk:
-            chunk_content = "\n".join(current_chunk)
-            if chunk_content.strip():
-                chunks.append(
-                    self._create_chunk_dict(
-                        chunk_content, current_section, current_subsection
-                    )
+        if has_body:
+            yield from self._emit_chunk(
+                current_chunk, current_section, current_subsection
+            )
+
+    def _emit_chunk(
+        self, chunk_lines: List[str], section: str, subsection: str
+    ) -> Iterator[dict]:
+        """空でないチャンクのみをチャンク辞書として返す"""
+        chunk_content = "\n".join(chunk_lines)
+        if not chunk_content.strip():
+            return
+
+        # トークン数は行ごとの合計と一致しない場合があるため、確定時に実測して
+        # 埋め込みモデルの上限を超えるチャンクを作らないようにする
+        if self.token_counter and self._measure(chunk_content) > self.chunk_size:
+            pieces = self.token_counter.split(
+                chunk_content, self.chunk_size, self.chunk_overlap
+            )
+        else:
+            pieces = [chunk_content]
+
+        for piece in pieces:
+            if piece.strip():
+                yield self._create_chunk_dict(piece, section, subsection)
+
+    def _measure(self, text: str) -> int:
+        """チャンクサイズの単位（文字数またはトークン数）でテキストの長さを返す"""
+        if self.token_counter:
+            return self.token_counter.count(text)
+        return len(text)
+
+    def _overlap_tail(self, chunk_lines: List[str]) -> List[str]:
+        """チャンク末尾からchunk_overlap以内に収まる行を取り出す"""
+        tail: List[str] = []
+        tail_length = -1  # 先頭行には改行が付かない
+
+        for line in reversed(chunk_lines):
+            tail_length += self._measure(line) + 1
+            if tail_length > self.chunk_overlap:
+                break
+            tail.append(line)
+
+        tail.reverse()
+        return tail
+
+    def _split_long_line(self, line: str) -> Iterator[str]:
+        """chunk_sizeを超える行を、区切りの良い位置でオーバーラップ付きに分割"""
+        if self.token_counter:
+            yield from self.token_counter.split(
+                line, self.chunk_size, self.chunk_overlap
+            )
+            return
+
+        if len(line) <= self.chunk_size:
+            yield line
+            return
+
+        start = 0
+        while True:
+            end = min(start + self.chunk_size, len(line))
+            if end < len(line):
+                # 後半に句読点や空白があればそこで区切る
+                soft_break = max(
+                    line.rfind(character, start + self.chunk_size // 2, end)
+                    for character in SOFT_BREAK_CHARACTERS
                 )
+                if soft_break != -1:
+                    end = soft_break + 1
 
-        return chunks
+            yield line[start:end]
+            if end >= len(line):
+                return
+            start = max(end - self.chunk_overlap, start + 1)
 
     def _detect_section_headers(self, line: str) -> dict:
         """行がセクションヘッダーかどうかを検出"""
-        is_main_section = bool(re.match(r"^## \*\*\d+", line))
-        is_subsection = bool(re.match(r"^### \*\*\d+", line))
+        is_main_section = bool(MAIN_SECTION_PATTERN.match(line))
+        is_subsection = bool(SUBSECTION_PATTERN.match(line))
 
         return {
             "is_main_section": is_main_section,
@@ -107,9 +234,9 @@ class DocumentLoader:
             "section": line.strip() if (is_main_section or is_subsection) else "",
         }
 
-    def _should_create_chunk(self, current_chunk: List[str]) -> bool:
-        """現在のチャンクを分割すべきかどうかを判断"""
-        return len("\n".join(current_chunk)) > self.chunk_size
+    def _should_create_chunk(self, current_length: int) -> bool:
+        """現在のチャンク長（改行込み）から分割すべきかどうかを判断"""
+        return current_length > self.chunk_size
 
     def _create_chunk_dict(self, content: str, section: str, subsection: str) -> dict:
         """チャンク辞書を作成"""
@@ -120,15 +247,18 @@ class DocumentLoader:
         documents = []
 
         for chunk in chunks:
-            documents.append(
-                Document(
-                    page_content=chunk["content"],
-                    metadata={
-                        "source": self.file_path,
-                        "section": chunk["section"],
-                        "subsection": chunk["subsection"],
-                    },
-                )
-            )
+            metadata = {
+                "source": self.file_path,
+                "section": chunk["section"],
+                "subsection": chunk["subsection"],
+            }
+
+            # チャンク本文に含まれるアセット参照を記録
+            # （Chromaのメタデータはスカラー値のみ対応のためカンマ区切りで保持）
+            assets = find_asset_references(chunk["content"])
+            if assets:
+                metadata["assets"] = ",".join(assets)
+
+            documents.append(Document(page_content=chunk["content"], metadata=metadata))
 
         return documents
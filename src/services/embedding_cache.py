@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# SQLiteの1クエリあたりのプレースホルダ数の上限に収まるよう分割して問い合わせる
+QUERY_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    """キャッシュキーに使うテキストのハッシュ値"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """埋め込みベクトルをSQLiteに永続化するキャッシュ
+
+    キーは (モデル名, 正規化の有無, テキストのsha256)。ベクトルはfloat32の
+    バイト列として保存する（モデルの出力はfloat32のため精度は失われない）。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # 複数ワーカーの同時起動でも読み込みがブロックされないようにする
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                normalize INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, normalize, text_hash)
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get_many(
+        self, model: str, normalize: bool, texts: Sequence[str]
+    ) -> List[Optional[List[float]]]:
+        """テキストごとのキャッシュ済みベクトルを返す（未登録はNone）"""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique_hashes), QUERY_BATCH_SIZE):
+                batch = unique_hashes[start : start + QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND normalize = ? AND text_hash IN ({placeholders})",
+                    (model, int(normalize), *batch),
+                )
+                for row_hash, blob in rows:
+                    found[row_hash] = array("f", blob).tolist()
+
+        return [found.get(hash_value) for hash_value in hashes]
+
+    def put_many(
+        self,
+        model: str,
+        normalize: bool,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+    ) -> None:
+        """ベクトルをキャッシュに登録（登録済みのキーは上書きしない）"""
+        rows = [
+            (model, int(normalize), text_hash(text), array("f", vector).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings "
+                "(model, normalize, text_hash, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,314 @@
+"""埋め込みモデルを1プロセスで保持し、Unixドメインソケット経由で提供するサーバー
+
+複数のAPIワーカーがそれぞれモデルを読み込むとワーカー数に比例してメモリを消費するため、
+モデルはこのサーバープロセスだけが保持し、ワーカーはRemoteEmbeddingServiceから呼び出す。
+
+実行方法:
+    uv run python -m src.services.embedding_server
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from array import array
+from concurrent.futures import Executor
+from typing import List, Optional, Set
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# フレームの先頭に付与するペイロード長（ビッグエンディアンの符号なし32bit整数）
+FRAME_HEADER = struct.Struct(">I")
+
+
+class EmbeddingServerError(RuntimeError):
+    """埋め込みサーバーがエラーを返した場合の例外"""
+
+
+# 送信前・送信中にこれらのエラーが起きた場合はサーバーが処理していないため、接続し直して再送できる
+# （タイムアウトはサーバーが処理中の可能性があるため再送しない）
+RETRYABLE_SEND_ERRORS = (
+    ConnectionRefusedError,
+    ConnectionResetError,
+    BrokenPipeError,
+    FileNotFoundError,
+)
+
+
+def send_frame(sock: socket.socket, payload: bytes) -> None:
+    """長さ付きのフレームを送信"""
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Optional[bytes]:
+    """長さ付きのフレームを受信（接続が閉じられた場合はNone）"""
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    payload = _recv_exactly(sock, length)
+    if payload is None:
+        raise ConnectionError("フレームの受信中に接続が切断されました")
+    return payload
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            if buffer:
+                raise ConnectionError("フレームの受信中に接続が切断されました")
+            return None
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def send_vectors(sock: socket.socket, vectors: List[List[float]]) -> None:
+    """ベクトル列をJSONヘッダーとfloat32のバイト列の2フレームで送信"""
+    dimension = len(vectors[0]) if vectors else 0
+    header = {"count": len(vectors), "dimension": dimension}
+    send_frame(sock, json.dumps(header).encode("utf-8"))
+    flat = array("f")
+    for vector in vectors:
+        flat.extend(vector)
+    send_frame(sock, flat.tobytes())
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """1接続で複数のリクエストを順に処理するハンドラー"""
+
+    def setup(self) -> None:
+        self.server.track_connection(self.request, True)
+
+    def finish(self) -> None:
+        self.server.track_connection(self.request, False)
+
+    def handle(self) -> None:
+        while True:
+            payload = recv_frame(self.request)
+            if payload is None:
+                return
+
+            try:
+                request = json.loads(payload)
+                response = self.server.dispatch(request)
+            except Exception as e:
+                logger.error(f"埋め込みリクエストの処理に失敗しました: {e}")
+                send_frame(self.request, json.dumps({"error": str(e)}).encode("utf-8"))
+                continue
+
+            if request["method"] == "stats":
+                send_frame(
+                    self.request,
+                    json.dumps({"stats": response}, ensure_ascii=False).encode("utf-8"),
+                )
+            else:
+                send_vectors(self.request, response)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """EmbeddingServiceをUnixドメインソケットで公開するサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, embedding_service: Embeddings, socket_path: str):
+        self.embedding_service = embedding_service
+        self.socket_path = socket_path
+        # 前回の異常終了で残ったソケットファイルを削除
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        directory = os.path.dirname(socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 停止時に切断するため、クライアントとの接続を保持する
+        self._connections: Set[socket.socket] = set()
+        self._connections_lock = threading.Lock()
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+
+    def track_connection(self, connection: socket.socket, active: bool) -> None:
+        """処理中の接続を登録または解除"""
+        with self._connections_lock:
+            if active:
+                self._connections.add(connection)
+            else:
+                self._connections.discard(connection)
+
+    def dispatch(self, request: dict):
+        """リクエストのメソッドに応じて埋め込みサービスを呼び出す"""
+        method = request["method"]
+        if method == "embed_query":
+            return [self.embedding_service.embed_query(request["texts"][0])]
+        if method == "embed_documents":
+            return self.embedding_service.embed_documents(request["texts"])
+        if method == "stats":
+            return self.embedding_service.stats()
+        raise ValueError(f"未対応のメソッドです: {method}")
+
+    def server_close(self) -> None:
+        super().server_close()
+        # 待機中のハンドラーを終了させ、クライアントに再接続を促す
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class RemoteEmbeddingService(Embeddings):
+    """埋め込みサーバーを呼び出すクライアント（EmbeddingServiceと同じインターフェース）"""
+
+    def __init__(
+        self,
+        socket_path: str,
+        timeout: float = 60.0,
+        executor: Optional[Executor] = None,
+        batch_size: int = 32,
+    ):
+        self.socket_path = socket_path
+        # 1リクエストあたりの応答待ちの上限（embed_documentsはbatch_size件ごとに送るため、
+        # 件数が多くても1リクエストの処理時間は一定の範囲に収まる）
+        self.timeout = timeout
+        self.batch_size = batch_size
+        # 非同期の呼び出しでサーバーの応答を待つスレッドプール（Noneの場合は既定のもの）
+        self.executor = executor
+        # 接続はスレッドごとに保持して使い回す
+        self._local = threading.local()
+
+    def embed_query(self, text: str) -> List[float]:
+        """テキストを埋め込みベクトルに変換"""
+        return self._request_vectors("embed_query", [text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """テキストを非同期に埋め込みベクトルに変換"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.embed_query, text
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """複数のテキストを埋め込みベクトルに変換"""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(
+                self._request_vectors(
+                    "embed_documents", texts[start : start + self.batch_size]
+                )
+            )
+        return vectors
+
+    def stats(self) -> dict:
+        """サーバー側のキャッシュなどの統計情報を返す"""
+        return self._request("stats", [])["stats"]
+
+    def _request_vectors(self, method: str, texts: List[str]) -> List[List[float]]:
+        self._send_request(method, texts)
+        try:
+            # 応答の途中で失敗した接続には読み残しがあり再利用できないため、
+            # ヘッダーとベクトルの2つのフレームの受信に失敗した場合は接続を破棄する
+            header = json.loads(self._receive_payload())
+            payload = None if "error" in header else self._receive_payload()
+        except BaseException:
+            self._close()
+            raise
+        if payload is None:
+            raise EmbeddingServerError(header["error"])
+
+        vectors = array("f", payload)
+        dimension = header["dimension"]
+        return [
+            vectors[index * dimension : (index + 1) * dimension].tolist()
+            for index in range(header["count"])
+        ]
+
+    def _request(self, method: str, texts: List[str]) -> dict:
+        self._send_request(method, texts)
+        try:
+            header = json.loads(self._receive_payload())
+        except BaseException:
+            self._close()
+            raise
+        if "error" in header:
+            raise EmbeddingServerError(header["error"])
+        return header
+
+    def _send_request(self, method: str, texts: List[str]) -> None:
+        payload = json.dumps({"method": method, "texts": texts}).encode("utf-8")
+        try:
+            self._send(payload)
+        except RETRYABLE_SEND_ERRORS:
+            # サーバー再起動などで切断された場合は1回だけ接続し直す
+            self._send(payload)
+
+    def _send(self, payload: bytes) -> None:
+        """リクエストを送信（失敗した場合は接続を破棄する）"""
+        try:
+            send_frame(self._connection(), payload)
+        except BaseException:
+            self._close()
+            raise
+
+    def _receive_payload(self) -> bytes:
+        payload = recv_frame(self._connection())
+        if payload is None:
+            self._close()
+            raise ConnectionError("埋め込みサーバーとの接続が切断されました")
+        return payload
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+def main() -> None:
+    """設定に従って埋め込みモデルを読み込み、サーバーを起動する"""
+    from src.config.settings import get_settings
+    from src.services.embeddings import EmbeddingService, embedding_service_options
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    settings = get_settings()
+    if not settings.embedding_server_socket:
+        raise SystemExit("EMBEDDING_SERVER_SOCKETが設定されていません")
+
+    embedding_service = EmbeddingService(
+        settings.embedding_model_name, **embedding_service_options(settings)
+    )
+    # 複数スレッドから同時に初期化されないよう、起動時にモデルを読み込んでおく
+    _ = embedding_service.embeddings
+
+    with EmbeddingServer(embedding_service, settings.embedding_server_socket) as server:
+        logger.info(
+            f"埋め込みサーバーを起動しました: {settings.embedding_server_socket}"
+        )
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,338 @@
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
-from typing import Optional
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional
+import ctypes
+import gc
 import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from src.services.embedding_cache import EmbeddingCache
+from src.services.lru_cache import LRUCache
+from src.services.onnx_embeddings import OnnxEmbeddings
+from src.services.query_batcher import QueryBatcher
+from src.services.token_counter import get_embedding_token_counter
+
+if TYPE_CHECKING:
+    from src.config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+# アイドル監視の確認間隔の下限（極端に短い閾値でスレッドが空回りしないようにする）
+IDLE_WATCH_MIN_INTERVAL_SECONDS = 0.1
+
+
+def embedding_service_options(settings: "Settings") -> dict:
+    """設定からEmbeddingServiceのモデル名以外の引数を組み立てる"""
+    return {
+        "cache_path": settings.embedding_cache_path,
+        "query_cache_size": settings.query_cache_size,
+        "query_cache_ttl_seconds": settings.query_cache_ttl_seconds,
+        "batch_size": settings.embedding_batch_size,
+        "backend": settings.embedding_backend,
+        "onnx_model_directory": settings.onnx_model_directory,
+        "onnx_quantize": settings.onnx_quantize,
+        "query_batch_max_size": settings.query_batch_max_size,
+        "query_batch_max_wait_ms": settings.query_batch_max_wait_ms,
+        "idle_unload_seconds": settings.embedding_idle_unload_seconds,
+    }
+
+
+def normalize_query(text: str) -> str:
+    """表記ゆれ（全角/半角、前後・連続する空白）を吸収したクエリ文字列を返す"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def resident_set_size() -> int:
+    """プロセスの現在の常駐メモリ量（バイト）を返す"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # /procがない環境では最大常駐量で代用する
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _release_freed_memory() -> None:
+    """解放済みのヒープをOSに返す（glibc以外では何もしない）"""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class EmbeddingService(Embeddings):
+    # 埋め込みベクトルを正規化するかどうか（キャッシュキーの一部）
+    normalize_embeddings = True
+
+    def __init__(
+        self,
+        model_name: str = "intfloat/multilingual-e5-large",
+        cache_path: Optional[str] = None,
+        query_cache_size: int = 1024,
+        query_cache_ttl_seconds: Optional[float] = None,
+        batch_size: int = 32,
+        backend: str = "torch",
+        onnx_model_directory: str = "data/onnx",
+        onnx_quantize: bool = True,
+        query_batch_max_size: int = 16,
+        query_batch_max_wait_ms: float = 5.0,
+        idle_unload_seconds: Optional[float] = None,
+        executor: Optional[Executor] = None,
+    ):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"未対応の埋め込みバックエンドです: {backend}")
 
-class EmbeddingService:
-    def __init__(self, model_name: str = "intfloat/multilingual-e5-large"):
         self.model_name = model_name
-        self._embeddings: Optional[HuggingFaceEmbeddings] = None
+        # 推論バックエンド（"torch": sentence-transformers, "onnx": ONNX Runtime）
+        self.backend = backend
+        self.onnx_model_directory = onnx_model_directory
+        self.onnx_quantize = onnx_quantize
+        # 1回のモデル呼び出しでまとめて埋め込むテキスト数
+        self.batch_size = batch_size
+        self._token_length: Optional[Callable[[str], int]] = None
+        self._embeddings: Optional[Embeddings] = None
+        # 指定時は最後の利用からこの秒数が経過したモデルを解放し、次の利用時に再読み込みする
+        # （0以下は未指定と同じく解放しない）
+        if idle_unload_seconds is not None and idle_unload_seconds <= 0:
+            idle_unload_seconds = None
+        self.idle_unload_seconds = idle_unload_seconds
+        self._model_lock = threading.RLock()
+        self._active_calls = 0
+        self._last_used = 0.0
+        # モデルの読み込み・解放の統計（メトリクス用）
+        self.load_count = 0
+        self.unload_count = 0
+        self.last_load_seconds = 0.0
+        self.total_load_seconds = 0.0
+        self.model_resident_bytes = 0
+        # 指定時は埋め込み済みのテキストをモデルに通さずキャッシュから返す
+        self.cache: Optional[EmbeddingCache] = (
+            EmbeddingCache(cache_path) if cache_path else None
+        )
+        # 正規化済みクエリ -> ベクトル（同じ質問でモデルを再実行しない）
+        self.query_cache: LRUCache[list] = LRUCache(
+            query_cache_size, query_cache_ttl_seconds
+        )
+        # 非同期で同時に届いたクエリをまとめて埋め込む（モデル呼び出しはexecutorで実行）
+        self.query_batcher = QueryBatcher(
+            self._encode_queries,
+            query_batch_max_size,
+            query_batch_max_wait_ms,
+            executor=executor,
+        )
+
+    @property
+    def model_key(self) -> str:
+        """バックエンドごとに出力がわずかに異なるため、キャッシュの区別に使うキー"""
+        if self.backend == "onnx":
+            return f"{self.model_name}@onnx{'-int8' if self.onnx_quantize else ''}"
+        return self.model_name
 
     @property
-    def embeddings(self) -> HuggingFaceEmbeddings:
-        """遅延初期化で埋め込みモデルを取得"""
-        if self._embeddings is None:
-            logger.info(f"埋め込みモデルを初期化中: {self.model_name}")
+    def embeddings(self) -> Embeddings:
+        """遅延初期化で埋め込みモデルを取得（解放済みの場合は再読み込み）"""
+        with self._model_lock:
+            self._last_used = time.monotonic()
+            if self._embeddings is None:
+                self._load_model()
+            return self._embeddings
+
+    @property
+    def is_model_loaded(self) -> bool:
+        return self._embeddings is not None
+
+    def unload_model(self) -> None:
+        """埋め込みモデルをメモリから解放"""
+        with self._model_lock:
+            if self._embeddings is None:
+                return
+            self._embeddings = None
+            self.unload_count += 1
+            _release_freed_memory()
+        logger.info(f"埋め込みモデルを解放しました: {self.model_name}")
+
+    def _load_model(self) -> None:
+        logger.info(f"埋め込みモデルを初期化中: {self.model_name}")
+        resident_before = resident_set_size()
+        start = time.perf_counter()
+
+        if self.backend == "onnx":
+            self._embeddings = OnnxEmbeddings(
+                self.model_name,
+                self.onnx_model_directory,
+                quantize=self.onnx_quantize,
+            )
+        else:
             self._embeddings = HuggingFaceEmbeddings(
                 model_name=self.model_name,
                 model_kwargs={"device": "cpu"},
-                encode_kwargs={"normalize_embeddings": True},
+                encode_kwargs={"normalize_embeddings": self.normalize_embeddings},
             )
-            logger.info("埋め込みモデルの初期化が完了しました")
-        return self._embeddings
+
+        self.last_load_seconds = time.perf_counter() - start
+        self.total_load_seconds += self.last_load_seconds
+        self.load_count += 1
+        self.model_resident_bytes = max(resident_set_size() - resident_before, 0)
+        logger.info("埋め込みモデルの初期化が完了しました")
+        logger.info(
+            f"読み込み時間: {self.last_load_seconds:.2f}秒, "
+            f"常駐メモリ増加量: {self.model_resident_bytes / 1024 / 1024:.1f}MB"
+        )
+
+        if self.idle_unload_seconds is not None:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+
+    def _watch_idle(self) -> None:
+        """アイドル時間が閾値を超えたらモデルを解放する（解放後に終了）"""
+        interval = max(
+            min(self.idle_unload_seconds / 4, 60.0), IDLE_WATCH_MIN_INTERVAL_SECONDS
+        )
+        while True:
+            time.sleep(interval)
+            with self._model_lock:
+                if self._embeddings is None:
+                    return
+                idle = time.monotonic() - self._last_used
+                if self._active_calls == 0 and idle >= self.idle_unload_seconds:
+                    self.unload_model()
+                    return
+
+    @contextmanager
+    def _using_model(self) -> Iterator[Embeddings]:
+        """推論中にモデルが解放されないよう、利用中として扱う"""
+        with self._model_lock:
+            model = self.embeddings
+            self._active_calls += 1
+        try:
+            yield model
+        finally:
+            with self._model_lock:
+                self._active_calls -= 1
+                self._last_used = time.monotonic()
+
+    def model_stats(self) -> dict:
+        """モデルの読み込み時間と常駐メモリ量の統計を返す"""
+        return {
+            "loaded": self.is_model_loaded,
+            "load_count": self.load_count,
+            "unload_count": self.unload_count,
+            "last_load_seconds": self.last_load_seconds,
+            "total_load_seconds": self.total_load_seconds,
+            "model_resident_bytes": self.model_resident_bytes,
+            "process_resident_bytes": resident_set_size(),
+        }
 
     def embed_query(self, text: str) -> list:
-        """テキストを埋め込みベクトルに変換"""
-        return self.embeddings.embed_query(text)
+        """テキストを埋め込みベクトルに変換（直近のクエリはキャッシュから返す）"""
+        query = normalize_query(text)
+        vector = self.query_cache.get(query)
+        if vector is None:
+            with self._using_model() as model:
+                vector = model.embed_query(query)
+            self.query_cache.put(query, vector)
+        # 呼び出し側での変更がキャッシュに波及しないようコピーを返す
+        return list(vector)
+
+    async def aembed_query(self, text: str) -> list:
+        """テキストを非同期に埋め込む（同時に届いたクエリはまとめて処理する）"""
+        query = normalize_query(text)
+        vector = self.query_cache.get(query)
+        if vector is None:
+            vector = await self.query_batcher.submit(query)
+            self.query_cache.put(query, vector)
+        return list(vector)
 
     def embed_documents(self, texts: list) -> list:
         """複数のテキストを埋め込みベクトルに変換"""
-        return self.embeddings.embed_documents(texts)
+        if self.cache is None:
+            return self._encode_documents(texts)
+
+        vectors = self.cache.get_many(self.model_key, self.normalize_embeddings, texts)
+        hit_count = sum(vector is not None for vector in vectors)
+
+        # 未キャッシュのテキストだけを重複を除いてモデルに通す
+        missing_texts = list(
+            dict.fromkeys(
+                text for text, vector in zip(texts, vectors) if vector is None
+            )
+        )
+        if missing_texts:
+            missing_vectors = self._encode_documents(missing_texts)
+            self.cache.put_many(
+                self.model_key,
+                self.normalize_embeddings,
+                missing_texts,
+                missing_vectors,
+            )
+            computed = dict(zip(missing_texts, missing_vectors))
+            vectors = [
+                computed[text] if vector is None else vector
+                for text, vector in zip(texts, vectors)
+            ]
+
+        logger.info(
+            f"埋め込みキャッシュ: ヒット={hit_count}, 新規計算={len(missing_texts)}"
+        )
+        return vectors
+
+    def stats(self) -> dict:
+        """クエリキャッシュ・マイクロバッチ・モデルの統計情報を返す"""
+        return {
+            "query_embedding_cache": self.query_cache.stats(),
+            "query_batcher": self.query_batcher.stats(),
+            "embedding_model": self.model_stats(),
+        }
+
+    def _encode_documents(self, texts: List[str]) -> List[List[float]]:
+        """トークン長の近いテキスト同士でバッチを組んで埋め込み、元の順序で返す"""
+        with self._using_model() as model:
+            return self._encode_documents_with(model, texts)
+
+    def _encode_documents_with(
+        self, model: Embeddings, texts: List[str]
+    ) -> List[List[float]]:
+        if len(texts) <= self.batch_size:
+            return model.embed_documents(texts)
+
+        # 長さの異なるテキストが同じバッチに入るとパディングで計算が無駄になるため、
+        # トークン長でソートしてからバッチに分割する
+        token_length = self._get_token_length()
+        lengths = [token_length(text) for text in texts]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start : start + self.batch_size]
+            batch_vectors = model.embed_documents(
+                [texts[index] for index in batch_indices]
+            )
+            for index, vector in zip(batch_indices, batch_vectors):
+                vectors[index] = vector
+
+        return vectors
+
+    def _get_token_length(self) -> Callable[[str], int]:
+        """バッチ分割のソートに使うトークン長の計測関数を取得"""
+        if self._token_length is None:
+            try:
+                self._token_length = get_embedding_token_counter(self.model_name).count
+            except Exception as e:
+                logger.warning(
+                    f"トークナイザーを読み込めないため文字数でバッチを組みます: {e}"
+                )
+                self._token_length = len
+        return self._token_length
+
+    def _encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """正規化済みのクエリ群を1回のモデル呼び出しで埋め込む"""
+        with self._using_model() as model:
+            return model.embed_documents(queries)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    from src.config.settings import Settings
+
+T = TypeVar("T")
+
+# 用途ごとのスレッドプール
+# "embedding": 埋め込み・リランキング・ベクトル検索などのCPU処理
+# "db": SQLite（会話履歴・回答キャッシュ）の読み書き
+# "upstream": 埋め込みサーバーやLLMなど外部への呼び出し
+EXECUTOR_NAMES = ("embedding", "db", "upstream")
+
+
+def default_embedding_workers() -> int:
+    """CPU処理のスレッド数（torchの演算スレッド数、未インストールの場合はCPU数）"""
+    try:
+        import torch
+    except ImportError:
+        return os.cpu_count() or 1
+    return torch.get_num_threads()
+
+
+async def iterate_in_executor(
+    iterator: Iterator[T], executor: Optional[Executor] = None
+) -> AsyncIterator[T]:
+    """同期のイテレーターの各要素をスレッドプールで取り出し、非同期に返す
+
+    最後まで取り出す前に中断された場合（クライアントの切断によるキャンセルなど）は、
+    同期のイテレーターを同じスレッドプールで閉じ、上流への接続などを解放する。
+    """
+    loop = asyncio.get_running_loop()
+    done = object()
+    pending: Optional[asyncio.Future] = None
+    exhausted = False
+    try:
+        while True:
+            # キャンセルされても実行中の取り出しが終わるまで待てるよう、shieldで包む
+            pending = loop.run_in_executor(executor, next, iterator, done)
+            item = await asyncio.shield(pending)
+            if item is done:
+                exhausted = True
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if not exhausted and close is not None:
+            # 実行中のジェネレーターは閉じられないため、取り出しの完了を待ってから閉じる
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            await loop.run_in_executor(executor, close)
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """待ち行列の長さと、処理が始まるまでの待ち時間を計測するスレッドプール"""
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def submit(self, fn: Callable[..., T], /, *args, **kwargs) -> "Future[T]":
+        submitted_at = time.monotonic()
+        with self._stats_lock:
+            self.queued += 1
+            self.submitted += 1
+
+        def run() -> T:
+            wait = time.monotonic() - submitted_at
+            with self._stats_lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        future = super().submit(run)
+        future.add_done_callback(self._forget_cancelled)
+        return future
+
+    def _forget_cancelled(self, future: Future) -> None:
+        # 実行前にキャンセルされた処理は待ち行列から外す
+        if future.cancelled():
+            with self._stats_lock:
+                self.queued -= 1
+
+    def stats(self) -> dict:
+        """待ち行列の長さ・実行中の数・待ち時間の統計情報を返す"""
+        with self._stats_lock:
+            started = self.submitted - self.queued
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "average_wait_ms": (
+                    self.total_wait_seconds / started * 1000 if started else 0.0
+                ),
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+
+class ExecutorRegistry:
+    """用途ごとに分けたスレッドプール
+
+    埋め込みの計算が集中しても、データベースの読み書きや外部への呼び出しが
+    同じスレッドプールの空きを待たされないようにする。
+    """
+
+    def __init__(self, workers: Dict[str, int]):
+        self.executors: Dict[str, InstrumentedExecutor] = {
+            name: InstrumentedExecutor(name, workers[name]) for name in EXECUTOR_NAMES
+        }
+
+    @classmethod
+    def from_settings(cls, settings: "Settings") -> "ExecutorRegistry":
+        return cls(
+            {
+                "embedding": settings.embedding_executor_workers
+                or default_embedding_workers(),
+                "db": settings.db_executor_workers,
+                "upstream": settings.upstream_executor_workers,
+            }
+        )
+
+    def get(self, name: str) -> InstrumentedExecutor:
+        """名前に対応するスレッドプールを返す"""
+        executor: Optional[InstrumentedExecutor] = self.executors.get(name)
+        if executor is None:
+            raise ValueError(f"未定義のスレッドプールです: {name}")
+        return executor
+
+    def stats(self) -> dict:
+        """スレッドプールごとの統計情報を返す"""
+        return {name: executor.stats() for name, executor in self.executors.items()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """すべてのスレッドプールを停止する"""
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = "index_manifest.json"
+MANIFEST_FORMAT_VERSION = 1
+
+
+def compute_chunk_id(document: Document) -> str:
+    """チャンクの内容とメタデータから決定的なIDを算出"""
+    payload = json.dumps(
+        {"content": document.page_content, "metadata": document.metadata},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def assign_chunk_ids(documents: List[Document]) -> List[str]:
+    """ドキュメント列にチャンクIDを割り当てる（同一内容のチャンクには連番を付与）"""
+    seen: Dict[str, int] = {}
+    chunk_ids = []
+
+    for document in documents:
+        chunk_id = compute_chunk_id(document)
+        count = seen.get(chunk_id, 0)
+        seen[chunk_id] = count + 1
+        chunk_ids.append(chunk_id if count == 0 else f"{chunk_id}-{count}")
+
+    return chunk_ids
+
+
+def diff_chunk_ids(
+    previous_ids: List[str], current_ids: List[str]
+) -> Tuple[List[str], List[str]]:
+    """前回と今回のチャンクIDを比較し、(追加ID, 削除ID) を返す"""
+    previous = set(previous_ids)
+    current = set(current_ids)
+
+    added = [chunk_id for chunk_id in current_ids if chunk_id not in previous]
+    removed = [chunk_id for chunk_id in previous_ids if chunk_id not in current]
+    return added, removed
+
+
+def compute_index_version(fingerprint: str, chunk_ids: List[str]) -> str:
+    """インデックスの内容を表すバージョン文字列を算出"""
+    digest = hashlib.sha256(fingerprint.encode("utf-8"))
+    for chunk_id in sorted(chunk_ids):
+        digest.update(chunk_id.encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+class IndexManifest:
+    """ベクトルストアに格納済みのチャンクIDを記録するマニフェスト
+
+    ``fingerprint`` には埋め込みモデルなど、変わるとベクトル全体が
+    無効になる設定を含める。fingerprintが一致しない場合は差分更新できない。
+    """
+
+    def __init__(self, persist_directory: str):
+        self.path = os.path.join(persist_directory, MANIFEST_FILE_NAME)
+
+    def load(self) -> Optional[dict]:
+        """マニフェストを読み込む（存在しない・壊れている場合はNone）"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"インデックスマニフェストを読み込めません: {e}")
+            return None
+
+        if manifest.get("format_version") != MANIFEST_FORMAT_VERSION:
+            return None
+        return manifest
+
+    def save(self, fingerprint: str, chunk_ids: List[str]) -> dict:
+        """マニフェストをアトミックに書き込む"""
+        manifest = {
+            "format_version": MANIFEST_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "index_version": compute_index_version(fingerprint, chunk_ids),
+            "chunk_ids": chunk_ids,
+        }
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+        return manifest
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_DIRECTORY_NAME = "lexical_index"
+LEXICAL_INDEX_FORMAT_VERSION = 1
+
+_META_FILE_NAME = "meta.json"
+_POSTINGS_FILE_NAME = "postings.npz"
+# 記号・空白で区切られた連続する文字（日本語の文字も含む）
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def char_ngrams(text: str, sizes: Sequence[int] = (2, 3)) -> List[str]:
+    """テキストを文字n-gramの列に分割する（形態素解析器を使わない日本語向けの分かち書き）
+
+    表記ゆれを吸収するためNFKC正規化と小文字化を行い、記号や空白をまたぐn-gramは作らない。
+    最小のnより短い語（「火」など）はそのまま1語として扱う。
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    grams: List[str] = []
+    for token in _TOKEN_PATTERN.findall(normalized):
+        if len(token) < min(sizes):
+            grams.append(token)
+            continue
+        for size in sizes:
+            grams.extend(token[i : i + size] for i in range(len(token) - size + 1))
+    return grams
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[str]], k: int = 60
+) -> List[Tuple[str, float]]:
+    """複数の順位リストをReciprocal Rank Fusionで統合し、(ID, スコア) の降順で返す"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """文字n-gramの転置インデックスによるBM25検索
+
+    キャラクター名・アイテム名・通貨名などの固有の用語は、埋め込みの近傍検索では
+    取りこぼしたり順位が下がったりしやすいため、語彙の一致で補う。
+    転置リストは語の順に連結した (文書番号, 出現回数) の配列と語ごとの開始位置で保持し、
+    検索時はクエリの語の転置リストだけを加算するため、コーパス全体を走査しない。
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        terms: Sequence[str],
+        offsets: np.ndarray,
+        documents: np.ndarray,
+        frequencies: np.ndarray,
+        document_lengths: np.ndarray,
+        ngram_sizes: Sequence[int] = (2, 3),
+        k1: float = 1.2,
+        b: float = 0.75,
+        index_version: Optional[str] = None,
+    ):
+        self.ids = list(ids)
+        self.terms = list(terms)
+        self._term_positions: Dict[str, int] = {
+            term: position for position, term in enumerate(self.terms)
+        }
+        self.offsets = offsets.astype(np.int64)
+        self.documents = documents.astype(np.int32)
+        self.frequencies = frequencies.astype(np.float32)
+        self.document_lengths = document_lengths.astype(np.float32)
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.k1 = k1
+        self.b = b
+        self.index_version = index_version
+        count = len(self.ids)
+        average_length = float(self.document_lengths.mean()) if count else 0.0
+        # 文書長による正規化項（検索のたびに計算しないよう事前に求めておく）
+        self._length_norm = self.k1 * (
+            1 - self.b + self.b * self.document_lengths / max(average_length, 1e-9)
+        )
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        ngram_sizes: Sequence[int] = (2, 3),
+        k1: float = 1.2,
+        b: float = 0.75,
+        index_version: Optional[str] = None,
+    ) -> "BM25Index":
+        """文書のテキストから転置インデックスを構築"""
+        term_positions: Dict[str, int] = {}
+        term_ids: List[int] = []
+        documents: List[int] = []
+        frequencies: List[int] = []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for position, text in enumerate(texts):
+            grams = char_ngrams(text, ngram_sizes)
+            lengths[position] = len(grams)
+            for term, frequency in Counter(grams).items():
+                term_ids.append(term_positions.setdefault(term, len(term_positions)))
+                documents.append(position)
+                frequencies.append(frequency)
+
+        # 語ごとにまとめる（安定ソートのため各転置リストは文書番号順になる）
+        term_ids_array = np.array(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids_array, kind="stable")
+        offsets = np.zeros(len(term_positions) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(term_ids_array, minlength=len(term_positions)), out=offsets[1:]
+        )
+        return cls(
+            ids,
+            list(term_positions),
+            offsets,
+            np.array(documents, dtype=np.int32)[order],
+            np.array(frequencies, dtype=np.float32)[order],
+            lengths,
+            ngram_sizes,
+            k1,
+            b,
+            index_version,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self.terms)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """クエリとの語彙の一致が多い上位k件の (ID, BM25スコア) を返す"""
+        count = len(self.ids)
+        terms = set(char_ngrams(query, self.ngram_sizes))
+        if k <= 0 or count == 0 or not terms:
+            return []
+
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            position = self._term_positions.get(term)
+            if position is None:
+                continue
+            start, end = self.offsets[position], self.offsets[position + 1]
+            documents = self.documents[start:end]
+            frequencies = self.frequencies[start:end]
+            idf = np.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+            scores[documents] += (
+                idf
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + self._length_norm[documents])
+            )
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[index], float(scores[index])) for index in top]
+
+    def save(self, directory: str) -> None:
+        """転置インデックスを保存"""
+        os.makedirs(directory, exist_ok=True)
+        postings_path = os.path.join(directory, _POSTINGS_FILE_NAME)
+        with open(f"{postings_path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                offsets=self.offsets,
+                documents=self.documents,
+                frequencies=self.frequencies,
+                document_lengths=self.document_lengths,
+            )
+        os.replace(f"{postings_path}.tmp", postings_path)
+
+        meta = {
+            "format_version": LEXICAL_INDEX_FORMAT_VERSION,
+            "index_version": self.index_version,
+            "ngram_sizes": list(self.ngram_sizes),
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "terms": self.terms,
+        }
+        meta_path = os.path.join(directory, _META_FILE_NAME)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """保存済みの転置インデックスを読み込む（存在しない・壊れている場合はNone）"""
+        meta_path = os.path.join(directory, _META_FILE_NAME)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != LEXICAL_INDEX_FORMAT_VERSION:
+                return None
+            with np.load(os.path.join(directory, _POSTINGS_FILE_NAME)) as data:
+                offsets = data["offsets"]
+                documents = data["documents"]
+                frequencies = data["frequencies"]
+                document_lengths = data["document_lengths"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"語彙インデックスを読み込めません: {e}")
+            return None
+
+        if (
+            len(document_lengths) != len(meta["ids"])
+            or len(offsets) != len(meta["terms"]) + 1
+        ):
+            logger.warning("語彙インデックスのファイルが一致しないため破棄します")
+            return None
+
+        return cls(
+            meta["ids"],
+            meta["terms"],
+            offsets,
+            documents,
+            frequencies,
+            document_lengths,
+            meta["ngram_sizes"],
+            meta["k1"],
+            meta["b"],
+            meta["index_version"],
+        )
@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.services.quantized_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+NUMPY_STORE_DIRECTORY_NAME = "numpy_store"
+NUMPY_STORE_DTYPES = ("float32", "float16")
+
+_VECTORS_FILE_NAME = "vectors.npy"
+_DOCUMENTS_FILE_NAME = "documents.json"
+# float16の行列を一度にfloat32へ展開する行数（一時配列のメモリを抑える）
+_SCAN_BLOCK_ROWS = 4096
+
+
+class NumpyVectorStore(VectorStore):
+    """正規化済みベクトルを1つの連続した行列で保持するインプロセスのベクトルストア
+
+    数千チャンク程度のコーパスでは、HNSWなどの近似インデックスよりも
+    行列とクエリベクトルの積1回と ``argpartition`` による全件走査の方が速く、
+    起動時の読み込みも行列ファイルをメモリマップするだけで済む。
+
+    RAGServiceが利用するChromaのメソッド（get、get_by_ids、delete_collectionなど）と
+    同じ形で応答し、距離もChromaの既定（l2）と同じ 2 - 2cos で返す。
+    """
+
+    def __init__(
+        self,
+        persist_directory: Optional[str] = None,
+        embedding_function: Optional[Embeddings] = None,
+        dtype: str = "float32",
+        mmap: bool = True,
+    ):
+        if dtype not in NUMPY_STORE_DTYPES:
+            raise ValueError(f"未対応のベクトルの精度です: {dtype}")
+        self.persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self.mmap = mmap
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((0, 0), dtype=self.dtype)
+
+        if persist_directory:
+            self._load()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32",
+        mmap: bool = True,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """テキストを埋め込んでストアを作成"""
+        store = cls(persist_directory, embedding, dtype=dtype, mmap=mmap)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """テキストを埋め込んで追加（同じIDは置き換える）"""
+        texts = list(texts)
+        if not texts:
+            return []
+        if self._embedding_function is None:
+            raise ValueError("埋め込みが設定されていないためテキストを追加できません")
+
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        vectors = normalize_rows(
+            self._embedding_function.embed_documents(texts)
+        ).astype(self.dtype)
+
+        with self._lock:
+            self._remove({chunk_id for chunk_id in ids if chunk_id in self._positions})
+            matrix = np.asarray(self._matrix)
+            self._matrix = np.concatenate([matrix, vectors]) if len(matrix) else vectors
+            self._ids = self._ids + ids
+            self._texts = self._texts + texts
+            self._metadatas = self._metadatas + metadatas
+            self._reindex()
+            self._save()
+
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """指定したIDのベクトルを削除"""
+        if not ids:
+            return None
+        with self._lock:
+            self._remove(set(ids))
+            self._save()
+        return True
+
+    def delete_collection(self) -> None:
+        """すべてのベクトルを削除"""
+        with self._lock:
+            self._ids, self._texts, self._metadatas = [], [], []
+            self._matrix = np.zeros((0, 0), dtype=self.dtype)
+            self._reindex()
+            self._save()
+
+    def get(
+        self, ids: Optional[Sequence[str]] = None, include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """格納済みのデータをChromaと同じ形式の辞書で返す"""
+        include = include if include is not None else ["documents", "metadatas"]
+        with self._lock:
+            if ids is None:
+                positions = list(range(len(self._ids)))
+            else:
+                positions = [
+                    self._positions[chunk_id]
+                    for chunk_id in ids
+                    if chunk_id in self._positions
+                ]
+            result: Dict[str, Any] = {"ids": [self._ids[p] for p in positions]}
+            if "documents" in include:
+                result["documents"] = [self._texts[p] for p in positions]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[p] for p in positions]
+            if "embeddings" in include:
+                result["embeddings"] = np.asarray(
+                    self._matrix[positions], dtype=np.float32
+                )
+        return result
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        """IDに対応するドキュメントを返す（存在しないIDは無視）"""
+        with self._lock:
+            return [
+                self._document(self._positions[chunk_id])
+                for chunk_id in ids
+                if chunk_id in self._positions
+            ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self._embedding_function.embed_query(query), k
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_by_vector_with_relevance_scores(
+                embedding, k
+            )
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """クエリベクトルに近い上位k件を (ドキュメント, 距離) の近い順で返す"""
+        # 追加・削除は新しい配列に置き換えるため、参照を取得した後はロックなしで走査できる
+        with self._lock:
+            matrix, ids = self._matrix, self._ids
+            texts, metadatas = self._texts, self._metadatas
+        count = len(matrix)
+        if k <= 0 or count == 0:
+            return []
+
+        scores = self._scores(matrix, normalize_rows(embedding))
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            (
+                Document(id=ids[i], page_content=texts[i], metadata=metadatas[i]),
+                max(2.0 - 2.0 * float(scores[i]), 0.0),
+            )
+            for i in top
+        ]
+
+    @staticmethod
+    def _scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """全ベクトルとのコサイン類似度"""
+        if matrix.dtype == np.float32:
+            return np.asarray(matrix @ query)
+
+        # float16の行列積はBLASが使えず遅いため、ブロックごとにfloat32で計算する
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), _SCAN_BLOCK_ROWS):
+            block = matrix[start : start + _SCAN_BLOCK_ROWS]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def _document(self, position: int) -> Document:
+        return Document(
+            id=self._ids[position],
+            page_content=self._texts[position],
+            metadata=self._metadatas[position],
+        )
+
+    def _remove(self, ids: set) -> None:
+        if not ids:
+            return
+        keep = [p for p, chunk_id in enumerate(self._ids) if chunk_id not in ids]
+        self._matrix = np.asarray(self._matrix)[keep]
+        self._ids = [self._ids[p] for p in keep]
+        self._texts = [self._texts[p] for p in keep]
+        self._metadatas = [self._metadatas[p] for p in keep]
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self._positions = {chunk_id: p for p, chunk_id in enumerate(self._ids)}
+
+    def _directory(self) -> str:
+        return os.path.join(self.persist_directory, NUMPY_STORE_DIRECTORY_NAME)
+
+    def _save(self) -> None:
+        """行列とドキュメントを保存（ドキュメントは最後に書き込む）"""
+        if not self.persist_directory:
+            return
+
+        directory = self._directory()
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, _VECTORS_FILE_NAME)
+        with open(f"{vectors_path}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self._matrix))
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+
+        documents_path = os.path.join(directory, _DOCUMENTS_FILE_NAME)
+        with open(f"{documents_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ids": self._ids,
+                    "texts": self._texts,
+                    "metadatas": self._metadatas,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(f"{documents_path}.tmp", documents_path)
+
+    def _load(self) -> None:
+        directory = self._directory()
+        documents_path = os.path.join(directory, _DOCUMENTS_FILE_NAME)
+        if not os.path.exists(documents_path):
+            return
+
+        try:
+            with open(documents_path, encoding="utf-8") as f:
+                documents = json.load(f)
+            matrix = np.load(
+                os.path.join(directory, _VECTORS_FILE_NAME),
+                mmap_mode="r" if self.mmap else None,
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(f"ベクトルストアを読み込めません: {e}")
+            return
+
+        if len(matrix) != len(documents["ids"]):
+            logger.warning("ベクトルとドキュメントの件数が一致しないため破棄します")
+            return
+
+        if matrix.dtype != self.dtype:
+            matrix = matrix.astype(self.dtype)
+        self._matrix = matrix
+        self._ids = documents["ids"]
+        self._texts = documents["texts"]
+        self._metadatas = documents["metadatas"]
+        self._reindex()
@@ -0,0 +1,143 @@
+import logging
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_FILE_NAME = "model.onnx"
+QUANTIZED_MODEL_FILE_NAME = "model.int8.onnx"
+TOKENIZER_FILE_NAME = "tokenizer.json"
+
+
+def onnx_model_directory(base_directory: str, model_name: str) -> str:
+    """モデルごとのONNX出力先ディレクトリ"""
+    return os.path.join(base_directory, model_name.replace("/", "__"))
+
+
+def export_onnx_model(model_name: str, output_directory: str, quantize: bool) -> str:
+    """Hugging FaceのモデルをONNX形式に変換し、必要に応じてint8に動的量子化する
+
+    変換にはtorchとtransformersが必要（推論時には不要）。
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_directory, exist_ok=True)
+    model_path = os.path.join(output_directory, ONNX_MODEL_FILE_NAME)
+
+    if not os.path.exists(model_path):
+        logger.info(f"埋め込みモデルをONNX形式に変換中: {model_name}")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+
+        sample = tokenizer(["サンプル"], return_tensors="pt")
+        dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"}}
+        dynamic_axes["attention_mask"] = {0: "batch", 1: "sequence"}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                model_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+            )
+        tokenizer.backend_tokenizer.save(
+            os.path.join(output_directory, TOKENIZER_FILE_NAME)
+        )
+
+    if not quantize:
+        return model_path
+
+    quantized_path = os.path.join(output_directory, QUANTIZED_MODEL_FILE_NAME)
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("ONNXモデルをint8に動的量子化中...")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def mean_pool_and_normalize(
+    last_hidden_state: np.ndarray, attention_mask: np.ndarray
+) -> np.ndarray:
+    """パディングを除いたトークンの平均をL2正規化する（sentence-transformersと同じ処理）"""
+    mask = attention_mask[..., np.newaxis].astype(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norms, 1e-12, None)
+
+
+class OnnxEmbeddings(Embeddings):
+    """ONNX Runtime上で埋め込みモデルを実行するEmbeddings実装"""
+
+    def __init__(
+        self,
+        model_name: str,
+        model_directory: str,
+        quantize: bool = True,
+        max_length: int = 512,
+    ):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        directory = onnx_model_directory(model_directory, model_name)
+        model_path = os.path.join(
+            directory,
+            QUANTIZED_MODEL_FILE_NAME if quantize else ONNX_MODEL_FILE_NAME,
+        )
+        if not os.path.exists(model_path):
+            model_path = export_onnx_model(model_name, directory, quantize)
+
+        self.tokenizer = Tokenizer.from_file(
+            os.path.join(directory, TOKENIZER_FILE_NAME)
+        )
+        # sentence-transformersと同じくモデルの最大長で切り詰め、バッチ内で揃える
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = next(
+            (
+                token
+                for token in ("<pad>", "[PAD]")
+                if self.tokenizer.token_to_id(token) is not None
+            ),
+            "[PAD]",
+        )
+        self.tokenizer.enable_padding(
+            pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token
+        )
+
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """複数のテキストを正規化済みの埋め込みベクトルに変換"""
+        if not texts:
+            return []
+
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array(
+            [encoding.attention_mask for encoding in encodings], dtype=np.int64
+        )
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        last_hidden_state = self.session.run(None, inputs)[0]
+        return mean_pool_and_normalize(last_hidden_state, attention_mask).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """テキストを正規化済みの埋め込みベクトルに変換"""
+        return self.embed_documents([text])[0]
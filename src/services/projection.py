@@ -0,0 +1,107 @@
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.services.quantized_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_FILE_NAME = "projection.npz"
+
+
+class PCAProjection:
+    """インデックス構築時に学習した主成分へ埋め込みベクトルを射影する次元削減
+
+    検索の順位は元のベクトル同士のコサイン類似度で決まるため、平均を引かない
+    （原点まわりの）主成分で近似する。平均を引くとe5のベクトルに共通する偏りが
+    失われ、削減前と順位が変わりやすい。
+    射影後のベクトルは再度L2正規化するため、距離の尺度（2 - 2cos）は変わらない。
+    """
+
+    def __init__(self, components: np.ndarray, explained_variance_ratio: float = 0.0):
+        # (削減後の次元数, 元の次元数)
+        self.components = components.astype(np.float32)
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @property
+    def input_dimension(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def output_dimension(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dimension: int) -> "PCAProjection":
+        """文書ベクトルの主成分を学習"""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if dimension <= 0 or dimension > vectors.shape[1]:
+            raise ValueError(
+                f"削減後の次元数は1以上{vectors.shape[1]}以下で指定してください: "
+                f"{dimension}"
+            )
+
+        # 文書数に依存しないよう、2次モーメント行列（次元数×次元数）の固有値分解で求める
+        second_moment = vectors.T @ vectors / max(len(vectors), 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(second_moment)
+        order = np.argsort(eigenvalues)[::-1][:dimension]
+
+        total_variance = eigenvalues.sum()
+        explained = (
+            float(eigenvalues[order].sum() / total_variance) if total_variance else 1.0
+        )
+        return cls(eigenvectors[:, order].T, explained)
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """ベクトルを射影して正規化"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return normalize_rows(vectors @ self.components.T)
+
+    def save(self, path: str) -> None:
+        """射影行列を保存"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                components=self.components,
+                explained_variance_ratio=self.explained_variance_ratio,
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["PCAProjection"]:
+        """保存済みの射影行列を読み込む（存在しない・壊れている場合はNone）"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data["components"], float(data["explained_variance_ratio"]))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"射影行列を読み込めません: {e}")
+            return None
+
+
+class ProjectedEmbeddings(Embeddings):
+    """埋め込み結果に次元削減を適用するラッパー"""
+
+    def __init__(self, embeddings: Embeddings, projection: PCAProjection):
+        self.embeddings = embeddings
+        self.projection = projection
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.projection.transform(
+            self.embeddings.embed_documents(texts)
+        ).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.projection.transform(self.embeddings.embed_query(text)).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await self.embeddings.aembed_query(text)
+        return self.projection.transform(vector).tolist()
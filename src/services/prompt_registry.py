@@ -0,0 +1,91 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+from langchain.chains import LLMChain
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.language_models import BaseLanguageModel
+
+from src.config.prompts import PromptTemplates
+from src.services.answer_cache import prompt_template_hash
+
+# 会話履歴がある場合にシステムプロンプトの後ろに付け加える指示（履歴は{history}に入る）
+HISTORY_PROMPT_SUFFIX = """
+
+以下は今までの会話履歴です：
+{history}
+
+上記の会話履歴を考慮して、一貫性のある回答を提供してください。前回の質問や回答と関連がある場合は、それを踏まえて回答してください。"""
+
+
+class CompiledPrompt:
+    """組み立て済みのプロンプトテンプレートと、それを使うLLMチェーン"""
+
+    def __init__(self, prompt: ChatPromptTemplate, llm: BaseLanguageModel):
+        self.prompt = prompt
+        self.llm = llm
+        self._chain: Optional[LLMChain] = None
+
+    @property
+    def chain(self) -> LLMChain:
+        """LLMチェーン（ストリーミングではプロンプトだけを使うため、初回の利用時に作成）"""
+        if self._chain is None:
+            self._chain = LLMChain(llm=self.llm, prompt=self.prompt)
+        return self._chain
+
+
+class PromptRegistry:
+    """回答生成のプロンプトテンプレートとLLMチェーンを設定ごとに1回だけ組み立てて再利用する
+
+    キーはテンプレートの内容のハッシュ値・モデル・温度・会話履歴の有無。
+    会話履歴はテンプレートに埋め込まず変数として渡すため、履歴が変わっても作り直さない。
+    テンプレートを差し替えた場合は invalidate() で組み立て済みのものを破棄する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled: Dict[Tuple[str, str, float, bool], CompiledPrompt] = {}
+        # 直近のテンプレートとそのハッシュ値（同じオブジェクトであれば再計算しない）
+        self._templates: Optional[PromptTemplates] = None
+        self._templates_hash = ""
+        self.builds = 0
+
+    def template_hash(self, templates: PromptTemplates) -> str:
+        """テンプレートの内容のハッシュ値"""
+        with self._lock:
+            if templates is not self._templates:
+                self._templates_hash = prompt_template_hash(templates)
+                self._templates = templates
+            return self._templates_hash
+
+    def get(
+        self,
+        templates: PromptTemplates,
+        llm: BaseLanguageModel,
+        model: str,
+        temperature: float,
+        with_history: bool = False,
+    ) -> CompiledPrompt:
+        """組み立て済みのプロンプトとチェーンを返す（未作成の場合は組み立てる）"""
+        key = (self.template_hash(templates), model, temperature, with_history)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                system_prompt = templates.system_prompt
+                if with_history:
+                    system_prompt += HISTORY_PROMPT_SUFFIX
+                prompt = ChatPromptTemplate.from_messages(
+                    [("system", system_prompt), ("human", templates.human_prompt)]
+                )
+                compiled = self._compiled[key] = CompiledPrompt(prompt, llm)
+                self.builds += 1
+            return compiled
+
+    def invalidate(self) -> None:
+        """組み立て済みのプロンプトとチェーンをすべて破棄する"""
+        with self._lock:
+            self._compiled.clear()
+            self._templates = None
+            self._templates_hash = ""
+
+    def __len__(self) -> int:
+        return len(self._compiled)
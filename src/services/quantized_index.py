@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("int8", "binary")
+QUANTIZED_INDEX_DIRECTORY_NAME = "quantized_index"
+QUANTIZED_INDEX_FORMAT_VERSION = 1
+
+_META_FILE_NAME = "meta.json"
+_CODES_FILE_NAME = "codes.npy"
+_SCALES_FILE_NAME = "scales.npy"
+_ORIGINALS_FILE_NAME = "originals.npy"
+_CENTER_FILE_NAME = "center.npy"
+
+# 1バイト中の立っているビット数（ハミング距離の計算用）
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+# 一次検索で一度に展開する行数（一時配列のメモリを抑える）
+_SCAN_BLOCK_ROWS = 4096
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """各行をL2正規化したfloat32の配列を返す"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ベクトルごとの最大絶対値でスケーリングしてint8に量子化し、(符号, スケール) を返す"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(
+    vectors: np.ndarray, center: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """各次元の符号（centerからの差の符号）を1ビットにまとめた符号を返す
+
+    e5のベクトルは全体が同じ方向に偏っているため、平均を引いてから符号化しないと
+    多くのビットがどの文書でも同じ値になり、ハミング距離で区別できなくなる。
+    """
+    if center is not None:
+        vectors = vectors - center
+    return np.packbits(vectors > 0, axis=-1)
+
+
+class QuantizedVectorIndex:
+    """量子化ベクトルで候補を絞り込み、元のベクトルで再スコアリングする検索インデックス
+
+    一次検索はint8（4分の1）またはバイナリ（32分の1）の符号だけを走査し、
+    上位 ``k * rescore_multiplier`` 件の候補をfloat16で保持した元のベクトルで
+    正確なコサイン類似度により並べ直す。元のベクトルはメモリマップで読み込むため、
+    常駐するのは主に量子化された符号のみになる。
+    バイナリ符号は粗いため、int8より大きなrescore_multiplierと組み合わせて使う。
+
+    距離は正規化済みベクトル間のユークリッド距離の2乗（2 - 2cos）で返し、
+    Chromaの既定（l2）と同じ尺度にそろえる。
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        codes: np.ndarray,
+        scales: Optional[np.ndarray],
+        originals: np.ndarray,
+        mode: str,
+        index_version: Optional[str] = None,
+        center: Optional[np.ndarray] = None,
+    ):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"未対応の量子化方式です: {mode}")
+        self.ids = list(ids)
+        self.codes = codes
+        self.scales = scales
+        # バイナリ符号化の基準点（文書ベクトルの平均）
+        self.center = center
+        self.originals = originals
+        self.mode = mode
+        self.index_version = index_version
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        mode: str = "int8",
+        index_version: Optional[str] = None,
+    ) -> "QuantizedVectorIndex":
+        """埋め込みベクトルから量子化インデックスを構築"""
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"未対応の量子化方式です: {mode}")
+        vectors = normalize_rows(vectors)
+        center = None
+        if mode == "int8":
+            codes, scales = quantize_int8(vectors)
+        else:
+            center = (
+                vectors.mean(axis=0) if len(vectors) else np.zeros(vectors.shape[1:])
+            ).astype(np.float32)
+            codes, scales = quantize_binary(vectors, center), None
+        return cls(
+            ids,
+            codes,
+            scales,
+            vectors.astype(np.float16),
+            mode,
+            index_version,
+            center,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def code_bytes(self) -> int:
+        """一次検索で走査する量子化符号のバイト数"""
+        return self.codes.nbytes + (
+            self.scales.nbytes if self.scales is not None else 0
+        )
+
+    def search(
+        self, query: Sequence[float], k: int, rescore_multiplier: int = 4
+    ) -> List[Tuple[str, float]]:
+        """クエリに近い上位k件の (ID, 距離) を近い順に返す"""
+        if k <= 0 or not self.ids:
+            return []
+
+        query_vector = normalize_rows(query)
+        candidate_count = min(len(self.ids), k * max(rescore_multiplier, 1))
+        scores = self._approximate_scores(query_vector)
+        if candidate_count < len(self.ids):
+            candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        else:
+            candidates = np.arange(len(self.ids))
+
+        # 候補だけを元のベクトルで再スコアリング（連続読み出しになるよう昇順に並べる）
+        candidates.sort()
+        similarities = self.originals[candidates].astype(np.float32) @ query_vector
+        order = np.argsort(-similarities, kind="stable")[:k]
+
+        return [
+            (
+                self.ids[candidates[index]],
+                max(2.0 - 2.0 * float(similarities[index]), 0.0),
+            )
+            for index in order
+        ]
+
+    def _approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """量子化符号による近似スコア（大きいほど近い）"""
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        if self.mode == "binary":
+            query_code = quantize_binary(query, self.center)
+            bits = self.codes.shape[1] * 8
+            for start in range(0, len(self.ids), _SCAN_BLOCK_ROWS):
+                block = self.codes[start : start + _SCAN_BLOCK_ROWS]
+                distance = _POPCOUNT[block ^ query_code].sum(axis=1, dtype=np.int32)
+                scores[start : start + len(block)] = bits - distance
+        else:
+            for start in range(0, len(self.ids), _SCAN_BLOCK_ROWS):
+                block = self.codes[start : start + _SCAN_BLOCK_ROWS]
+                scores[start : start + len(block)] = (
+                    block.astype(np.float32) @ query
+                ) * self.scales[start : start + len(block)]
+        return scores
+
+    def save(self, directory: str) -> None:
+        """インデックスをディレクトリに保存（メタデータは最後に書き込む）"""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {_CODES_FILE_NAME: self.codes, _ORIGINALS_FILE_NAME: self.originals}
+        if self.scales is not None:
+            arrays[_SCALES_FILE_NAME] = self.scales
+        if self.center is not None:
+            arrays[_CENTER_FILE_NAME] = self.center
+        for file_name, array in arrays.items():
+            _atomic_save_array(os.path.join(directory, file_name), array)
+
+        meta = {
+            "format_version": QUANTIZED_INDEX_FORMAT_VERSION,
+            "mode": self.mode,
+            "index_version": self.index_version,
+            "ids": self.ids,
+        }
+        meta_path = os.path.join(directory, _META_FILE_NAME)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["QuantizedVectorIndex"]:
+        """保存済みのインデックスを読み込む（存在しない・壊れている場合はNone）"""
+        meta_path = os.path.join(directory, _META_FILE_NAME)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != QUANTIZED_INDEX_FORMAT_VERSION:
+                return None
+
+            codes = np.load(os.path.join(directory, _CODES_FILE_NAME))
+            scales = center = None
+            if meta["mode"] == "int8":
+                scales = np.load(os.path.join(directory, _SCALES_FILE_NAME))
+            else:
+                center = np.load(os.path.join(directory, _CENTER_FILE_NAME))
+            # 元のベクトルは再スコアリング時に候補の行だけを読めばよい
+            originals = np.load(
+                os.path.join(directory, _ORIGINALS_FILE_NAME), mmap_mode="r"
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"量子化インデックスを読み込めません: {e}")
+            return None
+
+        if not (len(meta["ids"]) == len(codes) == len(originals)):
+            logger.warning("量子化インデックスのファイルが一致しないため破棄します")
+            return None
+
+        return cls(
+            meta["ids"],
+            codes,
+            scales,
+            originals,
+            meta["mode"],
+            meta["index_version"],
+            center,
+        )
+
+
+def _atomic_save_array(path: str, array: np.ndarray) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(temp_path, path)
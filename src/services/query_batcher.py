@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """同時に届いたクエリをまとめて1回のモデル呼び出しで埋め込むマイクロバッチャー
+
+    最初のクエリが届いてから最大max_wait_msだけ後続のクエリを待ち、
+    max_batch_sizeに達した時点で即座にまとめて埋め込む。
+    モデル呼び出しはスレッドプールで実行し、イベントループを塞がない。
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # モデル呼び出しを実行するスレッドプール（Noneの場合はイベントループの既定のもの）
+        self.executor = executor
+        # 処理したバッチ数とクエリ数（平均バッチサイズの確認用）
+        self.batch_count = 0
+        self.query_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # 実行中のバッチ（タスクがGCで破棄されないよう参照を保持する）
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, text: str) -> List[float]:
+        """クエリを登録し、バッチ処理の結果を待つ"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # イベントループごとに待ち行列を持つ（テストなどでループが変わる場合）
+            self._loop = loop
+            self._pending = {}
+            self._flush_handle = None
+
+        future = loop.create_future()
+        # 同じクエリはバッチ内で1回だけ埋め込む
+        self._pending.setdefault(text, []).append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def stats(self) -> dict:
+        """バッチ処理の統計情報を返す"""
+        return {
+            "batches": self.batch_count,
+            "queries": self.query_count,
+            "average_batch_size": (
+                self.query_count / self.batch_count if self.batch_count else 0.0
+            ),
+        }
+
+    def _flush(self) -> None:
+        """待機中のクエリをまとめてバッチとして送出"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, {}
+        if pending:
+            task = self._loop.create_task(self._run_batch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, pending: Dict[str, List[asyncio.Future]]) -> None:
+        texts = list(pending)
+        self.batch_count += 1
+        self.query_count += len(texts)
+
+        try:
+            vectors = await self._loop.run_in_executor(
+                self.executor, self.encode, texts
+            )
+        except Exception as e:
+            logger.error(f"クエリのバッチ埋め込みに失敗しました: {e}")
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for text, vector in zip(texts, vectors):
+            for future in pending[text]:
+                if not future.done():
+                    # 呼び出し側での変更が他の呼び出し元に波及しないようコピーを渡す
+                    future.set_result(list(vector))
@@ -1,15 +1,57 @@
+import asyncio
+import contextlib
+import functools
+import json
 import os
-from typing import List, Optional, Tuple, Dict
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, Tuple, Dict
+import numpy as np
 from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from langchain_openai import ChatOpenAI
 from langchain.schema import Document
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain
 import logging
 
-from src.services.document_loader import DocumentLoader
-from src.services.embeddings import EmbeddingService
-from src.services.session_service import SessionService
+from src.services.answer_cache import (
+    MemoryAnswerCache,
+    SQLiteAnswerCache,
+    answer_cache_key,
+)
+from src.services.corpus_loader import CorpusLoader, resolve_spec_files
+from src.services.embedding_server import RemoteEmbeddingService
+from src.services.embeddings import EmbeddingService, embedding_service_options
+from src.services.executors import ExecutorRegistry, iterate_in_executor
+from src.services.index_manifest import (
+    IndexManifest,
+    assign_chunk_ids,
+    compute_chunk_id,
+    diff_chunk_ids,
+)
+from src.services.lexical_index import (
+    LEXICAL_INDEX_DIRECTORY_NAME,
+    BM25Index,
+    reciprocal_rank_fusion,
+)
+from src.services.numpy_vector_store import NumpyVectorStore
+from src.services.projection import (
+    PROJECTION_FILE_NAME,
+    PCAProjection,
+    ProjectedEmbeddings,
+)
+from src.services.prompt_registry import CompiledPrompt, PromptRegistry
+from src.services.quantized_index import (
+    QUANTIZED_INDEX_DIRECTORY_NAME,
+    QuantizedVectorIndex,
+    normalize_rows,
+)
+from src.services.reranker import CrossEncoderReranker
+from src.services.semantic_cache import SemanticAnswerCache
+from src.services.session_service import AsyncSessionService, SessionService
+from src.services.single_flight import SingleFlight
+from src.services.token_counter import (
+    get_embedding_token_counter,
+    get_tiktoken_counter,
+)
 from src.models.database import get_database_manager_singleton
 from src.models.schemas import SourceDocument, ChatResponse
 from src.config.settings import Settings
@@ -20,61 +62,451 @@ logger = logging.getLogger(__name__)
 class RAGService:
     def __init__(self, settings: Settings):
         self.settings = settings
-        self.embedding_service = EmbeddingService(settings.embedding_model_name)
-        self.vector_store: Optional[Chroma] = None
+        # CPU処理・データベース・外部呼び出しで別々のスレッドプールを使う
+        self.executors = ExecutorRegistry.from_settings(settings)
+        if settings.embedding_server_socket:
+            # モデルは埋め込みサーバーが保持し、各ワーカーはソケット経由で呼び出す
+            self.embedding_service = RemoteEmbeddingService(
+                settings.embedding_server_socket,
+                executor=self.executors.get("upstream"),
+                batch_size=settings.embedding_batch_size,
+            )
+        else:
+            self.embedding_service = EmbeddingService(
+                settings.embedding_model_name,
+                executor=self.executors.get("embedding"),
+                **embedding_service_options(settings),
+            )
+        # 指定時は広めに取得した検索結果をクロスエンコーダーで並べ替える
+        self.reranker: Optional[CrossEncoderReranker] = (
+            CrossEncoderReranker(
+                settings.reranker_model_name,
+                cache_size=settings.rerank_cache_size,
+                batch_size=settings.rerank_batch_size,
+            )
+            if settings.reranker_model_name
+            else None
+        )
+        # 指定時は履歴のない質問に、言い回しの近い過去の質問の回答を返す
+        self.semantic_cache: Optional[SemanticAnswerCache] = (
+            SemanticAnswerCache(
+                settings.semantic_cache_size,
+                settings.semantic_cache_max_distance,
+                settings.semantic_cache_ttl_seconds,
+            )
+            if settings.semantic_cache_size > 0
+            else None
+        )
+        # 指定時は同じ質問・検索結果・テンプレート・モデルの回答を再利用する
+        self.answer_cache = self._create_answer_cache()
+        # 同時に届いた同じ質問の回答生成を1回のLLM呼び出しにまとめる
+        self.single_flight: Optional[SingleFlight[str]] = (
+            SingleFlight() if settings.coalesce_generations else None
+        )
+        self.vector_store: Optional[VectorStore] = None
+        # 指定時は文書・クエリのベクトルを次元削減してから格納・検索する
+        self.projection: Optional[PCAProjection] = None
+        # 指定時はChromaの代わりに量子化インデックスで近傍を検索する
+        self.quantized_index: Optional[QuantizedVectorIndex] = None
+        # 指定時はベクトル検索の結果に文字n-gramのBM25検索の結果を統合する
+        self.lexical_index: Optional[BM25Index] = None
+        # インデックス内容のバージョン（再構築・差分更新のたびに変わる）
+        self.index_version: Optional[str] = None
         self.llm = ChatOpenAI(
             api_key=settings.openai_api_key,
             model=settings.openai_model,
             temperature=settings.openai_temperature,
         )
+        # 回答生成のプロンプトとLLMチェーン（テンプレート・モデル・温度ごとに1回だけ組み立てる）
+        self.prompts = PromptRegistry()
         # セッション管理サービス初期化（シングルトンを使用）
         self.db_manager = get_database_manager_singleton().get_database_manager()
         self.session_service = SessionService(self.db_manager)
+        self.async_session_service = AsyncSessionService(
+            self.session_service, self.executors.get("db")
+        )
         self._initialize_vector_store()
 
     def _initialize_vector_store(self):
         """ベクトルストアを初期化"""
         try:
-            # 既存のベクトルストアをロード、または新規作成
+            # 既存のベクトルストアをロードして差分更新、または新規作成
             if os.path.exists(self.settings.chroma_persist_directory):
                 logger.info("既存のベクトルストアをロード中...")
-                self.vector_store = Chroma(
+                if self.settings.embedding_projection_dimension:
+                    self.projection = PCAProjection.load(self._projection_path())
+                self.vector_store = self._vector_store_class()(
                     persist_directory=self.settings.chroma_persist_directory,
-                    embedding_function=self.embedding_service.embeddings,
+                    embedding_function=self._store_embeddings(),
+                    **self._vector_store_options(),
                 )
+                self._sync_vector_store()
             else:
                 logger.info("新規ベクトルストアを作成中...")
                 self._create_vector_store()
+            if self.settings.vector_quantization:
+                self._load_quantized_index()
+            if self.settings.hybrid_search:
+                self._load_lexical_index()
         except Exception as e:
             logger.error(f"ベクトルストアの初期化に失敗しました: {e}")
             raise
 
-    def _create_vector_store(self):
-        """ドキュメントをロードしてベクトルストアを作成"""
-        loader = DocumentLoader(
+    def _vector_store_class(self) -> type:
+        """設定に応じたベクトルストアの実装を返す"""
+        backend = self.settings.vector_store_backend
+        if backend == "chroma":
+            return Chroma
+        if backend == "numpy":
+            return NumpyVectorStore
+        raise ValueError(f"未対応のベクトルストアです: {backend}")
+
+    def _create_answer_cache(self):
+        """設定に応じた回答の完全一致キャッシュを作成（無効時はNone）"""
+        backend = self.settings.answer_cache_backend
+        if not backend:
+            return None
+        if backend == "memory":
+            return MemoryAnswerCache(self.settings.answer_cache_size)
+        if backend == "sqlite":
+            return SQLiteAnswerCache(
+                self.settings.answer_cache_path, self.settings.answer_cache_size
+            )
+        raise ValueError(f"未対応の回答キャッシュです: {backend}")
+
+    def _vector_store_options(self) -> dict:
+        """ベクトルストアの実装ごとの追加の引数"""
+        if self.settings.vector_store_backend == "numpy":
+            return {
+                "dtype": self.settings.numpy_vector_dtype,
+                "mmap": self.settings.numpy_vector_mmap,
+            }
+        return {}
+
+    def _projection_path(self) -> str:
+        return os.path.join(
+            self.settings.chroma_persist_directory, PROJECTION_FILE_NAME
+        )
+
+    def _store_embeddings(self) -> Embeddings:
+        """ベクトルストアへの格納・検索に使う埋め込み（次元削減の有無を反映）"""
+        if self.projection is None:
+            return self.embedding_service
+        return ProjectedEmbeddings(self.embedding_service, self.projection)
+
+    def _fit_projection(self, documents: List[Document]):
+        """文書の埋め込みから次元削減の射影行列を学習して保存"""
+        dimension = self.settings.embedding_projection_dimension
+        logger.info(f"埋め込みを{dimension}次元に削減する射影行列を学習中...")
+        # 文書の埋め込みは永続キャッシュに入るため、格納時の再計算は発生しない
+        vectors = self.embedding_service.embed_documents(
+            [document.page_content for document in documents]
+        )
+        self.projection = PCAProjection.fit(np.asarray(vectors), dimension)
+        self.projection.save(self._projection_path())
+        logger.info(
+            f"射影行列を学習しました: {self.projection.input_dimension}次元 -> "
+            f"{dimension}次元, 寄与率={self.projection.explained_variance_ratio:.3f}"
+        )
+
+    def _load_documents(self) -> List[Document]:
+        """仕様書を読み込んでチャンクに分割"""
+        chunk_size = self.settings.chunk_size
+        chunk_overlap = self.settings.chunk_overlap
+        token_counter_model = None
+
+        chunk_size_unit = self.settings.chunk_size_unit
+        if chunk_size_unit not in ("chars", "tokens"):
+            raise ValueError(f"未対応のチャンクサイズの単位です: {chunk_size_unit}")
+
+        if chunk_size_unit == "tokens":
+            token_counter_model = self.settings.embedding_model_name
+            # 埋め込みモデルの上限を超えたチャンクは末尾が切り捨てられるため、
+            # 特殊トークン分を差し引いた上限にチャンクサイズを収める
+            token_counter = get_embedding_token_counter(
+                self.settings.embedding_model_name
+            )
+            max_chunk_tokens = (
+                self.settings.embedding_max_tokens - token_counter.reserved_tokens
+            )
+            if chunk_size > max_chunk_tokens:
+                logger.warning(
+                    f"チャンクサイズ({chunk_size})が埋め込みモデルの上限を超えるため"
+                    f"{max_chunk_tokens}トークンに制限します"
+                )
+                chunk_size = max_chunk_tokens
+                chunk_overlap = min(chunk_overlap, chunk_size - 1)
+
+        loader = CorpusLoader(
             self.settings.spec_file_path,
-            self.settings.chunk_size,
-            self.settings.chunk_overlap,
+            chunk_size,
+            chunk_overlap,
+            asset_directory=self.settings.asset_directory,
+            token_counter_model=token_counter_model,
+            max_workers=self.settings.corpus_max_workers,
         )
-        documents = loader.load_documents()
+        return loader.load_documents()
+
+    def _index_fingerprint(self) -> str:
+        """変更されるとベクトル全体の再計算が必要になる設定の指紋"""
+        fingerprint = {"embedding_model_name": self.settings.embedding_model_name}
+        if self.settings.vector_store_backend != "chroma":
+            # ストアを切り替えた場合は新しいストアに全件を格納し直す
+            fingerprint["vector_store_backend"] = self.settings.vector_store_backend
+        if self.settings.embedding_backend != "torch":
+            # 既定のバックエンドでは既存インデックスの指紋を変えない
+            fingerprint["embedding_backend"] = self.settings.embedding_backend
+            fingerprint["onnx_quantize"] = self.settings.onnx_quantize
+        if self.settings.embedding_projection_dimension:
+            fingerprint["projection_dimension"] = (
+                self.settings.embedding_projection_dimension
+            )
+        return json.dumps(fingerprint, sort_keys=True)
+
+    def _create_vector_store(self):
+        """ドキュメントをロードしてベクトルストアを作成"""
+        documents = self._load_documents()
+        chunk_ids = assign_chunk_ids(documents)
 
         logger.info(f"{len(documents)}個のドキュメントチャンクをベクトル化中...")
 
-        self.vector_store = Chroma.from_documents(
+        if self.settings.embedding_projection_dimension:
+            self._fit_projection(documents)
+
+        self.vector_store = self._vector_store_class().from_documents(
             documents=documents,
-            embedding=self.embedding_service.embeddings,
+            embedding=self._store_embeddings(),
+            ids=chunk_ids,
             persist_directory=self.settings.chroma_persist_directory,
+            **self._vector_store_options(),
         )
-        self.vector_store.persist()
+        manifest = IndexManifest(self.settings.chroma_persist_directory).save(
+            self._index_fingerprint(), chunk_ids
+        )
+        self.index_version = manifest["index_version"]
         logger.info("ベクトルストアの作成が完了しました")
 
+    def _sync_vector_store(self):
+        """仕様書の変更を差分としてベクトルストアに反映"""
+        manifest_store = IndexManifest(self.settings.chroma_persist_directory)
+        manifest = manifest_store.load()
+
+        if not resolve_spec_files(self.settings.spec_file_path):
+            logger.warning(
+                f"仕様書ファイルが見つからないため既存のインデックスを使用します: "
+                f"{self.settings.spec_file_path}"
+            )
+            self.index_version = manifest["index_version"] if manifest else None
+            return
+
+        fingerprint = self._index_fingerprint()
+        projection_missing = (
+            self.settings.embedding_projection_dimension and self.projection is None
+        )
+        if (
+            manifest is None
+            or manifest["fingerprint"] != fingerprint
+            or projection_missing
+        ):
+            # マニフェストがない（旧形式）、埋め込み設定が変わった、
+            # または射影行列が失われた場合は全再構築
+            logger.info("インデックスの設定が変更されたため全体を再構築します")
+            self.vector_store.delete_collection()
+            self._create_vector_store()
+            return
+
+        documents = self._load_documents()
+        chunk_ids = assign_chunk_ids(documents)
+        added_ids, removed_ids = diff_chunk_ids(manifest["chunk_ids"], chunk_ids)
+
+        if removed_ids:
+            self.vector_store.delete(ids=removed_ids)
+        if added_ids:
+            documents_by_id = dict(zip(chunk_ids, documents))
+            self.vector_store.add_documents(
+                [documents_by_id[chunk_id] for chunk_id in added_ids], ids=added_ids
+            )
+
+        if added_ids or removed_ids:
+            manifest = manifest_store.save(fingerprint, chunk_ids)
+        self.index_version = manifest["index_version"]
+
+        logger.info(
+            f"インデックスを差分更新しました: 追加={len(added_ids)}, "
+            f"削除={len(removed_ids)}, 変更なし={len(chunk_ids) - len(added_ids)}"
+        )
+
+    def _load_quantized_index(self):
+        """量子化インデックスを読み込む（インデックスの内容が変わっていれば再構築）"""
+        mode = self.settings.vector_quantization
+        directory = os.path.join(
+            self.settings.chroma_persist_directory, QUANTIZED_INDEX_DIRECTORY_NAME
+        )
+        index = QuantizedVectorIndex.load(directory)
+
+        if (
+            index is None
+            or index.mode != mode
+            or index.index_version != self.index_version
+        ):
+            logger.info(f"量子化インデックス({mode})を構築中...")
+            stored = self.vector_store.get(include=["embeddings"])
+            index = QuantizedVectorIndex.build(
+                stored["ids"],
+                np.asarray(stored["embeddings"], dtype=np.float32),
+                mode,
+                self.index_version,
+            )
+            index.save(directory)
+
+        self.quantized_index = index
+        logger.info(
+            f"量子化インデックスを読み込みました: {len(index)}件, "
+            f"符号サイズ={index.code_bytes / 1024:.1f}KB"
+        )
+
+    def _load_lexical_index(self):
+        """語彙インデックスを読み込む（インデックスの内容が変わっていれば再構築）"""
+        directory = os.path.join(
+            self.settings.chroma_persist_directory, LEXICAL_INDEX_DIRECTORY_NAME
+        )
+        index = BM25Index.load(directory)
+
+        if index is None or index.index_version != self.index_version:
+            logger.info("語彙インデックスを構築中...")
+            stored = self.vector_store.get(include=["documents"])
+            index = BM25Index.build(
+                stored["ids"], stored["documents"], index_version=self.index_version
+            )
+            index.save(directory)
+
+        self.lexical_index = index
+        logger.info(
+            f"語彙インデックスを読み込みました: {len(index)}件, "
+            f"語彙数={index.vocabulary_size}"
+        )
+
+    def _search_by_vector(
+        self, query_embedding: Sequence[float], k: int
+    ) -> List[Tuple[Document, float]]:
+        """クエリベクトルに近いドキュメントを (ドキュメント, 距離) の近い順で返す"""
+        if self.quantized_index is None:
+            return self.vector_store.similarity_search_by_vector_with_relevance_scores(
+                query_embedding, k=k
+            )
+
+        hits = self.quantized_index.search(
+            query_embedding, k, self.settings.quantization_rescore_multiplier
+        )
+        documents = {
+            document.id: document
+            for document in self.vector_store.get_by_ids(
+                [chunk_id for chunk_id, _ in hits]
+            )
+        }
+        return [
+            (documents[chunk_id], distance)
+            for chunk_id, distance in hits
+            if chunk_id in documents
+        ]
+
+    def _retrieve(
+        self, query: str, query_embedding: Sequence[float], k: int
+    ) -> List[Tuple[Document, float]]:
+        """ベクトル検索と語彙検索の結果を順位で統合し、上位k件を返す"""
+        if self.lexical_index is None:
+            return self._search_by_vector(query_embedding, k)
+
+        candidates = max(k, self.settings.hybrid_candidates)
+        dense = self._search_by_vector(query_embedding, candidates)
+        lexical = self.lexical_index.search(query, candidates)
+        fused = reciprocal_rank_fusion(
+            [
+                [document.id for document, _ in dense],
+                [chunk_id for chunk_id, _ in lexical],
+            ],
+            self.settings.hybrid_rrf_k,
+        )[:k]
+
+        results = {document.id: (document, distance) for document, distance in dense}
+        missing_ids = [chunk_id for chunk_id, _ in fused if chunk_id not in results]
+        if missing_ids:
+            # 語彙検索だけで見つかったチャンクも、しきい値や信頼度で扱えるよう
+            # ベクトル検索と同じ尺度（2 - 2cos）の距離を求める
+            stored = self.vector_store.get(
+                ids=missing_ids, include=["documents", "metadatas", "embeddings"]
+            )
+            vectors = normalize_rows(np.asarray(stored["embeddings"], dtype=np.float32))
+            distances = 2.0 - 2.0 * (vectors @ normalize_rows(query_embedding))
+            for chunk_id, text, metadata, distance in zip(
+                stored["ids"], stored["documents"], stored["metadatas"], distances
+            ):
+                results[chunk_id] = (
+                    Document(id=chunk_id, page_content=text, metadata=metadata or {}),
+                    max(float(distance), 0.0),
+                )
+
+        return [results[chunk_id] for chunk_id, _ in fused if chunk_id in results]
+
     def search(self, query: str, max_results: int = 3) -> List[Tuple[Document, float]]:
         """クエリに関連するドキュメントを検索"""
+        return self._search_with_embedding(query, max_results)[0]
+
+    def _search_with_embedding(
+        self, query: str, max_results: int
+    ) -> Tuple[List[Tuple[Document, float]], List[float]]:
+        """(検索結果, クエリベクトル) を返す（クエリベクトルは意味的キャッシュの参照に使う）"""
+        if not self.vector_store:
+            raise ValueError("ベクトルストアが初期化されていません")
+
+        # クエリベクトルはEmbeddingServiceのキャッシュを経由して取得し、ストアに直接渡す
+        query_embedding = self._store_embeddings().embed_query(query)
+        results = self._retrieve_and_rerank(query, query_embedding, max_results)
+        return results, query_embedding
+
+    async def asearch(
+        self, query: str, max_results: int = 3
+    ) -> List[Tuple[Document, float]]:
+        """クエリに関連するドキュメントを非同期に検索
+
+        クエリの埋め込みは同時に届いた他のクエリとまとめてバッチ処理される。
+        """
+        return (await self._asearch_with_embedding(query, max_results))[0]
+
+    async def _asearch_with_embedding(
+        self, query: str, max_results: int
+    ) -> Tuple[List[Tuple[Document, float]], List[float]]:
+        """_search_with_embeddingの非同期版"""
         if not self.vector_store:
             raise ValueError("ベクトルストアが初期化されていません")
 
-        results = self.vector_store.similarity_search_with_score(query, k=max_results)
+        query_embedding = await self._store_embeddings().aembed_query(query)
+        # 検索・リランキングはCPU処理のため、埋め込みと同じスレッドプールで実行する
+        results = await asyncio.get_running_loop().run_in_executor(
+            self.executors.get("embedding"),
+            functools.partial(
+                self._retrieve_and_rerank, query, query_embedding, max_results
+            ),
+        )
+        return results, query_embedding
+
+    def _retrieve_and_rerank(
+        self, query: str, query_embedding: Sequence[float], max_results: int
+    ) -> List[Tuple[Document, float]]:
+        """検索結果をしきい値でフィルタリングし、リランキング有効時は並べ替える"""
+        if self.reranker is None:
+            results = self._retrieve(query, query_embedding, max_results)
+            return self._filter_search_results(query, results)
 
+        candidates = max(max_results, self.settings.rerank_candidates)
+        results = self._retrieve(query, query_embedding, candidates)
+        results = self._filter_search_results(query, results)
+        return self.reranker.rerank(query, results, max_results)
+
+    def _filter_search_results(
+        self, query: str, results: List[Tuple[Document, float]]
+    ) -> List[Tuple[Document, float]]:
+        """検索結果をログに出力し、信頼度しきい値でフィルタリング"""
         # デバッグログ: 検索結果のスコアを出力
         logger.info(f"検索クエリ: {query}")
         logger.info(f"検索結果数: {len(results)}")
@@ -96,37 +528,94 @@ class RAGService:
 
         return filtered_results
 
-    def generate_answer(self, query: str, context_documents: List[Document]) -> str:
-        """コンテキストを基に回答を生成"""
-        # 設定からプロンプトテンプレートを取得
-        prompt_templates = self.settings.prompt_templates
+    def _build_context(
+        self, context_documents: List[Document], history_text: str = ""
+    ) -> str:
+        """検索結果をプロンプト用のコンテキストに整形し、最大長に収める"""
+        context_section_format = self.settings.prompt_templates.context_section_format
+        sections = [
+            context_section_format.format(
+                section=doc.metadata.get("section", "不明"),
+                content=doc.page_content,
+            )
+            for doc in context_documents
+        ]
 
-        # プロンプトテンプレートを作成
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                ("system", prompt_templates.system_prompt),
-                ("human", prompt_templates.human_prompt),
-            ]
+        if self.settings.max_context_tokens:
+            return self._pack_context_by_tokens(sections, history_text)
+
+        context = "\n\n".join(sections)
+
+        # 最大コンテキスト長を考慮（会話履歴の分も考慮）
+        max_context_length = self.settings.max_context_length - len(history_text)
+        if len(context) > max_context_length:
+            context = context[:max_context_length] + "..."
+
+        return context
+
+    def _pack_context_by_tokens(self, sections: List[str], history_text: str) -> str:
+        """関連度順のセクションをトークン予算いっぱいまで詰める"""
+        counter = get_tiktoken_counter(self.settings.openai_model)
+        budget = self.settings.max_context_tokens - counter.count(history_text)
+        separator_tokens = counter.count("\n\n")
+
+        packed: List[str] = []
+        for section in sections:
+            if packed:
+                budget -= separator_tokens
+            section_tokens = counter.count(section)
+            if section_tokens <= budget:
+                packed.append(section)
+                budget -= section_tokens
+                continue
+
+            # 収まらないセクションは残りの予算まで切り詰めて打ち切る
+            truncated = counter.truncate(section, budget)
+            if truncated:
+                packed.append(truncated)
+            break
+
+        return "\n\n".join(packed)
+
+    def _answer_prompt(
+        self,
+        context_documents: List[Document],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> Tuple[CompiledPrompt, Dict[str, str]]:
+        """組み立て済みの回答生成プロンプトと、その入力（質問以外）を返す"""
+        # プロンプトとチェーンは設定ごとに1回だけ組み立てて使い回す
+        compiled = self.prompts.get(
+            self.settings.prompt_templates,
+            self.llm,
+            self.settings.openai_model,
+            self.settings.openai_temperature,
+            with_history=bool(conversation_history),
         )
 
-        # コンテキストを整形（設定可能なフォーマットを使用）
-        context = "\n\n".join(
+        if not conversation_history:
+            # コンテキストを整形（設定可能なフォーマットを使用）
+            return compiled, {"context": self._build_context(context_documents)}
+
+        # 会話履歴を文字列に変換
+        history_text = "\n".join(
             [
-                prompt_templates.context_section_format.format(
-                    section=doc.metadata.get("section", "不明"),
-                    content=doc.page_content,
-                )
-                for doc in context_documents
+                f"{msg['role'].upper()}: {msg['content']}"
+                for msg in conversation_history[-10:]  # 最新10件まで
             ]
         )
 
-        # 最大コンテキスト長を考慮
-        if len(context) > self.settings.max_context_length:
-            context = context[: self.settings.max_context_length] + "..."
+        # コンテキストを整形（会話履歴の分も考慮）
+        return compiled, {
+            "context": self._build_context(context_documents, history_text),
+            "history": history_text,
+        }
 
-        # LLMチェーンを作成して実行
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
-        answer = chain.run(context=context, question=query)
+    def generate_answer(self, query: str, context_documents: List[Document]) -> str:
+        """コンテキストを基に回答を生成"""
+        compiled, inputs = self._answer_prompt(context_documents)
+
+        # LLMチェーンを実行
+        answer = compiled.chain.run(question=query, **inputs)
 
         return answer.strip()
 
@@ -137,136 +626,381 @@ class RAGService:
         conversation_history: List[Dict[str, str]] = None,
     ) -> str:
         """会話履歴を考慮した回答生成"""
-        # 設定からプロンプトテンプレートを取得
-        prompt_templates = self.settings.prompt_templates
+        compiled, inputs = self._answer_prompt(context_documents, conversation_history)
 
-        # 会話履歴を文字列に変換
-        history_text = ""
+        # LLMチェーンを実行
+        answer = compiled.chain.run(question=query, **inputs)
+
+        return answer.strip()
+
+    async def agenerate_answer(
+        self,
+        query: str,
+        context_documents: List[Document],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """回答を非同期に生成（会話履歴がある場合は考慮する）"""
+        compiled, inputs = self._answer_prompt(context_documents, conversation_history)
+
+        # LLMの非同期APIで呼び出し、応答を待つ間イベントループを塞がない
+        answer = await compiled.chain.arun(question=query, **inputs)
+
+        return answer.strip()
+
+    def reload_prompt_templates(self) -> None:
+        """プロンプトテンプレートの変更を反映する（組み立て済みのプロンプトとチェーンを破棄）"""
+        self.settings.reload_prompt_templates()
+        self.prompts.invalidate()
+
+    def _answer_cache_state(
+        self,
+        question: str,
+        search_results: List[Tuple[Document, float]],
+        conversation_history: List[Dict[str, str]],
+        query_embedding: Sequence[float],
+    ) -> Optional[dict]:
+        """回答キャッシュ・生成の共有に使うキーを求める（使わない場合はNone）"""
+        # 会話履歴がある場合は回答が履歴に依存するため、キャッシュ・生成の共有を使わない
         if conversation_history:
-            history_text = "\n".join(
-                [
-                    f"{msg['role'].upper()}: {msg['content']}"
-                    for msg in conversation_history[-10:]  # 最新10件まで
-                ]
+            return None
+        state = {"query_embedding": query_embedding, "search_results": search_results}
+        if self.answer_cache is not None or self.single_flight is not None:
+            state["cache_key"] = answer_cache_key(
+                question,
+                self._result_chunk_ids(search_results),
+                self.prompts.template_hash(self.settings.prompt_templates),
+                self.settings.openai_model,
             )
+        return state
 
-        # 会話履歴を考慮したシステムプロンプト
-        system_prompt_with_history = f"""{prompt_templates.system_prompt}
+    def _get_cached_answer(
+        self, state: Optional[dict]
+    ) -> Optional[Tuple[str, List[SourceDocument], float]]:
+        """キャッシュ済みの (回答, ソース, 信頼度) を返す（該当なしの場合はNone）"""
+        if state is None:
+            return None
 
-以下は今までの会話履歴です：
-{history_text}
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(state["cache_key"], self.index_version)
+            if cached is not None:
+                logger.info("回答キャッシュの回答を返します")
+                return (
+                    cached["answer"],
+                    [SourceDocument(**source) for source in cached["sources"]],
+                    cached["confidence"],
+                )
 
-上記の会話履歴を考慮して、一貫性のある回答を提供してください。前回の質問や回答と関連がある場合は、それを踏まえて回答してください。"""
+        if self.semantic_cache is not None:
+            # クエリベクトルは検索時に埋め込んだものを使う（ここでは埋め込みを計算しない）
+            state["chunk_ids"] = self._result_chunk_ids(state["search_results"])
+            cached = self.semantic_cache.get(
+                state["query_embedding"], state["chunk_ids"], self.index_version
+            )
+            if cached is not None:
+                logger.info("意味的キャッシュの回答を返します")
+                return cached
 
-        # プロンプトテンプレートを作成
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_prompt_with_history),
-                ("human", prompt_templates.human_prompt),
-            ]
+        return None
+
+    def _put_cached_answer(
+        self,
+        state: Optional[dict],
+        response: Tuple[str, List[SourceDocument], float],
+    ) -> None:
+        """生成した (回答, ソース, 信頼度) をキャッシュに登録"""
+        if state is None:
+            return
+
+        answer, sources, confidence = response
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                state["cache_key"],
+                self.index_version,
+                {
+                    "answer": answer,
+                    "sources": [source.model_dump() for source in sources],
+                    "confidence": confidence,
+                },
+            )
+        if self.semantic_cache is not None:
+            self.semantic_cache.put(
+                state["query_embedding"],
+                state["chunk_ids"],
+                self.index_version,
+                response,
+            )
+
+    def _answer_from_results(
+        self,
+        question: str,
+        search_results: List[Tuple[Document, float]],
+        conversation_history: List[Dict[str, str]],
+        query_embedding: Sequence[float],
+    ) -> Tuple[str, List[SourceDocument], float]:
+        """検索結果から (回答, ソース, 信頼度) を生成（キャッシュ済みの回答があれば再利用）"""
+        cache_state = self._answer_cache_state(
+            question, search_results, conversation_history, query_embedding
         )
+        cached = self._get_cached_answer(cache_state)
+        if cached is not None:
+            return cached
 
-        # コンテキストを整形
-        context = "\n\n".join(
-            [
-                prompt_templates.context_section_format.format(
-                    section=doc.metadata.get("section", "不明"),
-                    content=doc.page_content,
+        # コンテキストドキュメントを抽出
+        context_documents = [doc for doc, _ in search_results]
+
+        # 会話履歴を考慮した回答を生成
+        if (
+            conversation_history and len(conversation_history) > 0
+        ):  # 過去の会話履歴がある場合
+            answer = self.generate_answer_with_history(
+                question, context_documents, conversation_history
+            )  # 履歴全体を渡す（現在の質問は含まれていない）
+        elif self.single_flight is not None:
+            # 同じ質問・検索結果の生成が実行中であれば、LLMを呼び出さずにその結果を共有する
+            answer = self.single_flight.do(
+                cache_state["cache_key"],
+                functools.partial(self.generate_answer, question, context_documents),
+            )
+        else:
+            answer = self.generate_answer(question, context_documents)
+
+        response = (
+            answer,
+            self._format_sources(search_results),
+            self._confidence(search_results),
+        )
+        self._put_cached_answer(cache_state, response)
+        return response
+
+    async def _aanswer_from_results(
+        self,
+        question: str,
+        search_results: List[Tuple[Document, float]],
+        conversation_history: List[Dict[str, str]],
+        query_embedding: Sequence[float],
+    ) -> Tuple[str, List[SourceDocument], float]:
+        """_answer_from_resultsの非同期版"""
+        loop = asyncio.get_running_loop()
+        cache_state = self._answer_cache_state(
+            question, search_results, conversation_history, query_embedding
+        )
+        # 回答キャッシュはSQLiteへの問い合わせを含むため、データベース用のスレッドプールで参照する
+        db_executor = self.executors.get("db")
+        cached = await loop.run_in_executor(
+            db_executor, self._get_cached_answer, cache_state
+        )
+        if cached is not None:
+            return cached
+
+        context_documents = [doc for doc, _ in search_results]
+        if conversation_history:
+            answer = await self.agenerate_answer(
+                question, context_documents, conversation_history
+            )
+        elif self.single_flight is not None:
+            # 同じ質問・検索結果の生成が実行中であれば、LLMを呼び出さずにその結果を共有する
+            answer = await self.single_flight.ado(
+                cache_state["cache_key"],
+                functools.partial(self.agenerate_answer, question, context_documents),
+            )
+        else:
+            answer = await self.agenerate_answer(question, context_documents)
+
+        response = (
+            answer,
+            self._format_sources(search_results),
+            self._confidence(search_results),
+        )
+        await loop.run_in_executor(
+            db_executor, self._put_cached_answer, cache_state, response
+        )
+        return response
+
+    @staticmethod
+    def _format_sources(
+        search_results: List[Tuple[Document, float]],
+    ) -> List[SourceDocument]:
+        """検索結果をレスポンス用のソース情報に整形"""
+        sources = []
+        for doc, score in search_results:
+            sources.append(
+                SourceDocument(
+                    content=doc.page_content[:300] + "..."
+                    if len(doc.page_content) > 300
+                    else doc.page_content,
+                    section=doc.metadata.get("section", ""),
+                    metadata={"score": score},
                 )
-                for doc in context_documents
-            ]
+            )
+        return sources
+
+    @staticmethod
+    def _confidence(search_results: List[Tuple[Document, float]]) -> float:
+        """最上位の検索結果から信頼度スコアを計算"""
+        return 1.0 - search_results[0][1] if search_results else 0.0
+
+    @staticmethod
+    def _result_chunk_ids(search_results: List[Tuple[Document, float]]) -> List[str]:
+        """検索結果のチャンクID（IDのないドキュメントは内容から算出）"""
+        return [doc.id or compute_chunk_id(doc) for doc, _ in search_results]
+
+    def _prepare_session(
+        self, question: str, session_id: Optional[str]
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """セッションを用意してユーザーメッセージを保存し、(セッションID, 会話履歴) を返す"""
+        # セッションが指定されていない場合は新規作成
+        if not session_id:
+            session_data = self.session_service.create_session()
+            session_id = session_data["id"]
+            logger.info(f"新規セッションを作成しました: {session_id}")
+
+        # 会話履歴を取得（現在の質問を保存する前に取得）
+        conversation_history = self.session_service.get_conversation_history(
+            session_id, limit=20
         )
 
-        # 最大コンテキスト長を考慮（会話履歴の分も考慮）
-        max_context_with_history = self.settings.max_context_length - len(history_text)
-        if len(context) > max_context_with_history:
-            context = context[:max_context_with_history] + "..."
+        # ユーザーメッセージをデータベースに保存
+        user_message = self.session_service.add_message(
+            session_id=session_id, role="user", content=question
+        )
 
-        # LLMチェーンを作成して実行
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
-        answer = chain.run(context=context, question=query)
+        if not user_message:
+            # セッションが存在しない場合
+            logger.warning(f"セッションが見つかりません: {session_id}")
+            session_data = self.session_service.create_session()
+            session_id = session_data["id"]
+            conversation_history = []  # 新規セッションなので履歴は空
+            self.session_service.add_message(
+                session_id=session_id, role="user", content=question
+            )
 
-        return answer.strip()
+        return session_id, conversation_history
+
+    def _save_assistant_message(
+        self,
+        session_id: str,
+        answer: str,
+        sources: List[SourceDocument],
+        confidence: float,
+    ) -> None:
+        """アシスタントメッセージをデータベースに保存"""
+        self.session_service.add_message(
+            session_id=session_id,
+            role="assistant",
+            content=answer,
+            metadata=self._assistant_metadata(sources, confidence),
+        )
+
+    @staticmethod
+    def _assistant_metadata(sources: List[SourceDocument], confidence: float) -> dict:
+        """アシスタントメッセージに保存するソースと信頼度"""
+        return {
+            "sources": [source.dict() for source in sources],
+            "confidence": confidence,
+        }
 
     def chat(
         self, question: str, max_results: int = 3, session_id: Optional[str] = None
     ) -> ChatResponse:
         """ユーザーの質問に対してRAGを使用して回答（会話履歴対応）"""
         try:
-            # セッションが指定されていない場合は新規作成
-            if not session_id:
-                session_data = self.session_service.create_session()
-                session_id = session_data["id"]
-                logger.info(f"新規セッションを作成しました: {session_id}")
+            session_id, conversation_history = self._prepare_session(
+                question, session_id
+            )
+
+            # 関連ドキュメントを検索
+            search_results, query_embedding = self._search_with_embedding(
+                question, max_results
+            )
+
+            if not search_results:
+                answer = self.settings.prompt_templates.no_results_message
+                sources = []
+                confidence = 0.0
+            else:
+                answer, sources, confidence = self._answer_from_results(
+                    question, search_results, conversation_history, query_embedding
+                )
 
-            # 会話履歴を取得（現在の質問を保存する前に取得）
-            conversation_history = self.session_service.get_conversation_history(
-                session_id, limit=20
+            self._save_assistant_message(session_id, answer, sources, confidence)
+
+            return ChatResponse(
+                answer=answer,
+                sources=sources,
+                confidence=min(max(confidence, 0.0), 1.0),
+                session_id=session_id,
             )
 
-            # ユーザーメッセージをデータベースに保存
-            user_message = self.session_service.add_message(
+        except Exception as e:
+            logger.error(f"チャット処理中にエラーが発生しました: {e}")
+            raise
+
+    async def _aprepare_chat(
+        self, question: str, max_results: int, session_id: Optional[str]
+    ) -> Tuple[str, List[Dict[str, str]], List[Tuple[Document, float]], List[float]]:
+        """_prepare_sessionと検索の非同期版
+
+        (セッションID, 会話履歴, 検索結果, クエリベクトル) を返す。
+
+        会話履歴の取得と関連ドキュメントの検索は互いに依存しないため並行して実行する。
+        """
+        sessions = self.async_session_service
+
+        # セッションが指定されていない場合は新規作成
+        if not session_id:
+            session_data = await sessions.create_session()
+            session_id = session_data["id"]
+            logger.info(f"新規セッションを作成しました: {session_id}")
+
+        # 会話履歴（現在の質問を保存する前）の取得と検索を並行して実行
+        conversation_history, (search_results, query_embedding) = await asyncio.gather(
+            sessions.get_conversation_history(session_id, limit=20),
+            self._asearch_with_embedding(question, max_results),
+        )
+
+        # ユーザーメッセージをデータベースに保存
+        user_message = await sessions.add_message(
+            session_id=session_id, role="user", content=question
+        )
+
+        if not user_message:
+            # セッションが存在しない場合
+            logger.warning(f"セッションが見つかりません: {session_id}")
+            session_data = await sessions.create_session()
+            session_id = session_data["id"]
+            conversation_history = []  # 新規セッションなので履歴は空
+            await sessions.add_message(
                 session_id=session_id, role="user", content=question
             )
 
-            if not user_message:
-                # セッションが存在しない場合
-                logger.warning(f"セッションが見つかりません: {session_id}")
-                session_data = self.session_service.create_session()
-                session_id = session_data["id"]
-                conversation_history = []  # 新規セッションなので履歴は空
-                user_message = self.session_service.add_message(
-                    session_id=session_id, role="user", content=question
-                )
+        return session_id, conversation_history, search_results, query_embedding
 
-            # 関連ドキュメントを検索
-            search_results = self.search(question, max_results)
+    async def achat(
+        self, question: str, max_results: int = 3, session_id: Optional[str] = None
+    ) -> ChatResponse:
+        """chatの非同期版（データベース・埋め込み・LLMの待ち時間にイベントループを塞がない）"""
+        try:
+            (
+                session_id,
+                conversation_history,
+                search_results,
+                query_embedding,
+            ) = await self._aprepare_chat(question, max_results, session_id)
 
             if not search_results:
                 answer = self.settings.prompt_templates.no_results_message
                 sources = []
                 confidence = 0.0
             else:
-                # コンテキストドキュメントを抽出
-                context_documents = [doc for doc, _ in search_results]
-
-                # 会話履歴を考慮した回答を生成
-                if (
-                    conversation_history and len(conversation_history) > 0
-                ):  # 過去の会話履歴がある場合
-                    answer = self.generate_answer_with_history(
-                        question, context_documents, conversation_history
-                    )  # 履歴全体を渡す（現在の質問は含まれていない）
-                else:
-                    answer = self.generate_answer(question, context_documents)
-
-                # ソース情報を整形
-                sources = []
-                for doc, score in search_results:
-                    sources.append(
-                        SourceDocument(
-                            content=doc.page_content[:300] + "..."
-                            if len(doc.page_content) > 300
-                            else doc.page_content,
-                            section=doc.metadata.get("section", ""),
-                            metadata={"score": score},
-                        )
-                    )
-
-                # 信頼度スコアを計算
-                confidence = 1.0 - search_results[0][1] if search_results else 0.0
-
-            # アシスタントメッセージをデータベースに保存
-            assistant_metadata = {
-                "sources": [source.dict() for source in sources],
-                "confidence": confidence,
-            }
+                answer, sources, confidence = await self._aanswer_from_results(
+                    question, search_results, conversation_history, query_embedding
+                )
 
-            self.session_service.add_message(
+            await self.async_session_service.add_message(
                 session_id=session_id,
                 role="assistant",
                 content=answer,
-                metadata=assistant_metadata,
+                metadata=self._assistant_metadata(sources, confidence),
             )
 
             return ChatResponse(
@@ -280,6 +1014,146 @@ class RAGService:
             logger.error(f"チャット処理中にエラーが発生しました: {e}")
             raise
 
+    def stream_chat(
+        self, question: str, max_results: int = 3, session_id: Optional[str] = None
+    ) -> Iterator[Tuple[str, dict]]:
+        """回答をトークンごとに返すチャット（(イベント名, データ) の組を順に返す）
+
+        検索結果のソース（"sources"）、回答のトークン（"token"）、
+        信頼度とセッションID（"done"）の順に返す。
+        アシスタントメッセージは回答がすべて生成された後に1回だけ保存する。
+        """
+        session_id, conversation_history = self._prepare_session(question, session_id)
+
+        # 関連ドキュメントを検索し、回答の生成前にソースを返す
+        search_results, query_embedding = self._search_with_embedding(
+            question, max_results
+        )
+        sources = self._format_sources(search_results)
+        confidence = self._confidence(search_results)
+        yield "sources", {"sources": [source.model_dump() for source in sources]}
+
+        if not search_results:
+            answer = self.settings.prompt_templates.no_results_message
+            yield "token", {"text": answer}
+        else:
+            cache_state = self._answer_cache_state(
+                question, search_results, conversation_history, query_embedding
+            )
+            cached = self._get_cached_answer(cache_state)
+            if cached is not None:
+                answer = cached[0]
+                yield "token", {"text": answer}
+            else:
+                compiled, inputs = self._answer_prompt(
+                    [doc for doc, _ in search_results], conversation_history
+                )
+                messages = compiled.prompt.format_messages(question=question, **inputs)
+                tokens = []
+                for chunk in self.llm.stream(messages):
+                    if chunk.content:
+                        tokens.append(chunk.content)
+                        yield "token", {"text": chunk.content}
+                answer = "".join(tokens).strip()
+                self._put_cached_answer(cache_state, (answer, sources, confidence))
+
+        self._save_assistant_message(session_id, answer, sources, confidence)
+        yield (
+            "done",
+            {
+                "confidence": min(max(confidence, 0.0), 1.0),
+                "session_id": session_id,
+            },
+        )
+
+    async def astream_chat(
+        self, question: str, max_results: int = 3, session_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """stream_chatの非同期版
+
+        achatと同じく、会話履歴・回答キャッシュはデータベース用、検索は埋め込み用の
+        スレッドプールで処理し、外部呼び出し用のスレッドプールではLLMのストリーミング
+        応答の取り出しだけを行う。
+        """
+        loop = asyncio.get_running_loop()
+        db_executor = self.executors.get("db")
+        (
+            session_id,
+            conversation_history,
+            search_results,
+            query_embedding,
+        ) = await self._aprepare_chat(question, max_results, session_id)
+
+        # 回答の生成前にソースを返す
+        sources = self._format_sources(search_results)
+        confidence = self._confidence(search_results)
+        yield "sources", {"sources": [source.model_dump() for source in sources]}
+
+        if not search_results:
+            answer = self.settings.prompt_templates.no_results_message
+            yield "token", {"text": answer}
+        else:
+            cache_state = self._answer_cache_state(
+                question, search_results, conversation_history, query_embedding
+            )
+            cached = await loop.run_in_executor(
+                db_executor, self._get_cached_answer, cache_state
+            )
+            if cached is not None:
+                answer = cached[0]
+                yield "token", {"text": answer}
+            else:
+                compiled, inputs = self._answer_prompt(
+                    [doc for doc, _ in search_results], conversation_history
+                )
+                messages = compiled.prompt.format_messages(question=question, **inputs)
+                tokens = []
+                # 途中で打ち切られた場合もLLMのストリーミング応答をその場で閉じる
+                async with contextlib.aclosing(
+                    iterate_in_executor(
+                        self.llm.stream(messages), self.executors.get("upstream")
+                    )
+                ) as chunks:
+                    async for chunk in chunks:
+                        if chunk.content:
+                            tokens.append(chunk.content)
+                            yield "token", {"text": chunk.content}
+                answer = "".join(tokens).strip()
+                await loop.run_in_executor(
+                    db_executor,
+                    self._put_cached_answer,
+                    cache_state,
+                    (answer, sources, confidence),
+                )
+
+        await self.async_session_service.add_message(
+            session_id=session_id,
+            role="assistant",
+            content=answer,
+            metadata=self._assistant_metadata(sources, confidence),
+        )
+        yield (
+            "done",
+            {
+                "confidence": min(max(confidence, 0.0), 1.0),
+                "session_id": session_id,
+            },
+        )
+
+    def get_metrics(self) -> dict:
+        """キャッシュなどの稼働状況の指標を返す"""
+        metrics = self.embedding_service.stats()
+        if self.reranker is not None:
+            metrics["reranker"] = self.reranker.stats()
+        if self.semantic_cache is not None:
+            metrics["semantic_answer_cache"] = self.semantic_cache.stats()
+        if self.answer_cache is not None:
+            metrics["answer_cache"] = self.answer_cache.stats()
+        if self.single_flight is not None:
+            metrics["generation_coalescing"] = self.single_flight.stats()
+        metrics["executors"] = self.executors.stats()
+        return metrics
+
     def is_ready(self) -> bool:
         """ベクトルストアが準備できているかチェック"""
         return self.vector_store is not None
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from langchain.schema import Document
+
+from src.services.embeddings import normalize_query
+from src.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """クエリとチャンクの組をクロスエンコーダーで採点し、検索結果を並べ替える
+
+    ベクトル検索で広めに取得した候補を並べ替えて上位だけをLLMに渡すことで、
+    少ないチャンクでも関連度の高いコンテキストを保ち、プロンプトのトークン数と
+    生成時間を減らす。
+    採点結果は (正規化済みクエリのハッシュ, チャンクID) ごとにキャッシュし、
+    同じ質問ではモデルを再実行しない。
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_size: int = 4096,
+        cache_ttl_seconds: Optional[float] = None,
+        batch_size: int = 16,
+        max_length: int = 512,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._model_lock = threading.Lock()
+        # (クエリのハッシュ, チャンクID) -> スコア
+        self.score_cache: LRUCache[float] = LRUCache(cache_size, cache_ttl_seconds)
+        # 並べ替えの統計（検索とは別に計測する）
+        self._stats_lock = threading.Lock()
+        self.rerank_count = 0
+        self.scored_pairs = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+
+    @property
+    def model(self):
+        """遅延初期化でクロスエンコーダーを取得"""
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                logger.info(f"リランキングモデルを読み込み中: {self.model_name}")
+                self._model = CrossEncoder(
+                    self.model_name, device="cpu", max_length=self.max_length
+                )
+            return self._model
+
+    @staticmethod
+    def _query_key(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _chunk_key(document: Document) -> str:
+        if document.id:
+            return document.id
+        return hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+
+    def score(self, query: str, documents: Sequence[Document]) -> List[float]:
+        """クエリと各ドキュメントの関連度スコアを返す（キャッシュにないものだけ採点）"""
+        query_key = self._query_key(query)
+        keys = [(query_key, self._chunk_key(document)) for document in documents]
+        scores: List[Optional[float]] = [self.score_cache.get(key) for key in keys]
+
+        missing = [index for index, score in enumerate(scores) if score is None]
+        if missing:
+            predicted = self.model.predict(
+                [(query, documents[index].page_content) for index in missing],
+                batch_size=self.batch_size,
+            )
+            for index, score in zip(missing, predicted):
+                scores[index] = float(score)
+                self.score_cache.put(keys[index], float(score))
+            with self._stats_lock:
+                self.scored_pairs += len(missing)
+
+        return scores
+
+    def rerank(
+        self, query: str, results: List[Tuple[Document, float]], k: int
+    ) -> List[Tuple[Document, float]]:
+        """検索結果を関連度スコアの高い順に並べ替えて上位k件を返す
+
+        しきい値や信頼度の計算で使えるよう、各結果の距離はそのまま返す。
+        """
+        if not results:
+            return []
+
+        started = time.perf_counter()
+        scores = self.score(query, [document for document, _ in results])
+        order = sorted(range(len(results)), key=lambda index: -scores[index])
+        elapsed = time.perf_counter() - started
+
+        with self._stats_lock:
+            self.rerank_count += 1
+            self.total_seconds += elapsed
+            self.last_seconds = elapsed
+        logger.info(
+            f"リランキング: 候補={len(results)}件, 処理時間={elapsed * 1000:.1f}ms"
+        )
+        return [results[index] for index in order[:k]]
+
+    def stats(self) -> dict:
+        """リランキングの処理時間とスコアキャッシュの統計情報を返す"""
+        with self._stats_lock:
+            return {
+                "reranks": self.rerank_count,
+                "scored_pairs": self.scored_pairs,
+                "average_latency_ms": (
+                    self.total_seconds / self.rerank_count * 1000
+                    if self.rerank_count
+                    else 0.0
+                ),
+                "last_latency_ms": self.last_seconds * 1000,
+                "score_cache": self.score_cache.stats(),
+            }
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.services.quantized_index import normalize_rows
+
+
+class SemanticAnswerCache:
+    """言い回しだけが異なる質問に、生成済みの回答を返す意味的キャッシュ
+
+    クエリベクトルのコサイン距離がmax_distance以内で、かつ検索されたチャンクの集合が
+    一致する過去の質問があれば、その回答を返す。チャンクの集合も一致を条件とするため、
+    似ていても別の仕様を参照する質問には古い回答を返さない。
+    インデックスのバージョンが変わった場合は、すべてのエントリを破棄する。
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_distance: float = 0.05,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.index_version: Optional[str] = None
+        self._lock = threading.Lock()
+        # エントリ番号 -> (登録時刻, チャンク集合のキー, 正規化済みクエリベクトル, 値)
+        # 末尾ほど最近使われたもの
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+
+    @staticmethod
+    def chunk_key(chunk_ids: Sequence[str]) -> Hashable:
+        """検索結果の順位によらないチャンク集合のキー"""
+        return tuple(sorted(chunk_ids))
+
+    def get(
+        self,
+        query_embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        index_version: Optional[str],
+    ) -> Optional[Any]:
+        """条件を満たす最も近い質問の値を取得（該当なしの場合はNone）"""
+        chunk_key = self.chunk_key(chunk_ids)
+        query = normalize_rows(query_embedding)
+
+        with self._lock:
+            self._check_index_version(index_version)
+            self._evict_expired()
+            candidates = [
+                (entry_id, entry[2])
+                for entry_id, entry in self._entries.items()
+                if entry[1] == chunk_key
+            ]
+
+            best_id = None
+            if candidates:
+                distances = 1.0 - np.stack([v for _, v in candidates]) @ query
+                best = int(np.argmin(distances))
+                if distances[best] <= self.max_distance:
+                    best_id = candidates[best][0]
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][3]
+
+    def put(
+        self,
+        query_embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        index_version: Optional[str],
+        value: Any,
+    ) -> None:
+        """値を登録し、上限を超えた場合は最も古いものから破棄する"""
+        if self.max_size <= 0:
+            return
+
+        entry: Tuple = (
+            time.monotonic(),
+            self.chunk_key(chunk_ids),
+            normalize_rows(query_embedding),
+            value,
+        )
+        with self._lock:
+            self._check_index_version(index_version)
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """すべてのエントリを破棄する（統計値は保持）"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """ヒット数・ミス数などの統計情報を返す"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+    def _check_index_version(self, index_version: Optional[str]) -> None:
+        if index_version != self.index_version:
+            self._entries.clear()
+            self.index_version = index_version
+
+    def _evict_expired(self) -> None:
+        if self.ttl_seconds is None:
+            return
+        now = time.monotonic()
+        # 登録順と利用順は異なるため、全件から期限切れを探す（件数は小さい前提）
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if now - entry[0] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
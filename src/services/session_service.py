@@ -1,9 +1,14 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Dict, Any, TypeVar
 from datetime import datetime
 from sqlalchemy import desc, asc
 
 from src.models.database import DatabaseManager, Session, Message
 
+T = TypeVar("T")
+
 
 class SessionService:
     """セッション管理サービス"""
@@ -166,3 +171,51 @@ class SessionService:
             session.updated_at = datetime.utcnow()
             db.commit()
             return True
+
+
+class AsyncSessionService:
+    """SessionServiceの非同期版
+
+    SQLiteのドライバーは同期APIのみのため、各操作をスレッドプールで実行し、
+    イベントループを塞がないようにする。
+    """
+
+    def __init__(
+        self, session_service: SessionService, executor: Optional[Executor] = None
+    ):
+        self.session_service = session_service
+        # Noneの場合はイベントループの既定のスレッドプールを使う
+        self.executor = executor
+
+    async def _run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def create_session(self, title: Optional[str] = None) -> Dict[str, Any]:
+        """新規セッション作成"""
+        return await self._run(self.session_service.create_session, title)
+
+    async def add_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """メッセージ追加"""
+        return await self._run(
+            self.session_service.add_message,
+            session_id=session_id,
+            role=role,
+            content=content,
+            metadata=metadata,
+        )
+
+    async def get_conversation_history(
+        self, session_id: str, limit: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """会話履歴を取得（RAG用フォーマット）"""
+        return await self._run(
+            self.session_service.get_conversation_history, session_id, limit=limit
+        )
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class _Call(Generic[V]):
+    """実行中の呼び出し（完了を待つ後続の呼び出し元と結果を共有する）"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[V] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[V]):
+    """同じキーの処理が実行中であれば、新たに実行せず実行中の処理の結果を待つ
+
+    同じ質問が同時に多数届いた場合に、LLMの呼び出しを1回にまとめて
+    全員に同じ結果を返すために使う。結果は保持しないため、完了後に届いた
+    呼び出しは再度実行される（結果の再利用は回答キャッシュの役割）。
+    処理が例外を送出した場合は、待っていた呼び出し元にも同じ例外を送出する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call[V]] = {}
+        # イベントループごとの実行中のタスク（asyncioのタスクはループをまたげない）
+        self._tasks: Dict[tuple, asyncio.Task] = {}
+        # 実際に実行した回数と、実行中の処理の結果を共有した回数
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], V]) -> V:
+        """キーごとに1回だけfnを実行し、同時に呼び出した全員に結果を返す"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[V]]) -> V:
+        """doの非同期版（同じイベントループ内で同時に待っている呼び出しをまとめる）"""
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda _: self._forget_task(task_key))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        # 呼び出し元の1つがキャンセルされても、共有しているタスクは止めない
+        return await asyncio.shield(task)
+
+    def _forget_task(self, task_key: tuple) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self) -> dict:
+        """実行中の件数と、結果を共有した回数の統計情報を返す"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._tasks),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,124 @@
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# モデル名からエンコーディングを特定できない場合に使用するtiktokenエンコーディング
+DEFAULT_TIKTOKEN_ENCODING = "o200k_base"
+
+
+class TokenCounter(ABC):
+    """トークン数の計測とトークン境界での分割を行う基底クラス"""
+
+    # エンコード時に自動で付与される特殊トークン数（[CLS]/[SEP]など）
+    reserved_tokens: int = 0
+
+    @abstractmethod
+    def token_offsets(self, text: str) -> List[int]:
+        """各トークンの開始位置（文字オフセット）のリストを返す"""
+
+    def count(self, text: str) -> int:
+        """特殊トークンを除いたトークン数を返す"""
+        return len(self.token_offsets(text))
+
+    def split(
+        self, text: str, max_tokens: int, overlap_tokens: int = 0
+    ) -> Iterator[str]:
+        """テキストをmax_tokens以下の断片にトークン境界で分割"""
+        if max_tokens <= 0:
+            raise ValueError("max_tokensは1以上を指定してください")
+
+        offsets = self.token_offsets(text)
+        if len(offsets) <= max_tokens:
+            yield text
+            return
+
+        start = 0
+        while start < len(offsets):
+            end = min(start + max_tokens, len(offsets))
+            piece = self._slice(text, offsets, start, end)
+            # 切り出した文字列を再エンコードすると分割結果が変わる場合があるため、
+            # 上限を超えなくなるまで窓を縮める
+            while end - start > 1 and self.count(piece) > max_tokens:
+                end -= 1
+                piece = self._slice(text, offsets, start, end)
+
+            yield piece
+            if end >= len(offsets):
+                return
+            start = max(end - overlap_tokens, start + 1)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """テキストを先頭からmax_tokens以下に切り詰める"""
+        if max_tokens <= 0:
+            return ""
+        return next(self.split(text, max_tokens))
+
+    @staticmethod
+    def _slice(text: str, offsets: List[int], start: int, end: int) -> str:
+        """トークン番号の範囲[start, end)に対応する部分文字列を返す"""
+        end_offset = offsets[end] if end < len(offsets) else len(text)
+        return text[offsets[start] : end_offset]
+
+
+class TiktokenCounter(TokenCounter):
+    """tiktokenによるトークン計測（OpenAIモデルのプロンプト予算用）"""
+
+    def __init__(self, model_name: str):
+        import tiktoken
+
+        try:
+            self.encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding(DEFAULT_TIKTOKEN_ENCODING)
+
+    def token_offsets(self, text: str) -> List[int]:
+        tokens = self.encoding.encode_ordinary(text)
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        return offsets
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+
+class HuggingFaceTokenCounter(TokenCounter):
+    """埋め込みモデル自身のトークナイザーによるトークン計測"""
+
+    def __init__(self, model_name: str):
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_pretrained(model_name)
+        # 上限で切り詰められると正確に数えられないため無効化する
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        post_processor = self.tokenizer.post_processor
+        self.reserved_tokens = (
+            post_processor.num_special_tokens_to_add(False) if post_processor else 0
+        )
+
+    def token_offsets(self, text: str) -> List[int]:
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        return [start for start, _ in encoding.offsets]
+
+
+@lru_cache(maxsize=None)
+def get_tiktoken_counter(model_name: str) -> TokenCounter:
+    """OpenAIモデル用のトークンカウンターを取得（プロセス内でキャッシュ）"""
+    return TiktokenCounter(model_name)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_token_counter(model_name: str) -> TokenCounter:
+    """埋め込みモデル用のトークンカウンターを取得（プロセス内でキャッシュ）
+
+    埋め込みモデルのトークナイザーを取得できない場合はtiktokenで代用する。
+    """
+    try:
+        return HuggingFaceTokenCounter(model_name)
+    except Exception as e:
+        logger.warning(
+            f"埋め込みモデルのトークナイザーを読み込めないためtiktokenで代用します: {e}"
+        )
+        return get_tiktoken_counter(model_name)
@@ -1,9 +1,10 @@
 import tempfile
 import pytest
-from typing import Generator
+from typing import Callable, Generator
 from unittest.mock import Mock, patch
 
 from src.config.settings import Settings
+from src.services.rag_service import RAGService
 
 
 @pytest.fixture(scope="session")
@@ -29,6 +30,32 @@ def temp_dir() -> Generator[str, None, None]:
         yield temp_dir
 
 
+@pytest.fixture
+def rag_service_factory() -> Callable[..., RAGService]:
+    """外部依存をモックしたRAGServiceを作成する関数を提供
+
+    キーワード引数で設定を上書きできる。埋め込みモデル・LLM・データベースは
+    モックに置き換え、ベクトルストアは初期化しない。
+    """
+
+    def create(**overrides) -> RAGService:
+        settings = Settings(**{"openai_api_key": "test_api_key", **overrides})
+        with (
+            patch("src.services.rag_service.EmbeddingService"),
+            patch("src.services.rag_service.ChatOpenAI"),
+            patch("src.services.rag_service.SessionService"),
+            patch("src.services.rag_service.get_database_manager_singleton"),
+            patch("src.services.rag_service.RAGService._initialize_vector_store"),
+        ):
+            service = RAGService(settings)
+        service.session_service.create_session.return_value = {"id": "session-1"}
+        service.session_service.get_conversation_history.return_value = []
+        service.session_service.add_message.return_value = {"id": "msg-1"}
+        return service
+
+    return create
+
+
 @pytest.fixture
 def mock_openai_client():
     """OpenAI APIクライアントのモック"""
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import AsyncMock, patch, Mock
 from fastapi.testclient import TestClient
 
 from src.main import create_app
@@ -33,7 +33,7 @@ class TestAPIIntegration:
         from src.api.chat import get_rag_service
 
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
         # チャットレスポンスのモック
         mock_response = ChatResponse(
@@ -52,7 +52,7 @@ class TestAPIIntegration:
             ],
             confidence=0.88,
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # FastAPIの依存関係をオーバーライド
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -94,7 +94,7 @@ class TestAPIIntegration:
             assert data["confidence"] == 0.88
 
             # RAGサービスが正しく呼ばれたことを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="スゲリス・サーガとはどのようなゲームですか？",
                 max_results=3,
                 session_id=None,
@@ -149,8 +149,8 @@ class TestAPIIntegration:
         from src.api.chat import get_rag_service
 
         # RAGサービスで例外が発生する場合
-        mock_rag_service = Mock()
-        mock_rag_service.chat.side_effect = Exception("RAGサービスエラー")
+        mock_rag_service = Mock(achat=AsyncMock())
+        mock_rag_service.achat.side_effect = Exception("RAGサービスエラー")
 
         # FastAPIの依存関係をオーバーライド
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -185,19 +185,19 @@ class TestAPIIntegration:
 
     def test_multiple_concurrent_requests_integration(self, app, client):
         """複数の同時リクエストの統合テスト"""
+        import asyncio
         import threading
-        import time
         from src.api.chat import get_rag_service
 
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
-        def mock_chat_response(question, max_results, session_id=None):
+        async def mock_chat_response(question, max_results, session_id=None):
             # 少し遅延を追加してコンカレンシーをテスト
-            time.sleep(0.1)
+            await asyncio.sleep(0.1)
             return ChatResponse(answer=f"回答: {question}", sources=[], confidence=0.5)
 
-        mock_rag_service.chat.side_effect = mock_chat_response
+        mock_rag_service.achat.side_effect = mock_chat_response
 
         # FastAPIの依存関係をオーバーライド
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -240,7 +240,7 @@ class TestAPIIntegration:
         from src.api.chat import get_rag_service
 
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
         japanese_response = ChatResponse(
             answer="ターン制バトルシステムでは、プレイヤーと敵が交互に行動します。各ターンでプレイヤーは攻撃、防御、スキル使用などのアクションを選択できます。",
@@ -253,7 +253,7 @@ class TestAPIIntegration:
             ],
             confidence=0.78,
         )
-        mock_rag_service.chat.return_value = japanese_response
+        mock_rag_service.achat.return_value = japanese_response
 
         # FastAPIの依存関係をオーバーライド
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -284,14 +284,14 @@ class TestAPIIntegration:
         from src.api.chat import get_rag_service
 
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
         no_results_response = ChatResponse(
             answer="申し訳ございません。お尋ねの内容に関する情報が仕様書内で見つかりませんでした。",
             sources=[],
             confidence=0.0,
         )
-        mock_rag_service.chat.return_value = no_results_response
+        mock_rag_service.achat.return_value = no_results_response
 
         # FastAPIの依存関係をオーバーライド
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -318,7 +318,7 @@ class TestAPIIntegration:
         from src.api.chat import get_rag_service
 
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
         # 大きな回答とソースを生成
         large_answer = "詳細な回答です。" * 100
@@ -334,7 +334,7 @@ class TestAPIIntegration:
         large_response = ChatResponse(
             answer=large_answer, sources=large_sources, confidence=0.75
         )
-        mock_rag_service.chat.return_value = large_response
+        mock_rag_service.achat.return_value = large_response
 
         # FastAPIの依存関係をオーバーライド
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -6,6 +6,7 @@ from langchain.schema import Document
 
 from src.services.rag_service import RAGService
 from src.services.document_loader import DocumentLoader
+from src.services.index_manifest import IndexManifest
 from src.models.schemas import ChatResponse
 from src.config.settings import Settings
 
@@ -77,8 +78,8 @@ class TestFullRAGPipeline:
         assert len(passed_documents) > 0
         assert all(isinstance(doc, Document) for doc in passed_documents)
 
-        # 埋め込み関数が渡されていることを確認
-        assert call_args[1]["embedding"] == mock_embeddings_instance
+        # キャッシュを経由する埋め込みサービスが渡されていることを確認
+        assert call_args[1]["embedding"] == mock_service
 
         # 永続化ディレクトリが正しく設定されていることを確認
         assert (
@@ -86,8 +87,10 @@ class TestFullRAGPipeline:
             == integration_settings.chroma_persist_directory
         )
 
-        # persistが呼ばれることを確認
-        mock_vector_store.persist.assert_called_once()
+        # チャンクIDが渡され、マニフェストが保存されることを確認
+        assert len(call_args[1]["ids"]) == len(passed_documents)
+        manifest = IndexManifest(integration_settings.chroma_persist_directory).load()
+        assert manifest["chunk_ids"] == call_args[1]["ids"]
 
     @patch("src.services.rag_service.ChatOpenAI")
     @patch("src.services.rag_service.EmbeddingService")
@@ -126,16 +129,14 @@ class TestFullRAGPipeline:
                 0.6,
             ),
         ]
-        mock_vector_store.similarity_search_with_score.return_value = (
-            test_search_results
-        )
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = test_search_results
 
         # LLMの応答モック
         mock_llm = Mock()
         mock_chat_openai.return_value = mock_llm
 
         # LLMChainのモック
-        with patch("src.services.rag_service.LLMChain") as mock_llm_chain:
+        with patch("src.services.prompt_registry.LLMChain") as mock_llm_chain:
             mock_chain_instance = Mock()
             mock_llm_chain.return_value = mock_chain_instance
             mock_chain_instance.run.return_value = (
@@ -161,8 +162,11 @@ class TestFullRAGPipeline:
             assert response.confidence > 0
 
             # 検索が正しく実行されたことを確認
-            mock_vector_store.similarity_search_with_score.assert_called_once_with(
-                "ゲームの基本システムについて教えて", k=2
+            rag_service.embedding_service.embed_query.assert_called_once_with(
+                "ゲームの基本システムについて教えて"
+            )
+            mock_vector_store.similarity_search_by_vector_with_relevance_scores.assert_called_once_with(
+                rag_service.embedding_service.embed_query.return_value, k=2
             )
 
             # LLMChainが正しく実行されたことを確認
@@ -225,14 +229,12 @@ class TestFullRAGPipeline:
                 0.1,
             ),  # しきい値以下
         ]
-        mock_vector_store.similarity_search_with_score.return_value = (
-            test_search_results
-        )
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = test_search_results
 
         mock_llm = Mock()
         mock_chat_openai.return_value = mock_llm
 
-        with patch("src.services.rag_service.LLMChain") as mock_llm_chain:
+        with patch("src.services.prompt_registry.LLMChain") as mock_llm_chain:
             mock_chain_instance = Mock()
             mock_llm_chain.return_value = mock_chain_instance
             mock_chain_instance.run.return_value = (
@@ -283,14 +285,12 @@ class TestFullRAGPipeline:
                 0.8,
             ),
         ]
-        mock_vector_store.similarity_search_with_score.return_value = (
-            test_search_results
-        )
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = test_search_results
 
         mock_llm = Mock()
         mock_chat_openai.return_value = mock_llm
 
-        with patch("src.services.rag_service.LLMChain") as mock_llm_chain:
+        with patch("src.services.prompt_registry.LLMChain") as mock_llm_chain:
             mock_chain_instance = Mock()
             mock_llm_chain.return_value = mock_chain_instance
             mock_chain_instance.run.return_value = (
@@ -335,7 +335,7 @@ class TestFullRAGPipeline:
         mock_chroma.from_documents.return_value = mock_vector_store
 
         # 検索結果なし
-        mock_vector_store.similarity_search_with_score.return_value = []
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = []
 
         mock_llm = Mock()
         mock_chat_openai.return_value = mock_llm
@@ -395,14 +395,12 @@ class TestFullRAGPipeline:
                 0.6,
             ),
         ]
-        mock_vector_store.similarity_search_with_score.return_value = (
-            test_search_results
-        )
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = test_search_results
 
         mock_llm = Mock()
         mock_chat_openai.return_value = mock_llm
 
-        with patch("src.services.rag_service.LLMChain") as mock_llm_chain:
+        with patch("src.services.prompt_registry.LLMChain") as mock_llm_chain:
             mock_chain_instance = Mock()
             mock_llm_chain.return_value = mock_chain_instance
             mock_chain_instance.run.return_value = (
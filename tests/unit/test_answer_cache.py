@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from src.config.prompts import CustomPromptTemplates, PromptTemplates
+from src.services.answer_cache import (
+    MemoryAnswerCache,
+    SQLiteAnswerCache,
+    answer_cache_key,
+    prompt_template_hash,
+)
+
+
+@pytest.fixture
+def template_hash():
+    return prompt_template_hash(PromptTemplates())
+
+
+class TestAnswerCacheKey:
+    """answer_cache_key 関数のテスト"""
+
+    def test_normalized_question(self, template_hash):
+        """全角/半角や空白の違いは同じキーになることをテスト"""
+        key = answer_cache_key("ＨＰの上限は？", ["a"], template_hash, "gpt-4o-mini")
+
+        assert key == answer_cache_key(
+            "  HPの上限は?  ", ["a"], template_hash, "gpt-4o-mini"
+        )
+
+    def test_components_change_key(self, template_hash):
+        """チャンク・テンプレート・モデルが異なる場合は別のキーになることをテスト"""
+        key = answer_cache_key("質問", ["a", "b"], template_hash, "gpt-4o-mini")
+        other_template = prompt_template_hash(
+            CustomPromptTemplates.create_custom(system_prompt="別のプロンプト")
+        )
+
+        assert key != answer_cache_key("質問", ["b", "a"], template_hash, "gpt-4o-mini")
+        assert key != answer_cache_key(
+            "質問", ["a", "b"], other_template, "gpt-4o-mini"
+        )
+        assert key != answer_cache_key("質問", ["a", "b"], template_hash, "gpt-4o")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, temp_dir):
+    if request.param == "memory":
+        yield MemoryAnswerCache(max_size=2)
+    else:
+        cache = SQLiteAnswerCache(os.path.join(temp_dir, "answers.sqlite3"), 2)
+        yield cache
+        cache.close()
+
+
+class TestAnswerCacheBackends:
+    """MemoryAnswerCache・SQLiteAnswerCache 共通のテスト"""
+
+    def test_put_and_get(self, cache):
+        """登録した回答を取得できることをテスト"""
+        value = {"answer": "回答", "sources": [], "confidence": 0.5}
+        cache.put("key", "v1", value)
+
+        assert cache.get("key", "v1") == value
+        assert cache.get("other", "v1") is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+    def test_invalidated_on_index_version_change(self, cache):
+        """インデックスのバージョンが変わると古い回答を返さないことをテスト"""
+        cache.put("key", "v1", {"answer": "古い回答"})
+
+        assert cache.get("key", "v2") is None
+        cache.put("key2", "v2", {"answer": "新しい回答"})
+        assert cache.stats()["size"] == 1
+        assert cache.get("key2", "v2") == {"answer": "新しい回答"}
+
+    def test_max_size(self, cache):
+        """上限を超えると古い回答から削除されることをテスト"""
+        for index in range(3):
+            cache.put(f"key{index}", "v1", {"answer": f"回答{index}"})
+
+        assert cache.get("key0", "v1") is None
+        assert cache.get("key2", "v1") == {"answer": "回答2"}
+
+
+class TestSQLiteAnswerCache:
+    """SQLiteAnswerCache クラスのテスト"""
+
+    def test_shared_between_instances(self, temp_dir):
+        """別のワーカー（インスタンス）が登録した回答を取得できることをテスト"""
+        path = os.path.join(temp_dir, "cache", "answers.sqlite3")
+        writer = SQLiteAnswerCache(path)
+        reader = SQLiteAnswerCache(path)
+
+        writer.put("key", "v1", {"answer": "回答"})
+
+        assert reader.get("key", "v1") == {"answer": "回答"}
+        writer.close()
+        reader.close()
@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import os
+
+import pytest
+
+from src.services.asset_extractor import InlineAssetExtractor, find_asset_references
+
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+PNG_BASE64 = base64.b64encode(PNG_BYTES).decode("ascii")
+PNG_NAME = f"{hashlib.sha256(PNG_BYTES).hexdigest()[:16]}.png"
+
+
+class TestInlineAssetExtractor:
+    """InlineAssetExtractor クラスのテスト"""
+
+    def test_replace_data_uri_with_placeholder(self, temp_dir):
+        """データURIがプレースホルダーに置換され、アセットが保存されることをテスト"""
+        extractor = InlineAssetExtractor(temp_dir)
+        line = f"[image1]: <data:image/png;base64,{PNG_BASE64}>"
+
+        result = extractor.replace(line)
+
+        assert result == f"[image1]: <asset:{PNG_NAME}>"
+        with open(os.path.join(temp_dir, PNG_NAME), "rb") as f:
+            assert f.read() == PNG_BYTES
+
+    def test_same_content_is_stored_once(self, temp_dir):
+        """同一内容のアセットは同じ名前で1度だけ保存されることをテスト"""
+        extractor = InlineAssetExtractor(temp_dir)
+        line = f"<data:image/png;base64,{PNG_BASE64}>"
+
+        first = extractor.replace(line)
+        second = extractor.replace(line)
+
+        assert first == second
+        assert os.listdir(temp_dir) == [PNG_NAME]
+
+    def test_replace_bare_base64_blob(self, temp_dir):
+        """データURIで包まれていない長いbase64ブロブも置換されることをテスト"""
+        extractor = InlineAssetExtractor(temp_dir, min_blob_length=64)
+
+        result = extractor.replace(f"バイナリ: {PNG_BASE64}")
+
+        assert result.startswith("バイナリ: asset:")
+        assert result.endswith(".bin")
+
+    def test_plain_text_is_unchanged(self, temp_dir):
+        """通常のテキストは変更されないことをテスト"""
+        extractor = InlineAssetExtractor(temp_dir)
+        text = "ガチャの天井は100回です。data: という単語を含みます。"
+
+        assert extractor.replace(text) == text
+        assert os.listdir(temp_dir) == []
+
+    def test_without_asset_directory(self):
+        """アセットディレクトリ未指定でも置換のみ行われることをテスト"""
+        extractor = InlineAssetExtractor()
+
+        result = extractor.replace(f"<data:image/png;base64,{PNG_BASE64}>")
+
+        assert result == f"<asset:{PNG_NAME}>"
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("アセットなし", []),
+        (f"<asset:{PNG_NAME}>", [PNG_NAME]),
+        (
+            f"<asset:{PNG_NAME}> <asset:0123456789abcdef.bin> <asset:{PNG_NAME}>",
+            [PNG_NAME, "0123456789abcdef.bin"],
+        ),
+    ],
+)
+def test_find_asset_references(text, expected):
+    """プレースホルダーからのアセット参照抽出をパラメータ化テストで検証"""
+    assert find_asset_references(text) == expected
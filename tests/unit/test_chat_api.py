@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
 
@@ -44,7 +44,7 @@ class TestChatAPI:
         from src.api.chat import get_rag_service
 
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
         # チャットレスポンスのモック
         mock_response = ChatResponse(
@@ -58,7 +58,7 @@ class TestChatAPI:
             ],
             confidence=0.85,
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -82,7 +82,7 @@ class TestChatAPI:
             assert data["confidence"] == 0.85
 
             # RAGサービスが正しく呼ばれたことを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="テストの質問です", max_results=3, session_id=None
             )
         finally:
@@ -93,9 +93,9 @@ class TestChatAPI:
         """デフォルトのmax_resultsでのチャットリクエストをテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_response = ChatResponse(answer="回答", sources=[], confidence=0.5)
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -108,7 +108,7 @@ class TestChatAPI:
             assert response.status_code == 200
 
             # デフォルト値（3）で呼ばれることを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="質問", max_results=3, session_id=None
             )
         finally:
@@ -118,9 +118,9 @@ class TestChatAPI:
         """カスタムmax_resultsでのチャットリクエストをテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_response = ChatResponse(answer="回答", sources=[], confidence=0.5)
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -135,7 +135,7 @@ class TestChatAPI:
             assert response.status_code == 200
 
             # カスタム値で呼ばれることを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="質問", max_results=7, session_id=None
             )
         finally:
@@ -169,9 +169,9 @@ class TestChatAPI:
         """内部エラーの処理をテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         # RAGサービスで例外が発生
-        mock_rag_service.chat.side_effect = Exception("テストエラー")
+        mock_rag_service.achat.side_effect = Exception("テストエラー")
 
         # 依存性をオーバーライド
         app = client.app
@@ -190,11 +190,11 @@ class TestChatAPI:
         """日本語の質問での処理をテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_response = ChatResponse(
             answer="日本語での回答です。", sources=[], confidence=0.7
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -209,7 +209,7 @@ class TestChatAPI:
             assert data["answer"] == "日本語での回答です。"
 
             # 日本語の質問が正しく渡されることを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question=japanese_question, max_results=3, session_id=None
             )
         finally:
@@ -219,11 +219,11 @@ class TestChatAPI:
         """長い質問での処理をテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_response = ChatResponse(
             answer="長い質問への回答", sources=[], confidence=0.6
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -237,7 +237,7 @@ class TestChatAPI:
             assert response.status_code == 200
 
             # 長い質問も正しく処理されることを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question=long_question, max_results=3, session_id=None
             )
         finally:
@@ -410,11 +410,11 @@ def test_chat_endpoint_various_inputs(question, max_results, client):
     """様々な入力でのチャットエンドポイントをパラメータ化テストで検証"""
     from src.api.chat import get_rag_service
 
-    mock_rag_service = Mock()
+    mock_rag_service = Mock(achat=AsyncMock())
     mock_response = ChatResponse(
         answer=f"回答: {question[:20]}...", sources=[], confidence=0.5
     )
-    mock_rag_service.chat.return_value = mock_response
+    mock_rag_service.achat.return_value = mock_response
 
     # 依存性をオーバーライド
     app = client.app
@@ -426,7 +426,7 @@ def test_chat_endpoint_various_inputs(question, max_results, client):
         )
 
         assert response.status_code == 200
-        mock_rag_service.chat.assert_called_once_with(
+        mock_rag_service.achat.assert_called_once_with(
             question=question, max_results=max_results, session_id=None
         )
     finally:
@@ -451,14 +451,14 @@ class TestChatWithSession:
         """session_idを含むチャットリクエストをテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_response = ChatResponse(
             answer="セッション内での回答",
             sources=[],
             confidence=0.8,
             session_id="test-session-123",
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -480,7 +480,7 @@ class TestChatWithSession:
             assert data["session_id"] == "test-session-123"
 
             # session_idが正しく渡されることを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="前回の質問に続いて...",
                 max_results=3,
                 session_id="test-session-123",
@@ -492,14 +492,14 @@ class TestChatWithSession:
         """session_idがNoneの場合のテスト"""
         from src.api.chat import get_rag_service
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_response = ChatResponse(
             answer="新規セッションでの回答",
             sources=[],
             confidence=0.7,
             session_id="auto-generated-session-456",
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # 依存性をオーバーライド
         app = client.app
@@ -515,7 +515,7 @@ class TestChatWithSession:
             assert data["session_id"] == "auto-generated-session-456"
 
             # session_idがNoneで渡されることを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="新しい質問です", max_results=3, session_id=None
             )
         finally:
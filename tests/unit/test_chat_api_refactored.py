@@ -1,5 +1,6 @@
+import json
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
 
@@ -144,7 +145,7 @@ class TestRefactoredChatAPI:
     ):
         """リファクタリング後の依存性注入でのチャットエンドポイントをテスト"""
         # RAGサービスのモック
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
 
         # チャットレスポンスのモック
         mock_response = ChatResponse(
@@ -158,7 +159,7 @@ class TestRefactoredChatAPI:
             ],
             confidence=0.85,
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
 
         # dependency_overridesを使ってRAGサービスをモックに置き換え
         app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
@@ -183,7 +184,7 @@ class TestRefactoredChatAPI:
             assert data["confidence"] == 0.85
 
             # RAGサービスが正しく呼ばれたことを確認
-            mock_rag_service.chat.assert_called_once_with(
+            mock_rag_service.achat.assert_called_once_with(
                 question="リファクタリング後のテスト質問です",
                 max_results=3,
                 session_id=None,
@@ -213,6 +214,101 @@ class TestRefactoredChatAPI:
             # テスト後にdependency_overridesをクリア
             app.dependency_overrides.clear()
 
+    def test_metrics_endpoint(self, app, client, reset_container):
+        """メトリクスエンドポイントがキャッシュ統計を返すことをテスト"""
+        mock_rag_service = Mock()
+        mock_rag_service.get_metrics.return_value = {
+            "query_embedding_cache": {
+                "hits": 3,
+                "misses": 1,
+                "hit_rate": 0.75,
+                "size": 1,
+                "max_size": 1024,
+            },
+            "query_batcher": {"batches": 2, "queries": 6, "average_batch_size": 3.0},
+            "embedding_model": {
+                "loaded": True,
+                "load_count": 1,
+                "unload_count": 0,
+                "last_load_seconds": 4.2,
+                "total_load_seconds": 4.2,
+                "model_resident_bytes": 2_000_000_000,
+                "process_resident_bytes": 2_300_000_000,
+            },
+        }
+        app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
+
+        try:
+            response = client.get("/api/v1/metrics")
+
+            assert response.status_code == 200
+            assert response.json()["query_embedding_cache"]["hit_rate"] == 0.75
+            assert response.json()["embedding_model"]["load_count"] == 1
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_chat_stream_endpoint(self, app, client, reset_container):
+        """ストリーミングエンドポイントがイベントを順にSSEで返すことをテスト"""
+
+        async def events(**kwargs):
+            for event in [
+                ("sources", {"sources": [{"content": "内容", "section": "A"}]}),
+                ("token", {"text": "回答"}),
+                ("token", {"text": "です。"}),
+                ("done", {"confidence": 0.8, "session_id": "session-1"}),
+            ]:
+                yield event
+
+        mock_rag_service = Mock()
+        mock_rag_service.astream_chat.side_effect = events
+        app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
+
+        try:
+            response = client.post(
+                "/api/v1/chat/stream",
+                json={"question": "質問", "max_results": 2, "session_id": "session-1"},
+            )
+
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [
+                (block.split("\n")[0], json.loads(block.split("\n")[1][6:]))
+                for block in response.text.strip().split("\n\n")
+            ]
+            assert [event for event, _ in events] == [
+                "event: sources",
+                "event: token",
+                "event: token",
+                "event: done",
+            ]
+            assert events[3][1] == {"confidence": 0.8, "session_id": "session-1"}
+            mock_rag_service.astream_chat.assert_called_once_with(
+                question="質問", max_results=2, session_id="session-1"
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_chat_stream_endpoint_error(self, app, client, reset_container):
+        """処理中のエラーがエラーイベントとして通知されることをテスト"""
+
+        async def failing_events(**kwargs):
+            yield "sources", {"sources": []}
+            raise RuntimeError("上流のエラー")
+
+        mock_rag_service = Mock()
+        mock_rag_service.astream_chat.side_effect = failing_events
+        app.dependency_overrides[get_rag_service] = lambda: mock_rag_service
+
+        try:
+            response = client.post("/api/v1/chat/stream", json={"question": "質問"})
+
+            assert response.status_code == 200
+            assert response.text.endswith(
+                'event: error\ndata: {"detail": "内部サーバーエラーが発生しました"}\n\n'
+            )
+        finally:
+            app.dependency_overrides.clear()
+
 
 class TestRAGServiceContainerIntegration:
     """RAGServiceContainer の統合テスト"""
@@ -290,13 +386,13 @@ class TestBackwardCompatibility:
         mock_container = Mock()
         mock_container_class.return_value = mock_container
 
-        mock_rag_service = Mock()
+        mock_rag_service = Mock(achat=AsyncMock())
         mock_container.get_or_create_rag_service.return_value = mock_rag_service
 
         mock_response = ChatResponse(
             answer="後方互換性テストの回答", sources=[], confidence=0.5
         )
-        mock_rag_service.chat.return_value = mock_response
+        mock_rag_service.achat.return_value = mock_response
         mock_rag_service.is_ready.return_value = True
 
         # チャットエンドポイントのテスト
@@ -322,12 +418,12 @@ def test_refactored_endpoint_various_inputs(
     question, expected_calls, client, reset_container
 ):
     """リファクタリング後のエンドポイントで様々な入力をパラメータ化テストで検証"""
-    mock_rag_service = Mock()
+    mock_rag_service = Mock(achat=AsyncMock())
 
     mock_response = ChatResponse(
         answer=f"回答: {question[:20]}...", sources=[], confidence=0.5
     )
-    mock_rag_service.chat.return_value = mock_response
+    mock_rag_service.achat.return_value = mock_response
 
     # 依存性をオーバーライド
     app = client.app
@@ -339,6 +435,6 @@ def test_refactored_endpoint_various_inputs(
         )
 
         assert response.status_code == 200
-        assert mock_rag_service.chat.call_count == expected_calls
+        assert mock_rag_service.achat.call_count == expected_calls
     finally:
         app.dependency_overrides.clear()
@@ -98,6 +98,18 @@ class TestSettings:
         settings = Settings(similarity_threshold=0.7)
         assert settings.similarity_threshold == 0.7
 
+    def test_prompt_templates_are_cached(self):
+        """プロンプトテンプレートは初回に作成したものを使い回し、再読み込みで作り直すことをテスト"""
+        settings = Settings()
+        templates = settings.prompt_templates
+
+        assert settings.prompt_templates is templates
+
+        settings.reload_prompt_templates()
+
+        assert settings.prompt_templates is not templates
+        assert settings.prompt_templates == templates
+
 
 class TestGetSettings:
     """get_settings 関数のテスト"""
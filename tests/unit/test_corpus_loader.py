@@ -0,0 +1,160 @@
+import base64
+import hashlib
+import os
+import threading
+import warnings
+import pytest
+from unittest.mock import patch
+
+from src.services.corpus_loader import CorpusLoader, resolve_spec_files
+
+
+def _write_spec(directory: str, relative_path: str, title: str) -> str:
+    """テスト用の仕様書ファイルを作成"""
+    file_path = os.path.join(directory, relative_path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(f"## **1. {title}**\n\n{title}の本文です。\n")
+    return file_path
+
+
+class TestResolveSpecFiles:
+    """resolve_spec_files のテスト"""
+
+    def test_single_file(self, temp_dir):
+        """単一ファイルはそのまま返されることをテスト"""
+        file_path = _write_spec(temp_dir, "spec.md", "仕様")
+        assert resolve_spec_files(file_path) == [file_path]
+
+    def test_directory(self, temp_dir):
+        """ディレクトリ配下の*.mdが再帰的にソート済みで返されることをテスト"""
+        second = _write_spec(temp_dir, "b/battle.md", "戦闘")
+        first = _write_spec(temp_dir, "a.md", "概要")
+        with open(os.path.join(temp_dir, "notes.txt"), "w") as f:
+            f.write("対象外")
+
+        assert resolve_spec_files(temp_dir) == [first, second]
+
+    def test_glob_pattern(self, temp_dir):
+        """globパターンに一致するファイルのみが返されることをテスト"""
+        matched = _write_spec(temp_dir, "v2/spec.md", "新仕様")
+        _write_spec(temp_dir, "v1/spec.md", "旧仕様")
+
+        assert resolve_spec_files(os.path.join(temp_dir, "v2", "*.md")) == [matched]
+
+    def test_missing_path(self, temp_dir):
+        """存在しないパスでは空リストが返されることをテスト"""
+        assert resolve_spec_files(os.path.join(temp_dir, "missing.md")) == []
+
+
+class TestCorpusLoader:
+    """CorpusLoader のテスト"""
+
+    @pytest.fixture
+    def corpus_dir(self, temp_dir):
+        """複数ファイルからなる仕様書コーパス"""
+        for index in range(4):
+            _write_spec(temp_dir, f"system{index}/spec.md", f"システム{index}")
+        return temp_dir
+
+    def test_load_documents_records_source_file(self, corpus_dir):
+        """各チャンクに元ファイルの情報が記録されることをテスト"""
+        documents = CorpusLoader(corpus_dir, max_workers=1).load_documents()
+
+        assert [doc.metadata["source_file"] for doc in documents] == [
+            os.path.join(f"system{index}", "spec.md") for index in range(4)
+        ]
+        assert all(
+            doc.metadata["source"]
+            == os.path.join(corpus_dir, doc.metadata["source_file"])
+            for doc in documents
+        )
+
+    def test_parallel_matches_serial(self, corpus_dir):
+        """プロセスプールでの読み込み結果が逐次処理と一致することをテスト"""
+        serial = CorpusLoader(corpus_dir, max_workers=1).load_documents()
+        parallel = CorpusLoader(corpus_dir, max_workers=2).load_documents()
+
+        assert [(doc.page_content, doc.metadata) for doc in parallel] == [
+            (doc.page_content, doc.metadata) for doc in serial
+        ]
+
+    def test_parallel_workers_share_asset(self, temp_dir):
+        """複数のワーカーが同じ画像を同時に書き出しても1つのアセットになることをテスト"""
+        image = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+        data_uri = f"data:image/png;base64,{base64.b64encode(image).decode('ascii')}"
+        spec_dir = os.path.join(temp_dir, "specs")
+        asset_dir = os.path.join(temp_dir, "assets")
+        for index in range(8):
+            file_path = _write_spec(spec_dir, f"system{index}/spec.md", f"画面{index}")
+            with open(file_path, "a", encoding="utf-8") as f:
+                f.write(f"\n[image1]: <{data_uri}>\n")
+
+        documents = CorpusLoader(
+            spec_dir, asset_directory=asset_dir, max_workers=4
+        ).load_documents()
+
+        asset_name = f"{hashlib.sha256(image).hexdigest()[:16]}.png"
+        assert len({doc.metadata["source_file"] for doc in documents}) == 8
+        assert os.listdir(asset_dir) == [asset_name]
+        with open(os.path.join(asset_dir, asset_name), "rb") as f:
+            assert f.read() == image
+
+    def test_parallel_load_from_threaded_process(self, corpus_dir):
+        """スレッドが動いているプロセスからでもforkせずにプロセスプールで読み込めることをテスト"""
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                documents = CorpusLoader(corpus_dir, max_workers=2).load_documents()
+        finally:
+            stop.set()
+            thread.join()
+
+        assert len({doc.metadata["source_file"] for doc in documents}) == 4
+        assert not [
+            warning
+            for warning in caught
+            if issubclass(warning.category, DeprecationWarning)
+            and "fork" in str(warning.message)
+        ]
+
+    def test_single_file_source_file(self, temp_dir):
+        """単一ファイル指定ではファイル名がsource_fileになることをテスト"""
+        file_path = _write_spec(temp_dir, "spec.md", "仕様")
+
+        documents = CorpusLoader(file_path).load_documents()
+
+        assert documents[0].metadata["source_file"] == "spec.md"
+
+    def test_load_documents_not_found(self, temp_dir):
+        """対象ファイルがない場合にFileNotFoundErrorとなることをテスト"""
+        loader = CorpusLoader(os.path.join(temp_dir, "*.md"))
+
+        with pytest.raises(FileNotFoundError) as exc_info:
+            loader.load_documents()
+
+        assert "仕様書ファイルが見つかりません" in str(exc_info.value)
+
+    @patch("src.services.corpus_loader.DocumentLoader")
+    @patch("src.services.corpus_loader.get_embedding_token_counter")
+    def test_token_counter_model(
+        self, mock_get_counter, mock_document_loader, temp_dir
+    ):
+        """トークン単位の場合は埋め込みモデルのトークナイザーで測ることをテスト"""
+        file_path = _write_spec(temp_dir, "spec.md", "仕様")
+
+        CorpusLoader(
+            file_path, 400, 50, token_counter_model="test/model"
+        ).load_documents()
+
+        mock_get_counter.assert_called_once_with("test/model")
+        mock_document_loader.assert_called_once_with(
+            file_path,
+            400,
+            50,
+            asset_directory=None,
+            token_counter=mock_get_counter.return_value,
+        )
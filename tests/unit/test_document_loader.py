@@ -1,5 +1,7 @@
+import base64
+import os
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 from langchain.schema import Document
 
 from src.services.document_loader import DocumentLoader
@@ -15,7 +17,7 @@ class TestDocumentLoader:
         assert loader.file_path == "test_file.md"
         assert loader.chunk_size == 1000
         assert loader.chunk_overlap == 200
-        assert loader.text_splitter is not None
+        assert loader.asset_extractor is not None
 
     def test_init_custom_parameters(self):
         """カスタムパラメータでの初期化をテスト"""
@@ -27,18 +29,10 @@ class TestDocumentLoader:
         assert loader.chunk_size == 500
         assert loader.chunk_overlap == 100
 
-    def test_text_splitter_configuration(self):
-        """テキストスプリッターの設定をテスト"""
-        loader = DocumentLoader("test_file.md", chunk_size=800, chunk_overlap=150)
-
-        # RecursiveCharacterTextSplitterが正しく設定されていることを確認
-        assert loader.text_splitter._chunk_size == 800
-        assert loader.text_splitter._chunk_overlap == 150
-
-        # セパレーターが正しく設定されていることを確認
-        expected_separators = ["\n## ", "\n### ", "\n\n", "\n", " ", ""]
-        assert loader.text_splitter._separators == expected_separators
-        assert loader.text_splitter._keep_separator is True
+    def test_init_overlap_larger_than_chunk_size(self):
+        """オーバーラップがチャンクサイズを超える場合にエラーとなることをテスト"""
+        with pytest.raises(ValueError):
+            DocumentLoader("test_file.md", chunk_size=100, chunk_overlap=150)
 
     def test_load_documents_file_not_found(self):
         """存在しないファイルでFileNotFoundErrorが発生することをテスト"""
@@ -50,18 +44,8 @@ class TestDocumentLoader:
         assert "仕様書ファイルが見つかりません" in str(exc_info.value)
         assert "non_existent_file.md" in str(exc_info.value)
 
-    @patch("src.services.document_loader.TextLoader")
-    @patch("os.path.exists")
-    def test_load_documents_success(self, mock_exists, mock_text_loader):
+    def test_load_documents_success(self, temp_dir):
         """正常なドキュメント読み込みをテスト"""
-        # ファイル存在チェックをモック
-        mock_exists.return_value = True
-
-        # TextLoaderをモック
-        mock_loader_instance = Mock()
-        mock_text_loader.return_value = mock_loader_instance
-
-        # ドキュメントコンテンツをモック
         test_content = """# テストドキュメント
 
 ## **1. セクション1**
@@ -76,144 +60,88 @@ class TestDocumentLoader:
 
 これはセクション2の内容です。
 """
-        mock_document = Document(page_content=test_content)
-        mock_loader_instance.load.return_value = [mock_document]
-
-        loader = DocumentLoader("test_file.md", chunk_size=100, chunk_overlap=20)
-
-        # パッチを適用してテスト実行
-        with patch.object(loader, "_enrich_documents") as mock_enrich:
-            mock_enrich.return_value = [mock_document]
-
-            with patch.object(loader.text_splitter, "split_documents") as mock_split:
-                expected_chunks = [
-                    Document(
-                        page_content="チャンク1", metadata={"section": "セクション1"}
-                    ),
-                    Document(
-                        page_content="チャンク2", metadata={"section": "セクション2"}
-                    ),
-                ]
-                mock_split.return_value = expected_chunks
+        file_path = os.path.join(temp_dir, "test_file.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(test_content)
 
-                result = loader.load_documents()
+        loader = DocumentLoader(file_path, chunk_size=100, chunk_overlap=20)
 
-        # TextLoaderが正しい引数で呼ばれたことを確認
-        mock_text_loader.assert_called_once_with("test_file.md", encoding="utf-8")
-        mock_loader_instance.load.assert_called_once()
+        # ファイル全体を一括で読み込まず、行単位で読み込むことを確認
+        with patch.object(
+            loader, "_iter_lines", wraps=loader._iter_lines
+        ) as mock_iter_lines:
+            result = loader.load_documents()
 
-        # _enrich_documentsが呼ばれたことを確認
-        mock_enrich.assert_called_once_with([mock_document])
-
-        # split_documentsが呼ばれたことを確認
-        mock_split.assert_called_once_with([mock_document])
+        mock_iter_lines.assert_called_once()
 
         # 結果が正しいことを確認
-        assert result == expected_chunks
-
-    def test_enrich_documents_section_detection(self):
-        """セクション検出機能をテスト"""
-        test_content = """# タイトル
-
-## **1. 第一セクション**
-
-第一セクションの内容です。
-これは複数行の内容です。
-
-### **1.1 第一サブセクション**
-
-第一サブセクションの内容です。
-
-### **1.2 第二サブセクション**
-
-第二サブセクションの内容です。
-
-## **2. 第二セクション**
-
-第二セクションの内容です。
-
-### **2.1 別のサブセクション**
-
-別のサブセクションの内容です。
-"""
-
-        loader = DocumentLoader("test_file.md", chunk_size=200, chunk_overlap=50)
-        input_doc = Document(page_content=test_content)
-
-        result = loader._enrich_documents([input_doc])
-
-        # 結果がDocumentのリストであることを確認
-        assert isinstance(result, list)
-        assert all(isinstance(doc, Document) for doc in result)
-
-        # 各チャンクにメタデータが含まれていることを確認
-        for doc in result:
-            assert "source" in doc.metadata
-            assert "section" in doc.metadata
-            assert "subsection" in doc.metadata
-            assert doc.metadata["source"] == "test_file.md"
-
-    def test_enrich_documents_empty_content(self):
-        """空のコンテンツの処理をテスト"""
-        loader = DocumentLoader("test_file.md")
-        input_doc = Document(page_content="")
-
-        result = loader._enrich_documents([input_doc])
-
-        # 空のコンテンツでも適切に処理されることを確認
-        assert isinstance(result, list)
-
-    def test_enrich_documents_no_sections(self):
-        """セクションのないドキュメントの処理をテスト"""
-        test_content = """これはセクションヘッダーのない
-普通のテキストコンテンツです。
-
-複数の段落があります。
-
-最後の段落です。
-"""
-
-        loader = DocumentLoader("test_file.md", chunk_size=100, chunk_overlap=20)
-        input_doc = Document(page_content=test_content)
-
-        result = loader._enrich_documents([input_doc])
-
-        # セクションがない場合でも適切に処理されることを確認
-        assert isinstance(result, list)
-        for doc in result:
-            assert doc.metadata["section"] == ""
-            assert doc.metadata["subsection"] == ""
+        assert len(result) > 0
+        assert all(isinstance(chunk, Document) for chunk in result)
+        assert all(chunk.metadata["source"] == file_path for chunk in result)
+        assert any(
+            chunk.metadata["section"] == "## **2. セクション2**" for chunk in result
+        )
 
-    def test_enrich_documents_section_metadata(self):
-        """セクションメタデータの正確性をテスト"""
-        test_content = """## **1. メインセクション**
+    def test_iter_documents_is_lazy(self, temp_dir):
+        """iter_documentsがチャンクを逐次生成することをテスト"""
+        file_path = os.path.join(temp_dir, "test_file.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("## **1. セクション**\n" + "テスト行です。\n" * 200)
+
+        loader = DocumentLoader(file_path, chunk_size=100, chunk_overlap=20)
+        iterator = loader.iter_documents()
+
+        first = next(iterator)
+        assert isinstance(first, Document)
+        assert first.metadata["section"] == "## **1. セクション**"
+        assert len(list(iterator)) > 0
+
+    def test_load_documents_extracts_inline_assets(self, temp_dir):
+        """埋め込み画像がチャンク化前に抽出されることをテスト"""
+        payload = base64.b64encode(b"\x89PNG" + b"\x00" * 4096).decode("ascii")
+        file_path = os.path.join(temp_dir, "test_file.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(
+                f"## **1. セクション**\n本文です。\n\n[image1]: <data:image/png;base64,{payload}>\n"
+            )
+
+        asset_directory = os.path.join(temp_dir, "assets")
+        loader = DocumentLoader(
+            file_path, chunk_size=100, chunk_overlap=20, asset_directory=asset_directory
+        )
+        result = loader.load_documents()
 
-メインセクションの内容。
+        # base64ペイロードはチャンクに含まれず、1チャンクにまとまる
+        assert len(result) == 1
+        assert payload not in result[0].page_content
+        assert "[image1]: <asset:" in result[0].page_content
 
-### **1.1 サブセクション**
+        # アセット参照がメタデータに記録され、ファイルが保存されている
+        asset_name = result[0].metadata["assets"]
+        assert os.listdir(asset_directory) == [asset_name]
 
-サブセクションの内容。
-もう少し長い内容にします。
-"""
+    def test_load_documents_without_asset_extraction(self, temp_dir):
+        """抽出を無効にした場合はデータURIがそのまま残ることをテスト"""
+        file_path = os.path.join(temp_dir, "test_file.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("[image1]: <data:image/png;base64,iVBORw0KGgo=>\n")
 
-        loader = DocumentLoader("test_file.md", chunk_size=50, chunk_overlap=10)
-        input_doc = Document(page_content=test_content)
+        loader = DocumentLoader(file_path, extract_inline_assets=False)
+        result = loader.load_documents()
 
-        result = loader._enrich_documents([input_doc])
+        assert loader.asset_extractor is None
+        assert "data:image/png;base64" in result[0].page_content
+        assert "assets" not in result[0].metadata
 
-        # 少なくとも1つのドキュメントが生成されることを確認
-        assert len(result) > 0
+    def test_iter_documents_file_not_found(self):
+        """iter_documentsが呼び出し時点でFileNotFoundErrorを送出することをテスト"""
+        loader = DocumentLoader("non_existent_file.md")
 
-        # 最初のドキュメントのメタデータを確認
-        first_doc = result[0]
-        assert "## **1. メインセクション**" in first_doc.metadata["section"]
+        with pytest.raises(FileNotFoundError):
+            loader.iter_documents()
 
-    @patch("src.services.document_loader.TextLoader")
-    @patch("os.path.exists")
-    def test_load_documents_integration(self, mock_exists, mock_text_loader):
+    def test_load_documents_integration(self, temp_dir):
         """load_documentsの統合テスト"""
-        mock_exists.return_value = True
-
         # 実際のテストコンテンツ
         test_content = """# スゲリス・サーガ 仕様書
 
@@ -229,13 +157,11 @@ class TestDocumentLoader:
 
 キャラクター仕様について。
 """
+        file_path = os.path.join(temp_dir, "test_spec.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(test_content)
 
-        mock_loader_instance = Mock()
-        mock_text_loader.return_value = mock_loader_instance
-        mock_document = Document(page_content=test_content)
-        mock_loader_instance.load.return_value = [mock_document]
-
-        loader = DocumentLoader("test_spec.md", chunk_size=100, chunk_overlap=20)
+        loader = DocumentLoader(file_path, chunk_size=100, chunk_overlap=20)
         result = loader.load_documents()
 
         # 結果が適切に生成されることを確認
@@ -249,25 +175,6 @@ class TestDocumentLoader:
             assert hasattr(chunk, "metadata")
             assert "source" in chunk.metadata
 
-    def test_chunk_size_effect_on_splitting(self):
-        """チャンクサイズが分割に与える影響をテスト"""
-        test_content = "A" * 1000  # 1000文字のテキスト
-
-        # 小さなチャンクサイズ
-        small_loader = DocumentLoader("test.md", chunk_size=100, chunk_overlap=10)
-        small_input_doc = Document(page_content=test_content)
-        small_result = small_loader._enrich_documents([small_input_doc])
-
-        # 大きなチャンクサイズ
-        large_loader = DocumentLoader("test.md", chunk_size=500, chunk_overlap=10)
-        large_input_doc = Document(page_content=test_content)
-        large_result = large_loader._enrich_documents([large_input_doc])
-
-        # 小さなチャンクサイズの方がより多くのチャンクを生成することを確認
-        # （ただし、_enrich_documentsの実装によっては結果が異なる可能性がある）
-        assert len(small_result) >= 1
-        assert len(large_result) >= 1
-
 
 @pytest.mark.parametrize(
     "chunk_size,chunk_overlap",
@@ -286,8 +193,6 @@ def test_different_chunk_configurations(chunk_size, chunk_overlap):
 
     assert loader.chunk_size == chunk_size
     assert loader.chunk_overlap == chunk_overlap
-    assert loader.text_splitter._chunk_size == chunk_size
-    assert loader.text_splitter._chunk_overlap == chunk_overlap
 
 
 @pytest.mark.parametrize(
@@ -320,8 +225,7 @@ class TestDocumentLoaderEdgeCases:
         assert loader.chunk_overlap == 0
 
     def test_chunk_overlap_equals_chunk_size(self):
-        """チャンクオーバーラップがチャンクサイズと等しい場合をテスト"""
-        # これは実際の使用では推奨されないが、システムが壊れないことを確認
-        loader = DocumentLoader("test.md", chunk_size=100, chunk_overlap=100)
-        assert loader.chunk_size == 100
-        assert loader.chunk_overlap == 100
+        """チャンクオーバーラップがチャンクサイズと等しい場合にエラーとなることをテスト"""
+        # 長い行の分割が1文字ずつしか進まず、チャンク数が行の長さに比例してしまう
+        with pytest.raises(ValueError, match="より小さくしてください"):
+            DocumentLoader("test.md", chunk_size=100, chunk_overlap=100)
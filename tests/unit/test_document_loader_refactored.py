@@ -1,8 +1,18 @@
+import os
+import re
 import pytest
-from unittest.mock import Mock, patch
+from typing import List
 from langchain.schema import Document
 
 from src.services.document_loader import DocumentLoader
+from src.services.token_counter import TokenCounter
+
+
+class WordTokenCounter(TokenCounter):
+    """空白区切りの単語を1トークンとして数えるテスト用カウンター"""
+
+    def token_offsets(self, text: str) -> List[int]:
+        return [match.start() for match in re.finditer(r"\S+", text)]
 
 
 class TestDocumentLoaderRefactored:
@@ -56,18 +66,18 @@ class TestDocumentLoaderRefactored:
 
     def test_should_create_chunk_true(self, document_loader):
         """チャンクサイズを超えた場合のテスト"""
-        # chunk_size=100より大きいチャンク
-        large_chunk = ["A" * 50, "B" * 60]  # 合計110文字（改行込み）
+        # chunk_size=100より大きいチャンク長
+        large_chunk_length = len("\n".join(["A" * 50, "B" * 60]))  # 111文字
 
-        result = document_loader._should_create_chunk(large_chunk)
+        result = document_loader._should_create_chunk(large_chunk_length)
         assert result is True
 
     def test_should_create_chunk_false(self, document_loader):
         """チャンクサイズ以下の場合のテスト"""
-        # chunk_size=100以下のチャンク
-        small_chunk = ["A" * 30, "B" * 30]  # 合計61文字（改行込み）
+        # chunk_size=100以下のチャンク長
+        small_chunk_length = len("\n".join(["A" * 30, "B" * 30]))  # 61文字
 
-        result = document_loader._should_create_chunk(small_chunk)
+        result = document_loader._should_create_chunk(small_chunk_length)
         assert result is False
 
     def test_create_chunk_dict(self, document_loader):
@@ -113,7 +123,7 @@ class TestDocumentLoaderRefactored:
         assert documents[1].metadata["section"] == "## **2. セクション2**"
         assert documents[1].metadata["subsection"] == "### **2.1 サブセクション**"
 
-    def test_create_chunks_from_lines_simple(self, document_loader):
+    def test_iter_chunks_simple(self, document_loader):
         """シンプルな行からのチャンク作成をテスト"""
         lines = [
             "## **1. テストセクション**",
@@ -123,7 +133,7 @@ class TestDocumentLoaderRefactored:
             "サブセクションコンテンツ",
         ]
 
-        chunks = document_loader._create_chunks_from_lines(lines)
+        chunks = list(document_loader._iter_chunks(lines))
 
         # 小さなchunk_size(100)なので複数のチャンクに分割される可能性
         assert len(chunks) >= 1
@@ -132,7 +142,7 @@ class TestDocumentLoaderRefactored:
         assert all("section" in chunk for chunk in chunks)
         assert all("subsection" in chunk for chunk in chunks)
 
-    def test_create_chunks_from_lines_with_sections(self, document_loader):
+    def test_iter_chunks_with_sections(self, document_loader):
         """セクション情報を含む行からのチャンク作成をテスト"""
         lines = [
             "## **1. メインセクション**",
@@ -143,7 +153,7 @@ class TestDocumentLoaderRefactored:
             "別のセクションのコンテンツです。",
         ]
 
-        chunks = document_loader._create_chunks_from_lines(lines)
+        chunks = list(document_loader._iter_chunks(lines))
 
         # セクション情報が正しく設定されていることを確認
         for chunk in chunks:
@@ -153,64 +163,155 @@ class TestDocumentLoaderRefactored:
                     or chunk["section"] == ""
                 )
 
-    def test_process_single_document(self, document_loader):
-        """単一ドキュメント処理のテスト"""
-        test_content = """## **1. テストセクション**
 
-テストセクションの内容です。
+class TestDocumentLoaderSinglePassSplitting:
+    """1パスのセクション分割のテスト"""
 
-### **1.1 サブセクション**
+    def test_chunks_split_at_section_boundaries(self):
+        """セクション見出しでチャンクが区切られることをテスト"""
+        loader = DocumentLoader("test.md", chunk_size=1000, chunk_overlap=100)
+        lines = [
+            "## **1. 第一章**",
+            "第一章の本文です。",
+            "### **1.1 第一節**",
+            "第一節の本文です。",
+            "## **2. 第二章**",
+            "第二章の本文です。",
+        ]
 
-サブセクションの内容です。
+        chunks = list(loader._iter_chunks(lines))
 
-## **2. 別のセクション**
+        assert [chunk["content"] for chunk in chunks] == [
+            "## **1. 第一章**\n第一章の本文です。",
+            "### **1.1 第一節**\n第一節の本文です。",
+            "## **2. 第二章**\n第二章の本文です。",
+        ]
+        assert [(chunk["section"], chunk["subsection"]) for chunk in chunks] == [
+            ("## **1. 第一章**", ""),
+            ("## **1. 第一章**", "### **1.1 第一節**"),
+            ("## **2. 第二章**", ""),
+        ]
 
-別のセクションの内容です。"""
+    def test_heading_without_body_is_kept_with_subsection(self):
+        """本文のない親見出しは直後のサブセクションのチャンクに含まれることをテスト"""
+        loader = DocumentLoader("test.md", chunk_size=1000, chunk_overlap=100)
+        lines = ["## **1. 第一章**", "", "### **1.1 第一節**", "本文です。"]
 
-        test_doc = Document(page_content=test_content)
+        chunks = list(loader._iter_chunks(lines))
 
-        result_documents = document_loader._process_single_document(test_doc)
+        assert len(chunks) == 1
+        assert chunks[0]["content"] == "\n".join(lines)
+        assert chunks[0]["section"] == "## **1. 第一章**"
+        assert chunks[0]["subsection"] == "### **1.1 第一節**"
 
-        # 結果がDocumentのリストであることを確認
-        assert isinstance(result_documents, list)
-        assert all(isinstance(doc, Document) for doc in result_documents)
-        assert len(result_documents) >= 1
+    def test_chunks_never_exceed_chunk_size(self):
+        """すべてのチャンクがchunk_size以下になることをテスト"""
+        loader = DocumentLoader("test.md", chunk_size=50, chunk_overlap=10)
+        lines = ["## **1. 章**"] + [f"行{i}の本文テキスト" for i in range(30)]
+        lines.append("長い行" * 40)
 
-        # メタデータが正しく設定されていることを確認
-        for doc in result_documents:
-            assert "source" in doc.metadata
-            assert "section" in doc.metadata
-            assert "subsection" in doc.metadata
-            assert doc.metadata["source"] == "test_file.md"
+        chunks = list(loader._iter_chunks(lines))
 
-    def test_enrich_documents_integration(self, document_loader):
-        """_enrich_documentsの統合テスト（リファクタリング後）"""
-        test_content = """# タイトル
+        assert len(chunks) > 1
+        assert all(len(chunk["content"]) <= 50 for chunk in chunks)
 
-## **1. 第一セクション**
+    def test_overlap_within_section(self):
+        """同一セクション内で末尾の行がオーバーラップとして引き継がれることをテスト"""
+        loader = DocumentLoader("test.md", chunk_size=30, chunk_overlap=12)
+        lines = ["A" * 12, "B" * 12, "C" * 8, "D" * 12]
 
-第一セクションの内容です。
+        chunks = list(loader._iter_chunks(lines))
 
-### **1.1 第一サブセクション**
+        assert [chunk["content"] for chunk in chunks] == [
+            "A" * 12 + "\n" + "B" * 12,
+            "B" * 12 + "\n" + "C" * 8,
+            "C" * 8 + "\n" + "D" * 12,
+        ]
 
-第一サブセクションの内容です。"""
+    def test_long_line_split_with_overlap(self):
+        """chunk_sizeを超える1行がオーバーラップ付きで分割されることをテスト"""
+        loader = DocumentLoader("test.md", chunk_size=50, chunk_overlap=10)
+        line = "".join(chr(ord("a") + i % 26) for i in range(120))
 
-        input_docs = [Document(page_content=test_content)]
+        pieces = list(loader._split_long_line(line))
 
-        result = document_loader._enrich_documents(input_docs)
+        assert pieces == [line[0:50], line[40:90], line[80:120]]
 
-        # リファクタリング前と同じ結果が得られることを確認
-        assert isinstance(result, list)
-        assert len(result) >= 1
-        assert all(isinstance(doc, Document) for doc in result)
+    def test_long_line_prefers_soft_breaks(self):
+        """長い行は句点など区切りの良い位置で分割されることをテスト"""
+        loader = DocumentLoader("test.md", chunk_size=20, chunk_overlap=0)
+        line = "あ" * 15 + "。" + "い" * 15
+
+        pieces = list(loader._split_long_line(line))
+
+        assert pieces[0] == "あ" * 15 + "。"
+        assert "".join(pieces) == line
+
+
+class TestDocumentLoaderTokenBudget:
+    """トークン数を単位としたチャンク分割のテスト"""
+
+    def test_chunks_measured_in_tokens(self):
+        """chunk_sizeがトークン数として扱われることをテスト"""
+        loader = DocumentLoader(
+            "test.md",
+            chunk_size=7,
+            chunk_overlap=0,
+            token_counter=WordTokenCounter(),
+        )
+        # 文字数では十分短いが、トークン数（行間の改行は1と数える）ではchunk_sizeを超える
+        lines = ["a b c", "d e f", "g h"]
+
+        chunks = list(loader._iter_chunks(lines))
+
+        assert [chunk["content"] for chunk in chunks] == ["a b c\nd e f", "g h"]
+
+    def test_chunks_never_exceed_token_limit(self):
+        """すべてのチャンクがトークン上限以下になることをテスト"""
+        counter = WordTokenCounter()
+        loader = DocumentLoader(
+            "test.md", chunk_size=8, chunk_overlap=2, token_counter=counter
+        )
+        lines = ["## **1. 章**"] + [f"行 {i} の 本文" for i in range(20)]
+        lines.append(" ".join(["長い"] * 30))
+
+        chunks = list(loader._iter_chunks(lines))
+
+        assert len(chunks) > 1
+        assert all(counter.count(chunk["content"]) <= 8 for chunk in chunks)
+
+    def test_long_line_split_by_tokens(self):
+        """トークン上限を超える1行がトークン境界でオーバーラップ付きに分割されることをテスト"""
+        loader = DocumentLoader(
+            "test.md",
+            chunk_size=4,
+            chunk_overlap=1,
+            token_counter=WordTokenCounter(),
+        )
+        line = " ".join(f"w{i}" for i in range(7))
+
+        pieces = [piece.split() for piece in loader._split_long_line(line)]
+
+        assert pieces == [["w0", "w1", "w2", "w3"], ["w3", "w4", "w5", "w6"]]
+
+    def test_emit_chunk_resplits_when_token_total_exceeds_limit(self):
+        """行ごとの合計より実測のトークン数が多い場合も上限以下に分割されることをテスト"""
 
-        # メタデータが適切に設定されていることを確認
-        for doc in result:
-            assert hasattr(doc, "page_content")
-            assert hasattr(doc, "metadata")
-            assert "source" in doc.metadata
-            assert "section" in doc.metadata
-            assert "subsection" in doc.metadata
+        class JoinSensitiveCounter(WordTokenCounter):
+            """改行自体も1トークンとして数えるカウンター"""
+
+            def token_offsets(self, text: str) -> List[int]:
+                return [match.start() for match in re.finditer(r"\S+|\n", text)]
+
+        counter = JoinSensitiveCounter()
+        loader = DocumentLoader(
+            "test.md", chunk_size=4, chunk_overlap=0, token_counter=counter
+        )
+
+        chunks = list(loader._emit_chunk(["a b", "c", "d"], "", ""))
+
+        assert len(chunks) > 1
+        assert all(counter.count(chunk["content"]) <= 4 for chunk in chunks)
 
 
 class TestDocumentLoaderRefactoredEdgeCases:
@@ -250,31 +351,31 @@ class TestDocumentLoaderRefactoredEdgeCases:
             result = loader._detect_section_headers(line)
             assert result == expected, f"Failed for line: '{line}'"
 
-    def test_create_chunks_from_lines_empty_input(self):
+    def test_iter_chunks_empty_input(self):
         """空の入力での処理をテスト"""
         loader = DocumentLoader("test.md", chunk_size=100, chunk_overlap=20)
 
-        result = loader._create_chunks_from_lines([])
+        result = list(loader._iter_chunks([]))
         assert result == []
 
-    def test_create_chunks_from_lines_single_line(self):
+    def test_iter_chunks_single_line(self):
         """単一行での処理をテスト"""
         loader = DocumentLoader("test.md", chunk_size=100, chunk_overlap=20)
 
-        result = loader._create_chunks_from_lines(["単一の行です"])
+        result = list(loader._iter_chunks(["単一の行です"]))
         assert len(result) == 1
         assert result[0]["content"] == "単一の行です"
         assert result[0]["section"] == ""
         assert result[0]["subsection"] == ""
 
-    def test_create_chunks_from_lines_very_long_lines(self):
+    def test_iter_chunks_very_long_lines(self):
         """非常に長い行での処理をテスト"""
         loader = DocumentLoader("test.md", chunk_size=50, chunk_overlap=10)
 
         long_line = "A" * 100  # chunk_sizeの2倍
         lines = [long_line]
 
-        result = loader._create_chunks_from_lines(lines)
+        result = list(loader._iter_chunks(lines))
 
         # 長い行でも適切に処理されることを確認
         assert len(result) >= 1
@@ -287,40 +388,23 @@ class TestDocumentLoaderRefactoredEdgeCases:
         result = loader._convert_chunks_to_documents([])
         assert result == []
 
-    def test_process_single_document_empty_content(self):
-        """空のコンテンツでの処理をテスト"""
-        loader = DocumentLoader("test.md")
-
-        empty_doc = Document(page_content="")
-        result = loader._process_single_document(empty_doc)
-
-        # 空のコンテンツでも適切に処理されることを確認
-        assert isinstance(result, list)
-        # 空の場合は結果も空になる可能性がある
-        assert len(result) >= 0
-
 
 class TestDocumentLoaderBackwardCompatibility:
     """リファクタリング後の後方互換性テスト"""
 
-    @patch("src.services.document_loader.TextLoader")
-    @patch("os.path.exists")
-    def test_load_documents_still_works(self, mock_exists, mock_text_loader):
+    def test_load_documents_still_works(self, temp_dir):
         """load_documentsが引き続き動作することをテスト"""
-        mock_exists.return_value = True
-
         test_content = """## **1. テストセクション**
 テストコンテンツです。
 
 ### **1.1 サブセクション**
 サブセクションのコンテンツです。"""
 
-        mock_loader_instance = Mock()
-        mock_text_loader.return_value = mock_loader_instance
-        mock_document = Document(page_content=test_content)
-        mock_loader_instance.load.return_value = [mock_document]
+        file_path = os.path.join(temp_dir, "test_spec.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(test_content)
 
-        loader = DocumentLoader("test_spec.md", chunk_size=100, chunk_overlap=20)
+        loader = DocumentLoader(file_path, chunk_size=100, chunk_overlap=20)
         result = loader.load_documents()
 
         # リファクタリング前と同じインターフェースで動作することを確認
@@ -334,59 +418,6 @@ class TestDocumentLoaderBackwardCompatibility:
             assert "section" in chunk.metadata
             assert "subsection" in chunk.metadata
 
-    def test_refactored_methods_maintain_functionality(self):
-        """リファクタリングしたメソッドが元の機能を維持していることをテスト"""
-        loader = DocumentLoader("test.md", chunk_size=200, chunk_overlap=50)
-
-        # 複雑なテストケース
-        complex_content = """# メイン タイトル
-
-## **1. 第一章**
-
-第一章の導入部分です。
-ここには詳細な説明が含まれています。
-
-### **1.1 第一節**
-
-第一節の内容です。
-複数行にわたる内容があります。
-
-### **1.2 第二節**
-
-第二節の内容です。
-
-## **2. 第二章**
-
-第二章の内容です。
-ここも複数行の説明があります。"""
-
-        test_doc = Document(page_content=complex_content)
-        result = loader._enrich_documents([test_doc])
-
-        # 適切に処理されていることを確認
-        assert len(result) > 0
-
-        # セクション情報が適切に抽出されていることを確認
-        sections_found = set()
-        subsections_found = set()
-
-        for doc in result:
-            if doc.metadata["section"]:
-                sections_found.add(doc.metadata["section"])
-            if doc.metadata["subsection"]:
-                subsections_found.add(doc.metadata["subsection"])
-
-        # 期待されるセクションが見つかることを確認
-        # ドキュメントが正しく処理されていることを確認（少なくとも1つは処理される）
-        assert len(result) > 0
-
-        # セクションとサブセクションの情報が適切に設定されていることを確認
-        has_section_metadata = any(doc.metadata.get("section") for doc in result)
-        has_subsection_metadata = any(doc.metadata.get("subsection") for doc in result)
-
-        # 少なくともセクションまたはサブセクションの情報があることを確認
-        assert has_section_metadata or has_subsection_metadata
-
 
 @pytest.mark.parametrize(
     "chunk_size,expected_min_chunks",
@@ -407,6 +438,6 @@ def test_chunk_size_effects_on_refactored_methods(chunk_size, expected_min_chunk
     )  # 長いコンテンツ
 
     lines = test_content.split("\n")
-    chunks = loader._create_chunks_from_lines(lines)
+    chunks = list(loader._iter_chunks(lines))
 
     assert len(chunks) >= expected_min_chunks
@@ -0,0 +1,68 @@
+import os
+import pytest
+
+from src.services.embedding_cache import EmbeddingCache, text_hash
+
+
+class TestEmbeddingCache:
+    """EmbeddingCache クラスのテスト"""
+
+    @pytest.fixture
+    def cache(self, temp_dir):
+        cache = EmbeddingCache(os.path.join(temp_dir, "cache", "embeddings.sqlite3"))
+        yield cache
+        cache.close()
+
+    def test_get_many_empty(self, cache):
+        """未登録のテキストではNoneが返されることをテスト"""
+        assert cache.get_many("model", True, ["テキスト"]) == [None]
+
+    def test_put_and_get_roundtrip(self, cache):
+        """登録したベクトルがテキストの順に取得できることをテスト"""
+        cache.put_many("model", True, ["A", "B"], [[0.5, -0.25], [1.0, 0.0]])
+
+        result = cache.get_many("model", True, ["B", "未登録", "A", "B"])
+
+        assert result == [[1.0, 0.0], None, [0.5, -0.25], [1.0, 0.0]]
+
+    def test_key_includes_model_and_normalization(self, cache):
+        """モデル名や正規化の有無が異なる場合はヒットしないことをテスト"""
+        cache.put_many("model-a", True, ["テキスト"], [[0.5]])
+
+        assert cache.get_many("model-b", True, ["テキスト"]) == [None]
+        assert cache.get_many("model-a", False, ["テキスト"]) == [None]
+
+    def test_existing_entries_are_not_overwritten(self, cache):
+        """登録済みのキーは上書きされないことをテスト"""
+        cache.put_many("model", True, ["テキスト"], [[0.5]])
+        cache.put_many("model", True, ["テキスト"], [[0.25]])
+
+        assert cache.get_many("model", True, ["テキスト"]) == [[0.5]]
+
+    def test_persists_across_instances(self, temp_dir):
+        """別インスタンス（再起動後）からも参照できることをテスト"""
+        path = os.path.join(temp_dir, "embeddings.sqlite3")
+        first = EmbeddingCache(path)
+        first.put_many("model", True, ["テキスト"], [[0.5, 0.25]])
+        first.close()
+
+        second = EmbeddingCache(path)
+        assert second.get_many("model", True, ["テキスト"]) == [[0.5, 0.25]]
+        second.close()
+
+    def test_get_many_large_batch(self, cache):
+        """プレースホルダ上限を超える件数でも取得できることをテスト"""
+        texts = [f"テキスト{i}" for i in range(1200)]
+        cache.put_many("model", True, texts, [[float(i)] for i in range(1200)])
+
+        result = cache.get_many("model", True, texts)
+
+        assert result == [[float(i)] for i in range(1200)]
+
+
+def test_text_hash_is_sha256():
+    """テキストハッシュがUTF-8のsha256であることをテスト"""
+    assert text_hash("") == (
+        "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
+    )
+    assert text_hash("仕様") != text_hash("仕様書")
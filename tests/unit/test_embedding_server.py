@@ -0,0 +1,199 @@
+import os
+import socket
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from src.services.embedding_server import (
+    EmbeddingServer,
+    EmbeddingServerError,
+    RemoteEmbeddingService,
+)
+from src.services.executors import InstrumentedExecutor
+
+
+class FakeEmbeddingService:
+    """文字数と先頭の文字コードをベクトルとして返すテスト用の埋め込みサービス"""
+
+    def __init__(self):
+        self.document_calls = []
+
+    def embed_query(self, text):
+        if text == "error":
+            raise RuntimeError("model error")
+        return [float(len(text)), float(ord(text[0])), 0.5]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [self.embed_query(text) for text in texts]
+
+    def stats(self):
+        return {"query_embedding_cache": {"hits": 1}}
+
+
+@pytest.fixture
+def server(temp_dir):
+    """スレッドで起動した埋め込みサーバー"""
+    service = FakeEmbeddingService()
+    server = EmbeddingServer(service, os.path.join(temp_dir, "embedding.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestRemoteEmbeddingService:
+    """RemoteEmbeddingService クラスのテスト"""
+
+    def test_embed_query(self, server):
+        """クエリの埋め込みがサーバー経由で返ることをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+
+        assert client.embed_query("abc") == [3.0, 97.0, 0.5]
+
+    async def test_aembed_query_runs_in_given_executor(self, server):
+        """非同期の埋め込みが指定したスレッドプールでサーバーを呼び出すことをテスト"""
+        executor = InstrumentedExecutor("upstream", 1)
+        client = RemoteEmbeddingService(server.socket_path, executor=executor)
+
+        assert await client.aembed_query("abc") == [3.0, 97.0, 0.5]
+        assert executor.stats()["completed"] == 1
+        executor.shutdown()
+
+    def test_embed_documents(self, server):
+        """複数テキストの埋め込みが順序どおりに返ることをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+
+        result = client.embed_documents(["a", "bb", "日本語"])
+
+        assert result == [
+            [1.0, 97.0, 0.5],
+            [2.0, 98.0, 0.5],
+            [3.0, float(ord("日")), 0.5],
+        ]
+        assert server.embedding_service.document_calls == [["a", "bb", "日本語"]]
+
+    def test_embed_documents_in_batches(self, server):
+        """多数のテキストはbatch_size件ずつに分けて送信されることをテスト"""
+        client = RemoteEmbeddingService(server.socket_path, batch_size=2)
+
+        result = client.embed_documents(["a", "bb", "ccc", "dddd", "eeeee"])
+
+        assert [vector[0] for vector in result] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert server.embedding_service.document_calls == [
+            ["a", "bb"],
+            ["ccc", "dddd"],
+            ["eeeee"],
+        ]
+
+    def test_embed_documents_empty(self, server):
+        """空のリストではサーバーを呼び出さないことをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+
+        assert client.embed_documents([]) == []
+        assert server.embedding_service.document_calls == []
+
+    def test_connection_is_reused(self, server):
+        """同じスレッドからの呼び出しで接続が使い回されることをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+
+        client.embed_query("a")
+        first_connection = client._local.sock
+        client.embed_query("b")
+
+        assert client._local.sock is first_connection
+
+    def test_server_error_is_raised(self, server):
+        """サーバー側のエラーが例外として伝わり、接続が継続できることをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+
+        with pytest.raises(EmbeddingServerError, match="model error"):
+            client.embed_query("error")
+        assert client.embed_query("a") == [1.0, 97.0, 0.5]
+
+    def test_stats(self, server):
+        """サーバー側の統計情報が取得できることをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+
+        assert client.stats() == {"query_embedding_cache": {"hits": 1}}
+
+    def test_reconnects_after_server_restart(self, temp_dir):
+        """サーバーの再起動後も自動的に接続し直すことをテスト"""
+        socket_path = os.path.join(temp_dir, "embedding.sock")
+        client = RemoteEmbeddingService(socket_path)
+
+        for _ in range(2):
+            server = EmbeddingServer(FakeEmbeddingService(), socket_path)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                assert client.embed_query("a") == [1.0, 97.0, 0.5]
+            finally:
+                server.shutdown()
+                server.server_close()
+
+        assert not os.path.exists(socket_path)
+
+    def test_socket_is_closed_when_connect_fails(self, temp_dir):
+        """サーバーに接続できない場合はソケットを閉じてから例外を送出することをテスト"""
+        client = RemoteEmbeddingService(os.path.join(temp_dir, "missing.sock"))
+        created = []
+        socket_class = socket.socket
+
+        def create_socket(*args):
+            sock = socket_class(*args)
+            created.append(sock)
+            return sock
+
+        with patch(
+            "src.services.embedding_server.socket.socket", side_effect=create_socket
+        ):
+            for _ in range(2):
+                with pytest.raises(OSError):
+                    client.embed_query("a")
+
+        assert created
+        assert all(sock.fileno() == -1 for sock in created)
+        assert getattr(client._local, "sock", None) is None
+
+    def test_does_not_resend_after_timeout(self, server):
+        """応答待ちがタイムアウトした場合は再送せず、接続を破棄することをテスト"""
+        calls = []
+
+        def slow_embed_query(text):
+            calls.append(text)
+            time.sleep(0.3)
+            return [1.0, 2.0, 3.0]
+
+        server.embedding_service.embed_query = slow_embed_query
+        client = RemoteEmbeddingService(server.socket_path, timeout=0.05)
+
+        with pytest.raises(socket.timeout):
+            client.embed_query("a")
+
+        assert calls == ["a"]
+        assert client._local.sock is None
+
+    def test_connection_is_closed_when_vectors_are_not_received(self, server):
+        """ベクトルのフレームの受信に失敗した場合は接続を破棄し、次の呼び出しで
+        接続し直すことをテスト"""
+        client = RemoteEmbeddingService(server.socket_path)
+        client.embed_query("a")
+        receive_payload = client._receive_payload
+        calls = []
+
+        def fail_on_vectors():
+            calls.append(True)
+            if len(calls) == 2:
+                raise ConnectionResetError("reset")
+            return receive_payload()
+
+        client._receive_payload = fail_on_vectors
+        with pytest.raises(ConnectionResetError):
+            client.embed_query("b")
+        assert client._local.sock is None
+
+        client._receive_payload = receive_payload
+        assert client.embed_query("c") == [1.0, 99.0, 0.5]
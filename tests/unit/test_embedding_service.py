@@ -1,7 +1,11 @@
+import asyncio
+import time
+import os
 import pytest
 from unittest.mock import Mock, patch
+from langchain_core.embeddings import Embeddings
 
-from src.services.embeddings import EmbeddingService
+from src.services.embeddings import EmbeddingService, normalize_query
 
 
 class TestEmbeddingService:
@@ -223,6 +227,300 @@ class TestEmbeddingService:
         )
 
 
+class TestEmbeddingServiceBackend:
+    """EmbeddingService の推論バックエンド選択のテスト"""
+
+    @patch("src.services.embeddings.OnnxEmbeddings")
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_onnx_backend(self, mock_huggingface_embeddings, mock_onnx_embeddings):
+        """onnxバックエンドではONNX Runtime版の埋め込みを使うことをテスト"""
+        service = EmbeddingService(
+            "test/model",
+            backend="onnx",
+            onnx_model_directory="data/onnx",
+            onnx_quantize=True,
+        )
+
+        assert service.embeddings is mock_onnx_embeddings.return_value
+        mock_onnx_embeddings.assert_called_once_with(
+            "test/model", "data/onnx", quantize=True
+        )
+        mock_huggingface_embeddings.assert_not_called()
+
+    def test_model_key_distinguishes_backends(self):
+        """バックエンドごとに永続キャッシュのキーが分かれることをテスト"""
+        keys = {
+            EmbeddingService("test/model").model_key,
+            EmbeddingService("test/model", backend="onnx").model_key,
+            EmbeddingService(
+                "test/model", backend="onnx", onnx_quantize=False
+            ).model_key,
+        }
+
+        assert len(keys) == 3
+        assert EmbeddingService("test/model").model_key == "test/model"
+
+    def test_unknown_backend(self):
+        """未対応のバックエンドではエラーとなることをテスト"""
+        with pytest.raises(ValueError):
+            EmbeddingService(backend="tensorflow")
+
+
+class TestEmbeddingServiceQueryCache:
+    """EmbeddingService のクエリ埋め込みキャッシュのテスト"""
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_repeated_query_uses_cache(self, mock_huggingface_embeddings):
+        """同じクエリではモデルを再実行しないことをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_query.return_value = [0.1, 0.2]
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService()
+        first = service.embed_query("バトルについて")
+        second = service.embed_query("バトルについて")
+
+        mock_embeddings_instance.embed_query.assert_called_once_with("バトルについて")
+        assert first == second == [0.1, 0.2]
+        assert service.query_cache.stats()["hits"] == 1
+        assert service.query_cache.stats()["misses"] == 1
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_normalized_queries_share_cache(self, mock_huggingface_embeddings):
+        """全角・半角や空白の違いは同じクエリとして扱われることをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_query.return_value = [0.1]
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService()
+        service.embed_query("ＨＰの　上限は？")
+        service.embed_query("  HPの 上限は? ")
+
+        mock_embeddings_instance.embed_query.assert_called_once_with("HPの 上限は?")
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_returned_vector_is_a_copy(self, mock_huggingface_embeddings):
+        """返されたベクトルを変更してもキャッシュに影響しないことをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_query.return_value = [0.1, 0.2]
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService()
+        service.embed_query("クエリ").append(9.9)
+
+        assert service.embed_query("クエリ") == [0.1, 0.2]
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_query_cache_disabled(self, mock_huggingface_embeddings):
+        """キャッシュサイズ0では毎回モデルを実行することをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_query.return_value = [0.1]
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService(query_cache_size=0)
+        service.embed_query("クエリ")
+        service.embed_query("クエリ")
+
+        assert mock_embeddings_instance.embed_query.call_count == 2
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    async def test_aembed_query_batches_concurrent_queries(
+        self, mock_huggingface_embeddings
+    ):
+        """同時に届いた非同期クエリが1回のモデル呼び出しにまとめられることをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = lambda texts: [
+            [float(len(text))] for text in texts
+        ]
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService(query_batch_max_wait_ms=20)
+        results = await asyncio.gather(
+            service.aembed_query("ＡＢ"),
+            service.aembed_query("AB"),
+            service.aembed_query("クエリ"),
+        )
+
+        mock_embeddings_instance.embed_documents.assert_called_once_with(
+            ["AB", "クエリ"]
+        )
+        assert results == [[2.0], [2.0], [3.0]]
+
+        # 2回目以降はキャッシュから返され、モデルは呼ばれない
+        assert await service.aembed_query("AB") == [2.0]
+        mock_embeddings_instance.embed_documents.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("ＨＰ　上限", "HP 上限"),
+        ("  前後の空白  ", "前後の空白"),
+        ("改行\nを\t含む", "改行 を 含む"),
+        ("ｶﾀｶﾅ", "カタカナ"),
+    ],
+)
+def test_normalize_query(text, expected):
+    """クエリ正規化をパラメータ化テストで検証"""
+    assert normalize_query(text) == expected
+
+
+class TestEmbeddingServiceBatching:
+    """EmbeddingService のバッチ分割のテスト"""
+
+    @staticmethod
+    def _fake_embed_documents(texts):
+        return [[float(len(text))] for text in texts]
+
+    @patch("src.services.embeddings.get_embedding_token_counter")
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_batches_sorted_by_token_length(
+        self, mock_huggingface_embeddings, mock_get_counter
+    ):
+        """トークン長順にバッチを組み、結果は元の順序で返されることをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+        mock_get_counter.return_value.count.side_effect = len
+
+        service = EmbeddingService(batch_size=2)
+        texts = ["aaaa", "a", "aaa", "aa", "aaaaa"]
+        result = service.embed_documents(texts)
+
+        batches = [
+            call[0][0]
+            for call in mock_embeddings_instance.embed_documents.call_args_list
+        ]
+        assert batches == [["a", "aa"], ["aaa", "aaaa"], ["aaaaa"]]
+        assert result == [[4.0], [1.0], [3.0], [2.0], [5.0]]
+
+    @patch("src.services.embeddings.get_embedding_token_counter")
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_single_batch_skips_tokenization(
+        self, mock_huggingface_embeddings, mock_get_counter
+    ):
+        """バッチサイズ以下の件数ではトークン長を計測しないことをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        EmbeddingService(batch_size=4).embed_documents(["a", "bb"])
+
+        mock_get_counter.assert_not_called()
+
+    @patch("src.services.embeddings.get_embedding_token_counter")
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_falls_back_to_character_length(
+        self, mock_huggingface_embeddings, mock_get_counter
+    ):
+        """トークナイザーを読み込めない場合は文字数でソートすることをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+        mock_get_counter.side_effect = OSError("offline")
+
+        result = EmbeddingService(batch_size=1).embed_documents(["bb", "a"])
+
+        assert mock_embeddings_instance.embed_documents.call_args_list[0][0][0] == ["a"]
+        assert result == [[2.0], [1.0]]
+
+
+class TestEmbeddingServiceCache:
+    """EmbeddingService の永続キャッシュのテスト"""
+
+    @pytest.fixture
+    def cache_path(self, temp_dir):
+        return os.path.join(temp_dir, "embedding_cache.sqlite3")
+
+    @staticmethod
+    def _fake_embed_documents(texts):
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def test_is_langchain_embeddings(self):
+        """ベクトルストアに直接渡せるEmbeddingsであることをテスト"""
+        assert isinstance(EmbeddingService(), Embeddings)
+
+    def test_cache_disabled_by_default(self):
+        """キャッシュパス未指定の場合はキャッシュを使わないことをテスト"""
+        assert EmbeddingService().cache is None
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_embed_documents_uses_cache(self, mock_huggingface_embeddings, cache_path):
+        """キャッシュ済みのテキストはモデルに通さないことをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService(cache_path=cache_path)
+        first = service.embed_documents(["あ", "いい"])
+        second = service.embed_documents(["いい", "ううう", "あ"])
+
+        assert first == [[1.0, 0.5], [2.0, 0.5]]
+        assert second == [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5]]
+        # 2回目は未キャッシュのテキストのみ計算される
+        assert mock_embeddings_instance.embed_documents.call_args_list[1][0][0] == [
+            "ううう"
+        ]
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_embed_documents_deduplicates_texts(
+        self, mock_huggingface_embeddings, cache_path
+    ):
+        """同一テキストはまとめて1回だけ計算されることをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        service = EmbeddingService(cache_path=cache_path)
+        result = service.embed_documents(["同じ", "同じ", "別"])
+
+        mock_embeddings_instance.embed_documents.assert_called_once_with(["同じ", "別"])
+        assert result == [[2.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_cache_shared_across_instances(
+        self, mock_huggingface_embeddings, cache_path
+    ):
+        """再起動後の別インスタンスではモデルを読み込まずに済むことをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        EmbeddingService(cache_path=cache_path).embed_documents(["テキスト"])
+        mock_huggingface_embeddings.reset_mock()
+
+        result = EmbeddingService(cache_path=cache_path).embed_documents(["テキスト"])
+
+        mock_huggingface_embeddings.assert_not_called()
+        assert result == [[4.0, 0.5]]
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_cache_is_keyed_by_model(self, mock_huggingface_embeddings, cache_path):
+        """モデルが異なる場合はキャッシュを共有しないことをテスト"""
+        mock_embeddings_instance = Mock()
+        mock_embeddings_instance.embed_documents.side_effect = (
+            self._fake_embed_documents
+        )
+        mock_huggingface_embeddings.return_value = mock_embeddings_instance
+
+        EmbeddingService("model-a", cache_path=cache_path).embed_documents(["テキスト"])
+        EmbeddingService("model-b", cache_path=cache_path).embed_documents(["テキスト"])
+
+        assert mock_embeddings_instance.embed_documents.call_count == 2
+
+
 @pytest.mark.parametrize(
     "model_name",
     [
@@ -262,3 +560,98 @@ def test_embed_documents_various_lengths(
 
     mock_embeddings_instance.embed_documents.assert_called_once_with(texts)
     assert len(result) == expected_length
+
+
+class TestEmbeddingServiceIdleUnload:
+    """EmbeddingService のアイドル時のモデル解放のテスト"""
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_model_stays_loaded_by_default(self, mock_huggingface_embeddings):
+        """アイドル解放を指定しない場合はモデルを保持し続けることをテスト"""
+        mock_huggingface_embeddings.return_value.embed_query.return_value = [0.1]
+        service = EmbeddingService()
+
+        service.embed_query("テスト")
+
+        assert service.is_model_loaded
+        assert service.model_stats()["load_count"] == 1
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_non_positive_idle_unload_disables_unloading(
+        self, mock_huggingface_embeddings
+    ):
+        """アイドル解放に0以下を指定すると解放が無効になることをテスト"""
+        mock_huggingface_embeddings.return_value.embed_query.return_value = [0.1]
+        for idle_unload_seconds in (0, -1.0):
+            service = EmbeddingService(idle_unload_seconds=idle_unload_seconds)
+            assert service.idle_unload_seconds is None
+
+            service.embed_query("テスト")
+            time.sleep(0.05)
+
+            assert service.is_model_loaded
+            assert service.unload_count == 0
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_idle_model_is_unloaded_and_reloaded(self, mock_huggingface_embeddings):
+        """アイドル時間の経過で解放され、次のクエリで再読み込みされることをテスト"""
+        mock_huggingface_embeddings.return_value.embed_query.return_value = [0.1]
+        service = EmbeddingService(query_cache_size=0, idle_unload_seconds=0.05)
+
+        service.embed_query("テスト1")
+        deadline = time.monotonic() + 5
+        while service.is_model_loaded and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert not service.is_model_loaded
+        assert service.unload_count == 1
+
+        assert service.embed_query("テスト2") == [0.1]
+        assert service.is_model_loaded
+        assert mock_huggingface_embeddings.call_count == 2
+        assert service.load_count == 2
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_model_in_use_is_not_unloaded(self, mock_huggingface_embeddings):
+        """推論中はアイドル時間を超えても解放されないことをテスト"""
+
+        def slow_embed(texts):
+            time.sleep(0.2)
+            return [[0.1] for _ in texts]
+
+        mock_huggingface_embeddings.return_value.embed_documents.side_effect = (
+            slow_embed
+        )
+        service = EmbeddingService(idle_unload_seconds=0.02)
+
+        service.embed_documents(["テスト"])
+
+        assert service.is_model_loaded
+        assert service.unload_count == 0
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_model_stats(self, mock_huggingface_embeddings):
+        """読み込み時間と常駐メモリ量の統計が返ることをテスト"""
+        service = EmbeddingService()
+        assert service.model_stats()["loaded"] is False
+
+        _ = service.embeddings
+        stats = service.model_stats()
+
+        assert stats["loaded"] is True
+        assert stats["load_count"] == 1
+        assert stats["last_load_seconds"] >= 0
+        assert stats["process_resident_bytes"] > 0
+        assert service.stats()["embedding_model"]["load_count"] == 1
+
+    @patch("src.services.embeddings.HuggingFaceEmbeddings")
+    def test_unload_model(self, mock_huggingface_embeddings):
+        """明示的にモデルを解放できることをテスト"""
+        service = EmbeddingService()
+        _ = service.embeddings
+
+        service.unload_model()
+        service.unload_model()
+
+        assert not service.is_model_loaded
+        assert service.unload_count == 1
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.config.settings import Settings
+from src.services.executors import (
+    EXECUTOR_NAMES,
+    ExecutorRegistry,
+    InstrumentedExecutor,
+    iterate_in_executor,
+)
+
+
+class TestInstrumentedExecutor:
+    """InstrumentedExecutor クラスのテスト"""
+
+    def test_queue_depth_and_wait_time(self):
+        """空きを待つ処理が待ち行列の長さと待ち時間に反映されることをテスト"""
+        executor = InstrumentedExecutor("test", 1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return "先"
+
+        try:
+            first = executor.submit(blocking)
+            assert started.wait(5)
+            second = executor.submit(lambda: "後")
+
+            stats = executor.stats()
+            assert stats["max_workers"] == 1
+            assert stats["queue_depth"] == 1
+            assert stats["active"] == 1
+            assert stats["submitted"] == 2
+
+            release.set()
+            assert first.result(5) == "先"
+            assert second.result(5) == "後"
+        finally:
+            release.set()
+            executor.shutdown()
+
+        stats = executor.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["active"] == 0
+        assert stats["completed"] == 2
+        assert stats["max_wait_ms"] > 0
+        assert 0 < stats["average_wait_ms"] <= stats["max_wait_ms"]
+
+    def test_exception_is_counted_as_completed(self):
+        """例外を送出した処理も完了として数え、例外を呼び出し元に返すことをテスト"""
+        executor = InstrumentedExecutor("test", 1)
+
+        def failing():
+            raise RuntimeError("処理のエラー")
+
+        with pytest.raises(RuntimeError, match="処理のエラー"):
+            executor.submit(failing).result(5)
+        executor.shutdown()
+
+        assert executor.stats()["completed"] == 1
+        assert executor.stats()["active"] == 0
+
+    def test_cancelled_task_leaves_queue(self):
+        """実行前にキャンセルされた処理が待ち行列から外れることをテスト"""
+        executor = InstrumentedExecutor("test", 1)
+        release = threading.Event()
+        try:
+            executor.submit(release.wait, 5)
+            pending = executor.submit(lambda: None)
+            assert pending.cancel()
+            assert executor.stats()["queue_depth"] == 0
+        finally:
+            release.set()
+            executor.shutdown()
+
+
+class TestExecutorRegistry:
+    """ExecutorRegistry クラスのテスト"""
+
+    def test_from_settings(self):
+        """設定のスレッド数で用途ごとのスレッドプールを作成することをテスト"""
+        registry = ExecutorRegistry.from_settings(
+            Settings(
+                openai_api_key="test_api_key",
+                embedding_executor_workers=2,
+                db_executor_workers=3,
+                upstream_executor_workers=5,
+            )
+        )
+
+        assert registry.get("embedding").max_workers == 2
+        assert registry.get("db").max_workers == 3
+        assert registry.get("upstream").max_workers == 5
+        assert set(registry.stats()) == set(EXECUTOR_NAMES)
+        registry.shutdown()
+
+    def test_default_embedding_workers(self):
+        """CPU処理のスレッド数を省略した場合も1以上になることをテスト"""
+        registry = ExecutorRegistry.from_settings(Settings(openai_api_key="test"))
+
+        assert registry.get("embedding").max_workers >= 1
+        registry.shutdown()
+
+    def test_unknown_name(self):
+        """未定義の名前でエラーとなることをテスト"""
+        registry = ExecutorRegistry({"embedding": 1, "db": 1, "upstream": 1})
+
+        with pytest.raises(ValueError, match="未定義のスレッドプールです"):
+            registry.get("gpu")
+
+
+async def test_iterate_in_executor():
+    """同期のイテレーターの要素を指定したスレッドプールで順に取り出すことをテスト"""
+    executor = InstrumentedExecutor("test", 1)
+    threads = []
+
+    def numbers():
+        for number in range(3):
+            threads.append(threading.get_ident())
+            yield number
+
+    items = [item async for item in iterate_in_executor(numbers(), executor)]
+    executor.shutdown()
+
+    assert items == [0, 1, 2]
+    assert threading.get_ident() not in threads
+    # 終了の判定を含めて要素数+1回投入される
+    assert executor.stats()["completed"] == 4
+
+
+async def test_iterate_in_executor_closes_iterator_on_cancel():
+    """取り出しの途中でキャンセルされた場合に同期のイテレーターを閉じることをテスト"""
+    executor = InstrumentedExecutor("test", 1)
+    waiting = threading.Event()
+    release = threading.Event()
+    closed = threading.Event()
+    received = []
+
+    def tokens():
+        try:
+            yield "a"
+            waiting.set()
+            # 2つ目の取り出しの実行中にキャンセルされる
+            assert release.wait(5)
+            yield "b"
+            yield "c"
+        finally:
+            closed.set()
+
+    async def consume():
+        async for item in iterate_in_executor(tokens(), executor):
+            received.append(item)
+
+    task = asyncio.create_task(consume())
+    assert await asyncio.to_thread(waiting.wait, 5)
+    task.cancel()
+    release.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    executor.shutdown()
+
+    assert received == ["a"]
+    assert closed.is_set()
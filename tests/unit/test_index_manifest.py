@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+from langchain.schema import Document
+
+from src.services.index_manifest import (
+    MANIFEST_FILE_NAME,
+    IndexManifest,
+    assign_chunk_ids,
+    compute_chunk_id,
+    compute_index_version,
+    diff_chunk_ids,
+)
+
+
+class TestChunkIds:
+    """チャンクID算出のテスト"""
+
+    def test_compute_chunk_id_is_deterministic(self):
+        """同じ内容からは同じIDが算出されることをテスト"""
+        doc1 = Document(page_content="内容", metadata={"section": "A", "source": "x"})
+        doc2 = Document(page_content="内容", metadata={"source": "x", "section": "A"})
+
+        assert compute_chunk_id(doc1) == compute_chunk_id(doc2)
+
+    def test_compute_chunk_id_depends_on_content_and_metadata(self):
+        """内容・メタデータが変わるとIDも変わることをテスト"""
+        base = Document(page_content="内容", metadata={"section": "A"})
+        other_content = Document(page_content="内容2", metadata={"section": "A"})
+        other_section = Document(page_content="内容", metadata={"section": "B"})
+
+        assert compute_chunk_id(base) != compute_chunk_id(other_content)
+        assert compute_chunk_id(base) != compute_chunk_id(other_section)
+
+    def test_assign_chunk_ids_disambiguates_duplicates(self):
+        """同一内容のチャンクに一意なIDが割り当てられることをテスト"""
+        documents = [Document(page_content="同じ内容") for _ in range(3)]
+
+        chunk_ids = assign_chunk_ids(documents)
+
+        assert len(set(chunk_ids)) == 3
+        assert chunk_ids[1] == f"{chunk_ids[0]}-1"
+        assert chunk_ids[2] == f"{chunk_ids[0]}-2"
+
+
+@pytest.mark.parametrize(
+    "previous,current,expected_added,expected_removed",
+    [
+        ([], ["a", "b"], ["a", "b"], []),
+        (["a", "b"], ["a", "b"], [], []),
+        (["a", "b"], ["b", "c"], ["c"], ["a"]),
+        (["a"], [], [], ["a"]),
+    ],
+)
+def test_diff_chunk_ids(previous, current, expected_added, expected_removed):
+    """チャンクIDの差分算出をパラメータ化テストで検証"""
+    added, removed = diff_chunk_ids(previous, current)
+
+    assert added == expected_added
+    assert removed == expected_removed
+
+
+def test_compute_index_version_ignores_order():
+    """インデックスバージョンがチャンクの順序に依存しないことをテスト"""
+    assert compute_index_version("fp", ["a", "b"]) == compute_index_version(
+        "fp", ["b", "a"]
+    )
+    assert compute_index_version("fp", ["a"]) != compute_index_version("fp2", ["a"])
+
+
+class TestIndexManifest:
+    """IndexManifest クラスのテスト"""
+
+    def test_load_missing_manifest(self, temp_dir):
+        """マニフェストがない場合にNoneを返すことをテスト"""
+        assert IndexManifest(temp_dir).load() is None
+
+    def test_save_and_load(self, temp_dir):
+        """保存したマニフェストを読み込めることをテスト"""
+        persist_directory = os.path.join(temp_dir, "chroma")
+        manifest = IndexManifest(persist_directory)
+
+        saved = manifest.save("fingerprint", ["a", "b"])
+        loaded = manifest.load()
+
+        assert loaded == saved
+        assert loaded["fingerprint"] == "fingerprint"
+        assert loaded["chunk_ids"] == ["a", "b"]
+        assert loaded["index_version"] == compute_index_version(
+            "fingerprint", ["a", "b"]
+        )
+
+    def test_load_corrupted_manifest(self, temp_dir):
+        """壊れたマニフェストはNoneとして扱われることをテスト"""
+        with open(os.path.join(temp_dir, MANIFEST_FILE_NAME), "w") as f:
+            f.write("{broken")
+
+        assert IndexManifest(temp_dir).load() is None
+
+    def test_load_unknown_format_version(self, temp_dir):
+        """未知のフォーマットバージョンはNoneとして扱われることをテスト"""
+        with open(os.path.join(temp_dir, MANIFEST_FILE_NAME), "w") as f:
+            json.dump({"format_version": 999, "chunk_ids": []}, f)
+
+        assert IndexManifest(temp_dir).load() is None
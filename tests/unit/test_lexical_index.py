@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from src.services.lexical_index import BM25Index, char_ngrams, reciprocal_rank_fusion
+
+
+@pytest.fixture
+def corpus():
+    ids = ["gacha", "currency", "character", "event"]
+    texts = [
+        "ガチャの排出率は公式サイトに掲載する。",
+        "通貨「ルミナ石」はクエスト報酬で入手できる。",
+        "キャラクター「アリシア」は火属性の剣士である。",
+        "期間限定イベントではルミナ石が追加で配布される。",
+    ]
+    return ids, texts
+
+
+class TestCharNgrams:
+    """char_ngrams 関数のテスト"""
+
+    def test_bigrams_and_trigrams(self):
+        """文字2-gramと3-gramが生成されることをテスト"""
+        assert char_ngrams("ルミナ石") == ["ルミ", "ミナ", "ナ石", "ルミナ", "ミナ石"]
+
+    def test_normalization_and_separators(self):
+        """NFKC正規化・小文字化され、記号をまたぐn-gramは作られないことをテスト"""
+        assert char_ngrams("ＨＰ「火」") == ["hp", "火"]
+
+
+class TestReciprocalRankFusion:
+    """reciprocal_rank_fusion 関数のテスト"""
+
+    def test_fusion(self):
+        """両方の順位リストで上位の項目が最上位になることをテスト"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+
+        assert [item_id for item_id, _ in fused] == ["b", "a", "d", "c"]
+        assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+class TestBM25Index:
+    """BM25Index クラスのテスト"""
+
+    def test_search_ranks_exact_terms(self, corpus):
+        """固有名詞を含む文書が上位になることをテスト"""
+        index = BM25Index.build(*corpus)
+
+        results = index.search("ルミナ石の入手方法", k=3)
+
+        assert [chunk_id for chunk_id, _ in results] == ["currency", "event"]
+        assert results[0][1] > results[1][1] > 0
+
+    def test_search_matches_reference_bm25(self, corpus):
+        """転置リストによるスコアが定義どおりのBM25と一致することをテスト"""
+        ids, texts = corpus
+        index = BM25Index.build(ids, texts)
+        query_terms = set(char_ngrams("アリシアの属性"))
+
+        documents = [char_ngrams(text) for text in texts]
+        average_length = np.mean([len(document) for document in documents])
+        expected = {}
+        for chunk_id, document in zip(ids, documents):
+            score = 0.0
+            for term in query_terms:
+                frequency = document.count(term)
+                containing = sum(term in other for other in documents)
+                if not frequency:
+                    continue
+                idf = np.log(1 + (len(ids) - containing + 0.5) / (containing + 0.5))
+                norm = 1.2 * (1 - 0.75 + 0.75 * len(document) / average_length)
+                score += idf * frequency * 2.2 / (frequency + norm)
+            if score:
+                expected[chunk_id] = score
+
+        actual = dict(index.search("アリシアの属性", k=10))
+
+        assert actual.keys() == expected.keys()
+        for chunk_id, score in expected.items():
+            assert actual[chunk_id] == pytest.approx(score, rel=1e-5)
+
+    def test_no_match(self, corpus):
+        """一致する語がない場合は空の結果を返すことをテスト"""
+        index = BM25Index.build(*corpus)
+
+        assert index.search("まったく関係ない", k=3) == []
+        assert index.search("", k=3) == []
+        assert BM25Index.build([], []).search("ルミナ石", k=3) == []
+
+    def test_save_and_load(self, corpus, temp_dir):
+        """保存したインデックスを読み込んで同じ結果が得られることをテスト"""
+        index = BM25Index.build(*corpus, index_version="v1")
+        index.save(temp_dir)
+
+        loaded = BM25Index.load(temp_dir)
+
+        assert loaded.index_version == "v1"
+        assert loaded.search("ルミナ石", k=3) == index.search("ルミナ石", k=3)
+
+    def test_load_missing(self, temp_dir):
+        """保存されていない場合はNoneを返すことをテスト"""
+        assert BM25Index.load(temp_dir) is None
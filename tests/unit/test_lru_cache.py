@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+from src.services.lru_cache import LRUCache
+
+
+class TestLRUCache:
+    """LRUCache クラスのテスト"""
+
+    def test_get_and_put(self):
+        """登録した値が取得できることをテスト"""
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    def test_evicts_least_recently_used(self):
+        """上限を超えた場合に最も使われていないエントリが破棄されることをテスト"""
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    @patch("src.services.lru_cache.time.monotonic")
+    def test_entries_expire_after_ttl(self, mock_monotonic):
+        """有効期限を過ぎたエントリはミスとして扱われることをテスト"""
+        mock_monotonic.return_value = 100.0
+        cache = LRUCache(max_size=2, ttl_seconds=10)
+        cache.put("a", 1)
+
+        mock_monotonic.return_value = 105.0
+        assert cache.get("a") == 1
+
+        mock_monotonic.return_value = 111.0
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_zero_size_disables_cache(self):
+        """上限0の場合は何も保持しないことをテスト"""
+        cache = LRUCache(max_size=0)
+        cache.put("a", 1)
+
+        assert cache.get("a") is None
+
+    def test_stats(self):
+        """ヒット数・ミス数が計測されることをテスト"""
+        cache = LRUCache(max_size=4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+
+        assert cache.stats() == {
+            "hits": 2,
+            "misses": 1,
+            "hit_rate": 2 / 3,
+            "size": 1,
+            "max_size": 4,
+        }
+
+    def test_clear_keeps_stats(self):
+        """clearでエントリのみが破棄されることをテスト"""
+        cache = LRUCache(max_size=4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.clear()
+
+        assert cache.get("a") is None
+        assert cache.stats()["hits"] == 1
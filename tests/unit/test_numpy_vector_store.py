@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+from langchain.schema import Document
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.services.numpy_vector_store import NumpyVectorStore
+
+
+class HashEmbeddings(Embeddings):
+    """テキストから決定的な正規化済みベクトルを生成するテスト用の埋め込み"""
+
+    def __init__(self, dimension: int = 16):
+        self.dimension = dimension
+        self.calls = 0
+
+    def _vector(self, text):
+        seed = sum(ord(char) * (index + 1) for index, char in enumerate(text))
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def embeddings():
+    return HashEmbeddings()
+
+
+@pytest.fixture
+def texts():
+    return [f"仕様書のチャンク{index}" for index in range(50)]
+
+
+class TestNumpyVectorStore:
+    """NumpyVectorStore クラスのテスト"""
+
+    def test_search_matches_chroma(self, embeddings, texts, temp_dir):
+        """検索結果と距離がChromaと一致することをテスト"""
+        ids = [f"id-{index}" for index in range(len(texts))]
+        chroma = Chroma.from_texts(
+            texts, embeddings, ids=ids, persist_directory=f"{temp_dir}/chroma"
+        )
+        store = NumpyVectorStore.from_texts(texts, embeddings, ids=ids)
+
+        for query in ["クエリ1", "クエリ2", "仕様書のチャンク3"]:
+            vector = embeddings.embed_query(query)
+            expected = chroma.similarity_search_by_vector_with_relevance_scores(
+                vector, k=5
+            )
+            actual = store.similarity_search_by_vector_with_relevance_scores(
+                vector, k=5
+            )
+            assert [d.id for d, _ in actual] == [d.id for d, _ in expected]
+            np.testing.assert_allclose(
+                [score for _, score in actual],
+                [score for _, score in expected],
+                atol=1e-4,
+            )
+
+    def test_exact_match_ranks_first(self, embeddings, texts):
+        """同じテキストのクエリが距離0で最上位になることをテスト"""
+        store = NumpyVectorStore.from_texts(texts, embeddings)
+
+        document, distance = store.similarity_search_with_score(texts[7], k=3)[0]
+
+        assert document.page_content == texts[7]
+        assert distance == pytest.approx(0.0, abs=1e-5)
+
+    def test_add_documents_with_ids_and_metadata(self, embeddings):
+        """ID・メタデータ付きでドキュメントを追加・取得できることをテスト"""
+        store = NumpyVectorStore(embedding_function=embeddings)
+
+        store.add_documents(
+            [
+                Document(page_content="内容A", metadata={"section": "A"}),
+                Document(page_content="内容B", metadata={"section": "B"}),
+            ],
+            ids=["a", "b"],
+        )
+
+        documents = store.get_by_ids(["b", "missing", "a"])
+        assert [document.id for document in documents] == ["b", "a"]
+        assert documents[0].metadata == {"section": "B"}
+        assert store.get(include=["embeddings"])["embeddings"].shape == (2, 16)
+
+    def test_same_id_is_replaced(self, embeddings):
+        """同じIDで追加した場合は置き換えられることをテスト"""
+        store = NumpyVectorStore(embedding_function=embeddings)
+        store.add_texts(["古い内容"], ids=["a"])
+
+        store.add_texts(["新しい内容"], ids=["a"])
+
+        assert len(store) == 1
+        assert store.get(["a"])["documents"] == ["新しい内容"]
+
+    def test_delete(self, embeddings, texts):
+        """削除したIDが検索結果に含まれないことをテスト"""
+        store = NumpyVectorStore.from_texts(
+            texts, embeddings, ids=[str(index) for index in range(len(texts))]
+        )
+
+        store.delete(["7"])
+
+        assert len(store) == len(texts) - 1
+        results = store.similarity_search(texts[7], k=len(texts))
+        assert texts[7] not in [document.page_content for document in results]
+
+    def test_delete_collection(self, embeddings, texts):
+        """全件削除後は空の結果を返すことをテスト"""
+        store = NumpyVectorStore.from_texts(texts, embeddings)
+
+        store.delete_collection()
+
+        assert len(store) == 0
+        assert store.similarity_search_by_vector_with_relevance_scores([1.0] * 16) == []
+
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_persist_and_reload(self, embeddings, texts, temp_dir, mmap):
+        """保存したストアを埋め込みを再計算せずに読み込めることをテスト"""
+        ids = [str(index) for index in range(len(texts))]
+        store = NumpyVectorStore.from_texts(
+            texts, embeddings, ids=ids, persist_directory=temp_dir
+        )
+        expected = store.similarity_search_with_score("クエリ", k=5)
+        calls = embeddings.calls
+
+        reloaded = NumpyVectorStore(temp_dir, embeddings, mmap=mmap)
+
+        assert embeddings.calls == calls
+        assert isinstance(reloaded._matrix, np.memmap) == mmap
+        assert reloaded.similarity_search_with_score("クエリ", k=5) == expected
+
+    def test_reloaded_store_accepts_updates(self, embeddings, texts, temp_dir):
+        """メモリマップで読み込んだストアに追加・削除できることをテスト"""
+        NumpyVectorStore.from_texts(
+            texts[:10], embeddings, ids=texts[:10], persist_directory=temp_dir
+        )
+        store = NumpyVectorStore(temp_dir, embeddings)
+
+        store.add_texts(texts[10:12], ids=texts[10:12])
+        store.delete([texts[0]])
+
+        assert len(NumpyVectorStore(temp_dir, embeddings)) == 11
+
+    def test_float16_storage(self, embeddings, texts):
+        """float16で格納しても検索順位が保たれることをテスト"""
+        float32_store = NumpyVectorStore.from_texts(texts, embeddings)
+        float16_store = NumpyVectorStore.from_texts(texts, embeddings, dtype="float16")
+
+        assert float16_store._matrix.dtype == np.float16
+        assert [
+            d.page_content for d in float16_store.similarity_search("クエリ", 5)
+        ] == [d.page_content for d in float32_store.similarity_search("クエリ", 5)]
+
+    def test_unknown_dtype(self):
+        """未対応の精度を指定した場合はエラーになることをテスト"""
+        with pytest.raises(ValueError, match="未対応のベクトルの精度"):
+            NumpyVectorStore(dtype="int8")
@@ -0,0 +1,158 @@
+import os
+import numpy as np
+from types import SimpleNamespace
+import pytest
+from unittest.mock import patch
+
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from src.services.onnx_embeddings import (
+    OnnxEmbeddings,
+    mean_pool_and_normalize,
+    onnx_model_directory,
+)
+
+
+def _prepare_model_directory(base_directory: str, model_name: str) -> str:
+    """変換済みモデルとトークナイザーが置かれたディレクトリを作成"""
+    directory = onnx_model_directory(base_directory, model_name)
+    os.makedirs(directory)
+
+    vocab = {"<pad>": 0, "[UNK]": 1, "バトル": 2, "仕様": 3, "ゲーム": 4}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(os.path.join(directory, "tokenizer.json"))
+
+    for file_name in ("model.onnx", "model.int8.onnx"):
+        with open(os.path.join(directory, file_name), "wb") as f:
+            f.write(b"")
+    return directory
+
+
+class FakeSession:
+    """トークンIDをそのまま隠れ状態として返すInferenceSessionの代用品"""
+
+    def __init__(self, input_names=("input_ids", "attention_mask")):
+        self.inputs = []
+        self._input_names = input_names
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=name) for name in self._input_names]
+
+    def run(self, output_names, inputs):
+        self.inputs.append(inputs)
+        input_ids = inputs["input_ids"].astype(np.float32)
+        return [np.stack([input_ids, np.ones_like(input_ids)], axis=-1)]
+
+
+def test_mean_pool_and_normalize_ignores_padding():
+    """パディング位置を除いて平均し、L2正規化されることをテスト"""
+    hidden = np.array([[[3.0, 0.0], [0.0, 4.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    result = mean_pool_and_normalize(hidden, mask)
+
+    np.testing.assert_allclose(result, [[0.6, 0.8]])
+
+
+class TestOnnxEmbeddings:
+    """OnnxEmbeddings クラスのテスト"""
+
+    @patch("onnxruntime.InferenceSession")
+    def test_embed_documents(self, mock_session_class, temp_dir):
+        """バッチ内でパディングされ、正規化済みベクトルが元の順序で返ることをテスト"""
+        directory = _prepare_model_directory(temp_dir, "test/model")
+        session = FakeSession()
+        mock_session_class.return_value = session
+
+        embeddings = OnnxEmbeddings("test/model", temp_dir)
+        result = embeddings.embed_documents(["バトル", "ゲーム 仕様"])
+
+        mock_session_class.assert_called_once_with(
+            os.path.join(directory, "model.int8.onnx"),
+            providers=["CPUExecutionProvider"],
+        )
+        np.testing.assert_array_equal(
+            session.inputs[0]["attention_mask"], [[1, 0], [1, 1]]
+        )
+        np.testing.assert_allclose(np.linalg.norm(result, axis=1), [1.0, 1.0])
+        # 1件目はパディングを除いた「バトル」(ID=2)のみから計算される
+        np.testing.assert_allclose(result[0], np.array([2.0, 1.0]) / np.sqrt(5.0))
+
+    @patch("onnxruntime.InferenceSession")
+    def test_embed_query(self, mock_session_class, temp_dir):
+        """embed_queryが1件分のベクトルを返すことをテスト"""
+        _prepare_model_directory(temp_dir, "test/model")
+        mock_session_class.return_value = FakeSession()
+
+        embeddings = OnnxEmbeddings("test/model", temp_dir, quantize=False)
+
+        assert len(embeddings.embed_query("仕様")) == 2
+        assert embeddings.embed_documents([]) == []
+
+    @patch("onnxruntime.InferenceSession")
+    def test_token_type_ids_passed_when_required(self, mock_session_class, temp_dir):
+        """モデルが要求する場合はtoken_type_idsも渡されることをテスト"""
+        _prepare_model_directory(temp_dir, "test/model")
+        session = FakeSession(("input_ids", "attention_mask", "token_type_ids"))
+        mock_session_class.return_value = session
+
+        OnnxEmbeddings("test/model", temp_dir).embed_query("仕様")
+
+        np.testing.assert_array_equal(session.inputs[0]["token_type_ids"], [[0]])
+
+    @patch("src.services.onnx_embeddings.export_onnx_model")
+    @patch("onnxruntime.InferenceSession")
+    def test_exports_when_model_missing(
+        self, mock_session_class, mock_export, temp_dir
+    ):
+        """変換済みモデルがない場合は変換してから読み込むことをテスト"""
+        directory = _prepare_model_directory(temp_dir, "test/model")
+        os.remove(os.path.join(directory, "model.int8.onnx"))
+        mock_export.return_value = os.path.join(directory, "model.int8.onnx")
+        mock_session_class.return_value = FakeSession()
+
+        OnnxEmbeddings("test/model", temp_dir)
+
+        mock_export.assert_called_once_with("test/model", directory, True)
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(
+    os.environ.get("RUN_MODEL_TESTS") != "1",
+    reason="モデルのダウンロードと変換が必要なため RUN_MODEL_TESTS=1 の場合のみ実行",
+)
+def test_onnx_parity_with_sentence_transformers(tmp_path):
+    """ONNX（int8量子化）の出力がPyTorch版とほぼ一致することをテスト"""
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    pytest.importorskip("sentence_transformers")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_name = os.environ.get(
+        "PARITY_EMBEDDING_MODEL", "intfloat/multilingual-e5-large"
+    )
+    texts = [
+        "スゲリス・サーガはターン制バトルを採用した冒険RPGです。",
+        "キャラクターのHP上限はレベルに応じて増加する。",
+        "| 属性 | 弱点 |\n| --- | --- |\n| 火 | 水 |",
+    ]
+
+    torch_vectors = np.array(
+        HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True},
+        ).embed_documents(texts)
+    )
+
+    for quantize, min_similarity in ((False, 0.9999), (True, 0.98)):
+        onnx_vectors = np.array(
+            OnnxEmbeddings(
+                model_name, str(tmp_path), quantize=quantize
+            ).embed_documents(texts)
+        )
+        similarities = (torch_vectors * onnx_vectors).sum(axis=1)
+        assert similarities.min() >= min_similarity
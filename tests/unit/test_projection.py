@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from src.services.projection import PCAProjection, ProjectedEmbeddings
+
+
+@pytest.fixture
+def low_rank_vectors():
+    """16次元の潜在構造と共通の偏りを持つ64次元のベクトル（偏りの分で17次元）"""
+    rng = np.random.default_rng(0)
+    latent = rng.standard_normal((300, 16))
+    mixing = rng.standard_normal((16, 64))
+    return latent @ mixing + 0.05 * rng.standard_normal((300, 64)) + 2.0
+
+
+class TestPCAProjection:
+    """PCAProjection クラスのテスト"""
+
+    def test_fit_and_transform(self, low_rank_vectors):
+        """指定した次元数の正規化済みベクトルに射影されることをテスト"""
+        projection = PCAProjection.fit(low_rank_vectors, 17)
+
+        projected = projection.transform(low_rank_vectors)
+
+        assert projection.input_dimension == 64
+        assert projection.output_dimension == 17
+        assert projected.shape == (300, 17)
+        np.testing.assert_allclose(np.linalg.norm(projected, axis=1), 1.0, atol=1e-5)
+        assert projection.explained_variance_ratio > 0.99
+
+    def test_nearest_neighbors_preserved(self, low_rank_vectors):
+        """潜在次元まで削減しても元のコサイン類似度での最近傍が保たれることをテスト"""
+        projection = PCAProjection.fit(low_rank_vectors, 17)
+        full = low_rank_vectors / np.linalg.norm(
+            low_rank_vectors, axis=1, keepdims=True
+        )
+        reduced = projection.transform(low_rank_vectors)
+
+        for index in range(20):
+            expected = np.argsort(-(full @ full[index]))[1:6]
+            actual = np.argsort(-(reduced @ reduced[index]))[1:6]
+            assert len(set(expected) & set(actual)) >= 4
+
+    def test_transform_single_vector(self, low_rank_vectors):
+        """1本のベクトルも射影できることをテスト"""
+        projection = PCAProjection.fit(low_rank_vectors, 8)
+
+        assert projection.transform(low_rank_vectors[0]).shape == (8,)
+
+    @pytest.mark.parametrize("dimension", [0, 65])
+    def test_invalid_dimension(self, low_rank_vectors, dimension):
+        """次元数が範囲外の場合はエラーになることをテスト"""
+        with pytest.raises(ValueError):
+            PCAProjection.fit(low_rank_vectors, dimension)
+
+    def test_save_and_load(self, low_rank_vectors, temp_dir):
+        """保存した射影行列を読み込んで同じ射影が得られることをテスト"""
+        path = os.path.join(temp_dir, "chroma", "projection.npz")
+        projection = PCAProjection.fit(low_rank_vectors, 8)
+        projection.save(path)
+
+        loaded = PCAProjection.load(path)
+
+        np.testing.assert_allclose(
+            loaded.transform(low_rank_vectors), projection.transform(low_rank_vectors)
+        )
+        assert loaded.explained_variance_ratio == pytest.approx(
+            projection.explained_variance_ratio
+        )
+
+    def test_load_missing(self, temp_dir):
+        """保存されていない場合はNoneを返すことをテスト"""
+        assert PCAProjection.load(os.path.join(temp_dir, "projection.npz")) is None
+
+
+class TestProjectedEmbeddings:
+    """ProjectedEmbeddings クラスのテスト"""
+
+    @pytest.fixture
+    def projection(self):
+        return PCAProjection(np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]))
+
+    def test_embed_documents(self, projection):
+        """文書の埋め込みが射影されることをテスト"""
+        base = Mock()
+        base.embed_documents.return_value = [[3.0, 4.0, 9.0], [0.0, 2.0, 1.0]]
+
+        result = ProjectedEmbeddings(base, projection).embed_documents(["a", "b"])
+
+        np.testing.assert_allclose(result, [[0.6, 0.8], [0.0, 1.0]])
+
+    def test_embed_documents_empty(self, projection):
+        """空のリストでは元の埋め込みを呼び出さないことをテスト"""
+        base = Mock()
+
+        assert ProjectedEmbeddings(base, projection).embed_documents([]) == []
+        base.embed_documents.assert_not_called()
+
+    async def test_aembed_query(self, projection):
+        """非同期のクエリ埋め込みも射影されることをテスト"""
+        base = Mock()
+        base.aembed_query = AsyncMock(return_value=[3.0, 4.0, 1.0])
+
+        result = await ProjectedEmbeddings(base, projection).aembed_query("a")
+
+        np.testing.assert_allclose(result, [0.6, 0.8])
@@ -0,0 +1,95 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.config.prompts import CustomPromptTemplates, PromptTemplates
+from src.services.prompt_registry import PromptRegistry
+
+
+class TestPromptRegistry:
+    """PromptRegistry クラスのテスト"""
+
+    def test_same_configuration_is_reused(self):
+        """同じ設定ではプロンプトとチェーンを組み立て直さないことをテスト"""
+        registry = PromptRegistry()
+        llm = FakeListChatModel(responses=["回答"])
+
+        first = registry.get(PromptTemplates(), llm, "gpt-4o-mini", 0.1)
+        # 内容が同じであれば別のオブジェクトでも同じキーになる
+        second = registry.get(PromptTemplates(), llm, "gpt-4o-mini", 0.1)
+
+        assert first is second
+        assert first.chain is second.chain
+        assert registry.builds == 1
+
+    def test_key_includes_model_temperature_and_history(self):
+        """モデル・温度・会話履歴の有無が異なれば別に組み立てることをテスト"""
+        registry = PromptRegistry()
+        llm = FakeListChatModel(responses=["回答"])
+        templates = PromptTemplates()
+
+        compiled = {
+            registry.get(templates, llm, "gpt-4o-mini", 0.1),
+            registry.get(templates, llm, "gpt-4o", 0.1),
+            registry.get(templates, llm, "gpt-4o-mini", 0.7),
+            registry.get(templates, llm, "gpt-4o-mini", 0.1, with_history=True),
+        }
+
+        assert len(compiled) == 4
+        assert len(registry) == 4
+
+    def test_changed_templates_are_rebuilt(self):
+        """テンプレートの内容が変わった場合は組み立て直すことをテスト"""
+        registry = PromptRegistry()
+        llm = FakeListChatModel(responses=["回答"])
+        custom = CustomPromptTemplates.create_custom(system_prompt="別の指示")
+
+        default = registry.get(PromptTemplates(), llm, "gpt-4o-mini", 0.1)
+        changed = registry.get(custom, llm, "gpt-4o-mini", 0.1)
+
+        assert changed is not default
+        assert changed.prompt.messages[0].prompt.template == "別の指示"
+        assert registry.template_hash(custom) != registry.template_hash(
+            PromptTemplates()
+        )
+
+    def test_invalidate(self):
+        """破棄後は組み立て直すことをテスト"""
+        registry = PromptRegistry()
+        llm = FakeListChatModel(responses=["回答"])
+        templates = PromptTemplates()
+        before = registry.get(templates, llm, "gpt-4o-mini", 0.1)
+
+        registry.invalidate()
+
+        assert len(registry) == 0
+        assert registry.get(templates, llm, "gpt-4o-mini", 0.1) is not before
+        assert registry.builds == 2
+
+    def test_history_is_a_prompt_variable(self):
+        """会話履歴は変数として渡され、波括弧を含んでもそのまま埋め込まれることをテスト"""
+        registry = PromptRegistry()
+        compiled = registry.get(
+            PromptTemplates(),
+            FakeListChatModel(responses=["回答"]),
+            "gpt-4o-mini",
+            0.1,
+            with_history=True,
+        )
+
+        messages = compiled.prompt.format_messages(
+            context="コンテキスト", question="質問", history="USER: {json}の書き方"
+        )
+
+        assert "USER: {json}の書き方" in messages[0].content
+        assert "質問: 質問" in messages[1].content
+
+    def test_chain_runs(self):
+        """組み立て済みのチェーンで回答を生成できることをテスト"""
+        registry = PromptRegistry()
+        compiled = registry.get(
+            PromptTemplates(),
+            FakeListChatModel(responses=["生成された回答"]),
+            "gpt-4o-mini",
+            0.1,
+        )
+
+        assert compiled.chain.run(context="内容", question="質問") == "生成された回答"
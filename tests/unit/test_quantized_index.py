@@ -0,0 +1,197 @@
+import numpy as np
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.services.quantized_index import (
+    QuantizedVectorIndex,
+    normalize_rows,
+    quantize_binary,
+    quantize_int8,
+)
+
+DIMENSION = 128
+DOCUMENT_COUNT = 400
+QUERY_COUNT = 20
+
+
+class LookupEmbeddings(Embeddings):
+    """事前に用意したベクトルをテキストから引くテスト用の埋め込み"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """クラスタ構造を持つ文書ベクトルと、文書の近くに置いた固定のクエリ集合
+
+    e5の埋め込みと同様に、全ベクトルが共通の方向に偏るようにオフセットを加える。
+    """
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((20, DIMENSION)) + 3.0
+    documents = normalize_rows(
+        centers[rng.integers(0, 20, DOCUMENT_COUNT)]
+        + 0.6 * rng.standard_normal((DOCUMENT_COUNT, DIMENSION))
+    )
+    queries = normalize_rows(
+        documents[rng.integers(0, DOCUMENT_COUNT, QUERY_COUNT)]
+        + 0.3 * rng.standard_normal((QUERY_COUNT, DIMENSION))
+    )
+    ids = [f"chunk-{index}" for index in range(DOCUMENT_COUNT)]
+    return ids, documents, queries
+
+
+@pytest.fixture(scope="module")
+def chroma_results(corpus, tmp_path_factory):
+    """現在のChromaでの検索結果（比較の基準）"""
+    ids, documents, queries = corpus
+    vectors = {f"doc-{i}": vector.tolist() for i, vector in enumerate(documents)}
+    vectors.update({f"query-{i}": vector.tolist() for i, vector in enumerate(queries)})
+
+    store = Chroma(
+        collection_name="parity",
+        embedding_function=LookupEmbeddings(vectors),
+        persist_directory=str(tmp_path_factory.mktemp("chroma")),
+    )
+    store.add_texts([f"doc-{i}" for i in range(DOCUMENT_COUNT)], ids=ids)
+
+    return [
+        [
+            (document.id, score)
+            for document, score in store.similarity_search_by_vector_with_relevance_scores(
+                query.tolist(), k=10
+            )
+        ]
+        for query in queries
+    ]
+
+
+def _recall(expected, actual):
+    return len({i for i, _ in expected} & {i for i, _ in actual}) / len(expected)
+
+
+class TestQuantization:
+    """量子化関数のテスト"""
+
+    def test_int8_roundtrip_error_is_small(self):
+        """int8量子化の復元誤差が小さいことをテスト"""
+        vectors = normalize_rows(np.random.default_rng(0).standard_normal((5, 64)))
+
+        codes, scales = quantize_int8(vectors)
+
+        assert codes.dtype == np.int8
+        np.testing.assert_allclose(codes * scales[:, None], vectors, atol=0.01)
+
+    def test_binary_centers_before_packing(self):
+        """バイナリ量子化で基準点からの差の符号が使われることをテスト"""
+        vectors = np.array([[0.9, 0.8], [0.8, 0.9]])
+
+        codes = quantize_binary(vectors, vectors.mean(axis=0))
+
+        assert codes[0, 0] != codes[1, 0]
+
+    def test_binary_packs_sign_bits(self):
+        """バイナリ量子化で符号が1ビットずつ詰められることをテスト"""
+        vectors = np.array([[1.0, -1.0, 0.5, -0.5, 1.0, 1.0, -1.0, -1.0, 1.0]])
+
+        codes = quantize_binary(vectors)
+
+        assert codes.shape == (1, 2)
+        assert codes[0, 0] == 0b10101100
+        assert codes[0, 1] == 0b10000000
+
+
+class TestQuantizedVectorIndex:
+    """QuantizedVectorIndex クラスのテスト"""
+
+    @pytest.mark.parametrize(
+        "mode,multiplier,min_recall", [("int8", 4, 0.95), ("binary", 40, 0.8)]
+    )
+    def test_recall_parity_with_chroma(
+        self, corpus, chroma_results, mode, multiplier, min_recall
+    ):
+        """固定のクエリ集合でChromaと同等のrecall@kが得られることをテスト"""
+        ids, documents, queries = corpus
+        index = QuantizedVectorIndex.build(ids, documents, mode)
+
+        for k in (3, 10):
+            recalls = [
+                _recall(expected[:k], index.search(query, k, multiplier))
+                for query, expected in zip(queries, chroma_results)
+            ]
+            assert np.mean(recalls) >= min_recall
+
+    def test_rescored_distances_match_chroma(self, corpus, chroma_results):
+        """再スコアリング後の距離がChromaの距離と同じ尺度になることをテスト"""
+        ids, documents, queries = corpus
+        index = QuantizedVectorIndex.build(ids, documents, "int8")
+
+        for query, expected in zip(queries, chroma_results):
+            expected_distances = dict(expected)
+            for chunk_id, distance in index.search(query, 3):
+                if chunk_id in expected_distances:
+                    assert distance == pytest.approx(
+                        expected_distances[chunk_id], abs=2e-3
+                    )
+
+    def test_results_sorted_by_distance(self, corpus):
+        """結果が距離の昇順で返ることをテスト"""
+        ids, documents, queries = corpus
+        index = QuantizedVectorIndex.build(ids, documents, "int8")
+
+        distances = [distance for _, distance in index.search(queries[0], 10)]
+
+        assert distances == sorted(distances)
+
+    def test_footprint_is_smaller(self, corpus):
+        """一次検索で走査する符号がfloat32より小さいことをテスト"""
+        ids, documents, _ = corpus
+        float32_bytes = documents.astype(np.float32).nbytes
+
+        assert QuantizedVectorIndex.build(ids, documents, "int8").code_bytes < (
+            float32_bytes / 3
+        )
+        assert QuantizedVectorIndex.build(ids, documents, "binary").code_bytes == (
+            float32_bytes / 32
+        )
+
+    def test_k_larger_than_index(self):
+        """件数を超えるkを指定した場合は全件を返すことをテスト"""
+        index = QuantizedVectorIndex.build(["a", "b"], np.eye(2), "int8")
+
+        assert [chunk_id for chunk_id, _ in index.search([1.0, 0.1], 5)] == ["a", "b"]
+
+    def test_empty_index(self):
+        """空のインデックスでは空の結果を返すことをテスト"""
+        index = QuantizedVectorIndex.build([], np.zeros((0, 4)), "int8")
+
+        assert index.search([1.0, 0.0, 0.0, 0.0], 3) == []
+
+    def test_unknown_mode(self):
+        """未対応の量子化方式でエラーになることをテスト"""
+        with pytest.raises(ValueError, match="未対応の量子化方式"):
+            QuantizedVectorIndex.build(["a"], np.ones((1, 4)), "int4")
+
+    @pytest.mark.parametrize("mode", ["int8", "binary"])
+    def test_save_and_load(self, corpus, temp_dir, mode):
+        """保存したインデックスを読み込んで同じ結果が得られることをテスト"""
+        ids, documents, queries = corpus
+        index = QuantizedVectorIndex.build(ids, documents, mode, index_version="v1")
+        index.save(temp_dir)
+
+        loaded = QuantizedVectorIndex.load(temp_dir)
+
+        assert loaded.mode == mode
+        assert loaded.index_version == "v1"
+        assert loaded.search(queries[0], 5) == index.search(queries[0], 5)
+
+    def test_load_missing(self, temp_dir):
+        """保存されていない場合はNoneを返すことをテスト"""
+        assert QuantizedVectorIndex.load(temp_dir) is None
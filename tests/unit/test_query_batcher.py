@@ -0,0 +1,116 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from src.services.query_batcher import QueryBatcher
+
+
+class RecordingEncoder:
+    """呼び出しごとのバッチを記録するテスト用エンコーダー"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class TestQueryBatcher:
+    """QueryBatcher クラスのテスト"""
+
+    async def test_concurrent_queries_are_batched(self):
+        """同時に届いたクエリが1回の呼び出しにまとめられることをテスト"""
+        encoder = RecordingEncoder()
+        batcher = QueryBatcher(encoder, max_batch_size=16, max_wait_ms=20)
+
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("bb"), batcher.submit("ccc")
+        )
+
+        assert results == [[1.0], [2.0], [3.0]]
+        assert encoder.batches == [["a", "bb", "ccc"]]
+        assert batcher.stats() == {
+            "batches": 1,
+            "queries": 3,
+            "average_batch_size": 3.0,
+        }
+
+    async def test_max_batch_size_flushes_immediately(self):
+        """最大件数に達した時点で待たずに送出されることをテスト"""
+        encoder = RecordingEncoder()
+        # 待ち時間は十分長くし、件数による送出のみで完了することを確認する
+        batcher = QueryBatcher(encoder, max_batch_size=2, max_wait_ms=60_000)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit("a"), batcher.submit("bb")), timeout=5
+        )
+
+        assert results == [[1.0], [2.0]]
+        assert encoder.batches == [["a", "bb"]]
+
+    async def test_batches_split_by_max_size(self):
+        """最大件数を超えるクエリは複数のバッチに分かれることをテスト"""
+        encoder = RecordingEncoder()
+        batcher = QueryBatcher(encoder, max_batch_size=2, max_wait_ms=5)
+
+        await asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c"]))
+
+        assert encoder.batches == [["a", "b"], ["c"]]
+
+    async def test_duplicate_queries_encoded_once(self):
+        """同じクエリはバッチ内で1回だけ埋め込まれることをテスト"""
+        encoder = RecordingEncoder()
+        batcher = QueryBatcher(encoder, max_batch_size=16, max_wait_ms=5)
+
+        first, second = await asyncio.gather(batcher.submit("a"), batcher.submit("a"))
+
+        assert encoder.batches == [["a"]]
+        assert first == second == [1.0]
+        assert first is not second
+
+    async def test_encode_error_propagates_to_all_callers(self):
+        """埋め込みに失敗した場合は全呼び出し元に例外が伝わることをテスト"""
+
+        def failing_encoder(texts):
+            raise RuntimeError("model error")
+
+        batcher = QueryBatcher(failing_encoder, max_batch_size=16, max_wait_ms=5)
+
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def test_single_query_waits_at_most_max_wait(self):
+        """単独のクエリも最大待ち時間の経過後に処理されることをテスト"""
+        encoder = RecordingEncoder()
+        batcher = QueryBatcher(encoder, max_batch_size=16, max_wait_ms=1)
+
+        result = await asyncio.wait_for(batcher.submit("abc"), timeout=5)
+
+        assert result == [3.0]
+
+    async def test_encode_runs_in_given_executor(self):
+        """指定したスレッドプールでモデルを呼び出すことをテスト"""
+        encoder = RecordingEncoder()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = QueryBatcher(encoder, max_wait_ms=1, executor=executor)
+            with patch.object(executor, "submit", wraps=executor.submit) as submit:
+                assert await batcher.submit("abc") == [3.0]
+
+        submit.assert_called_once()
+
+
+@pytest.mark.parametrize("count", [1, 5, 32])
+async def test_results_match_callers(count):
+    """各呼び出し元に自分のクエリの結果が返ることをパラメータ化テストで検証"""
+    batcher = QueryBatcher(RecordingEncoder(), max_batch_size=8, max_wait_ms=2)
+    texts = ["x" * (index + 1) for index in range(count)]
+
+    results = await asyncio.gather(*(batcher.submit(text) for text in texts))
+
+    assert results == [[float(len(text))] for text in texts]
@@ -1,8 +1,19 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from langchain.schema import Document
+from langchain_core.messages import AIMessageChunk
+from langchain_chroma import Chroma
 
 from src.services.rag_service import RAGService
+from src.services.index_manifest import IndexManifest, assign_chunk_ids
+from src.services.numpy_vector_store import NumpyVectorStore
+from src.services.projection import ProjectedEmbeddings
 from src.models.schemas import ChatResponse
 from src.config.settings import Settings
 
@@ -42,7 +53,20 @@ class TestRAGService:
         service = RAGService(mock_settings)
 
         # EmbeddingServiceが正しく初期化されることを確認
-        mock_embedding_service.assert_called_once_with("test/embedding-model")
+        mock_embedding_service.assert_called_once_with(
+            "test/embedding-model",
+            executor=service.executors.get("embedding"),
+            cache_path="data/embedding_cache.sqlite3",
+            query_cache_size=1024,
+            query_cache_ttl_seconds=3600.0,
+            batch_size=32,
+            backend="torch",
+            onnx_model_directory="data/onnx",
+            onnx_quantize=True,
+            query_batch_max_size=16,
+            query_batch_max_wait_ms=5.0,
+            idle_unload_seconds=None,
+        )
         assert service.embedding_service == mock_embedding_instance
 
         # ChatOpenAIが正しく初期化されることを確認
@@ -58,12 +82,37 @@ class TestRAGService:
         assert service.settings == mock_settings
         assert service.vector_store is None  # 初期化メソッドをモックしているため
 
+    @patch("src.services.rag_service.RemoteEmbeddingService")
+    @patch("src.services.rag_service.EmbeddingService")
+    @patch("src.services.rag_service.ChatOpenAI")
+    @patch("src.services.rag_service.RAGService._initialize_vector_store")
+    def test_init_with_embedding_server(
+        self, mock_init, mock_chat_openai, mock_embedding_service, mock_remote
+    ):
+        """埋め込みサーバー指定時はモデルを読み込まずクライアントを使うことをテスト"""
+        settings = Settings(
+            openai_api_key="test_api_key",
+            embedding_server_socket="/tmp/embedding.sock",
+        )
+
+        service = RAGService(settings)
+
+        mock_embedding_service.assert_not_called()
+        mock_remote.assert_called_once_with(
+            "/tmp/embedding.sock",
+            executor=service.executors.get("upstream"),
+            batch_size=settings.embedding_batch_size,
+        )
+        assert service.embedding_service == mock_remote.return_value
+
     @patch("src.services.rag_service.EmbeddingService")
     @patch("src.services.rag_service.ChatOpenAI")
     @patch("os.path.exists")
     @patch("src.services.rag_service.Chroma")
+    @patch("src.services.rag_service.RAGService._sync_vector_store")
     def test_initialize_vector_store_existing_directory(
         self,
+        mock_sync,
         mock_chroma,
         mock_exists,
         mock_chat_openai,
@@ -85,12 +134,15 @@ class TestRAGService:
         # Chromaが正しい引数で呼ばれることを確認
         mock_chroma.assert_called_once_with(
             persist_directory="test_data/chroma",
-            embedding_function=mock_embedding_instance.embeddings,
+            embedding_function=mock_embedding_instance,
         )
 
         # ベクトルストアが設定されることを確認
         assert service.vector_store == mock_vector_store
 
+        # 仕様書の差分がベクトルストアに反映されることを確認
+        mock_sync.assert_called_once()
+
     @patch("src.services.rag_service.EmbeddingService")
     @patch("src.services.rag_service.ChatOpenAI")
     @patch("os.path.exists")
@@ -115,12 +167,14 @@ class TestRAGService:
     @patch("src.services.rag_service.EmbeddingService")
     @patch("src.services.rag_service.ChatOpenAI")
     @patch("os.path.exists")
-    @patch("src.services.rag_service.DocumentLoader")
+    @patch("src.services.rag_service.CorpusLoader")
     @patch("src.services.rag_service.Chroma")
+    @patch("src.services.rag_service.IndexManifest")
     def test_create_vector_store(
         self,
+        mock_index_manifest,
         mock_chroma,
-        mock_document_loader,
+        mock_corpus_loader,
         mock_exists,
         mock_chat_openai,
         mock_embedding_service,
@@ -132,9 +186,9 @@ class TestRAGService:
         mock_embedding_instance = Mock()
         mock_embedding_service.return_value = mock_embedding_instance
 
-        # DocumentLoaderのモック
+        # CorpusLoaderのモック
         mock_loader_instance = Mock()
-        mock_document_loader.return_value = mock_loader_instance
+        mock_corpus_loader.return_value = mock_loader_instance
 
         test_documents = [
             Document(page_content="テスト内容1", metadata={"section": "セクション1"}),
@@ -146,26 +200,44 @@ class TestRAGService:
         mock_vector_store = Mock()
         mock_chroma.from_documents.return_value = mock_vector_store
 
+        # マニフェストのモック
+        mock_manifest_instance = Mock()
+        mock_index_manifest.return_value = mock_manifest_instance
+        mock_manifest_instance.save.return_value = {"index_version": "v1"}
+
         service = RAGService(mock_settings)
 
-        # DocumentLoaderが正しく初期化されることを確認
-        mock_document_loader.assert_called_once_with("test_spec.md", 500, 100)
+        # CorpusLoaderが正しく初期化されることを確認
+        mock_corpus_loader.assert_called_once_with(
+            "test_spec.md",
+            500,
+            100,
+            asset_directory="data/assets",
+            token_counter_model=None,
+            max_workers=None,
+        )
 
         # load_documentsが呼ばれることを確認
         mock_loader_instance.load_documents.assert_called_once()
 
-        # Chroma.from_documentsが正しく呼ばれることを確認
+        # Chroma.from_documentsが内容由来のIDで呼ばれることを確認
+        expected_ids = assign_chunk_ids(test_documents)
         mock_chroma.from_documents.assert_called_once_with(
             documents=test_documents,
-            embedding=mock_embedding_instance.embeddings,
+            embedding=mock_embedding_instance,
+            ids=expected_ids,
             persist_directory="test_data/chroma",
         )
 
-        # persistが呼ばれることを確認
-        mock_vector_store.persist.assert_called_once()
+        # マニフェストが保存されることを確認
+        mock_index_manifest.assert_called_once_with("test_data/chroma")
+        mock_manifest_instance.save.assert_called_once_with(
+            service._index_fingerprint(), expected_ids
+        )
 
-        # ベクトルストアが設定されることを確認
+        # ベクトルストアとインデックスバージョンが設定されることを確認
         assert service.vector_store == mock_vector_store
+        assert service.index_version == "v1"
 
     @patch("src.services.rag_service.EmbeddingService")
     @patch("src.services.rag_service.ChatOpenAI")
@@ -185,13 +257,14 @@ class TestRAGService:
             (Document(page_content="内容1", metadata={"section": "セクション1"}), 0.8),
             (Document(page_content="内容2", metadata={"section": "セクション2"}), 0.6),
         ]
-        mock_vector_store.similarity_search_with_score.return_value = test_documents
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = test_documents
 
         result = service.search("テストクエリ", max_results=2)
 
-        # similarity_search_with_scoreが正しく呼ばれることを確認
-        mock_vector_store.similarity_search_with_score.assert_called_once_with(
-            "テストクエリ", k=2
+        # クエリベクトルで検索が正しく呼ばれることを確認
+        service.embedding_service.embed_query.assert_called_once_with("テストクエリ")
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.assert_called_once_with(
+            service.embedding_service.embed_query.return_value, k=2
         )
 
         # 結果が正しくフィルタリングされることを確認（similarity_threshold=0.5）
@@ -219,7 +292,7 @@ class TestRAGService:
                 0.3,
             ),  # しきい値以下
         ]
-        mock_vector_store.similarity_search_with_score.return_value = test_documents
+        mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = test_documents
 
         result = service.search("テストクエリ")
 
@@ -245,7 +318,7 @@ class TestRAGService:
     @patch("src.services.rag_service.EmbeddingService")
     @patch("src.services.rag_service.ChatOpenAI")
     @patch("src.services.rag_service.RAGService._initialize_vector_store")
-    @patch("src.services.rag_service.LLMChain")
+    @patch("src.services.prompt_registry.LLMChain")
     def test_generate_answer(
         self,
         mock_llm_chain,
@@ -289,7 +362,33 @@ class TestRAGService:
     @patch("src.services.rag_service.EmbeddingService")
     @patch("src.services.rag_service.ChatOpenAI")
     @patch("src.services.rag_service.RAGService._initialize_vector_store")
-    @patch("src.services.rag_service.LLMChain")
+    @patch("src.services.prompt_registry.LLMChain")
+    def test_generate_answer_reuses_chain(
+        self,
+        mock_llm_chain,
+        mock_init,
+        mock_chat_openai,
+        mock_embedding_service,
+        mock_settings,
+    ):
+        """LLMチェーンをリクエストごとに作らず、テンプレートの再読み込みで作り直すことをテスト"""
+        service = RAGService(mock_settings)
+        mock_llm_chain.return_value.run.return_value = "回答"
+        documents = [Document(page_content="内容", metadata={"section": "S"})]
+
+        service.generate_answer("質問1", documents)
+        service.generate_answer("質問2", documents)
+        assert mock_llm_chain.call_count == 1
+        assert mock_llm_chain.return_value.run.call_count == 2
+
+        service.reload_prompt_templates()
+        service.generate_answer("質問3", documents)
+        assert mock_llm_chain.call_count == 2
+
+    @patch("src.services.rag_service.EmbeddingService")
+    @patch("src.services.rag_service.ChatOpenAI")
+    @patch("src.services.rag_service.RAGService._initialize_vector_store")
+    @patch("src.services.prompt_registry.LLMChain")
     def test_generate_answer_long_context(
         self,
         mock_llm_chain,
@@ -362,8 +461,8 @@ class TestRAGService:
             ),
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results, [0.1, 0.2])
 
             with patch.object(service, "generate_answer") as mock_generate:
                 mock_generate.return_value = "生成された回答です。"
@@ -413,8 +512,8 @@ class TestRAGService:
 
         service = RAGService(mock_settings)
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = []
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = ([], [0.1, 0.2])
 
             result = service.chat("見つからない質問")
 
@@ -459,8 +558,8 @@ class TestRAGService:
             ),
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results, [0.1, 0.2])
 
             with patch.object(service, "generate_answer") as mock_generate:
                 mock_generate.return_value = "回答"
@@ -498,6 +597,949 @@ class TestRAGService:
         assert service.is_ready() is False
 
 
+class TestRAGServiceIncrementalIndexing:
+    """RAGServiceの差分インデックス更新のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory, temp_dir):
+        """永続化ディレクトリを一時ディレクトリにしたRAGService"""
+        spec_file_path = os.path.join(temp_dir, "spec.md")
+        with open(spec_file_path, "w", encoding="utf-8") as f:
+            f.write("## **1. テスト**\n")
+
+        service = rag_service_factory(
+            chroma_persist_directory=os.path.join(temp_dir, "chroma"),
+            embedding_model_name="test/embedding-model",
+            spec_file_path=spec_file_path,
+        )
+        service.vector_store = Mock()
+        return service
+
+    @staticmethod
+    def _documents(*contents):
+        return [
+            Document(page_content=content, metadata={"section": "セクション"})
+            for content in contents
+        ]
+
+    def _save_manifest(self, service, documents):
+        return IndexManifest(service.settings.chroma_persist_directory).save(
+            service._index_fingerprint(), assign_chunk_ids(documents)
+        )
+
+    def test_sync_unchanged_documents(self, service):
+        """仕様書に変更がない場合は再ベクトル化しないことをテスト"""
+        documents = self._documents("内容A", "内容B")
+        manifest = self._save_manifest(service, documents)
+
+        with patch.object(service, "_load_documents", return_value=documents):
+            service._sync_vector_store()
+
+        service.vector_store.add_documents.assert_not_called()
+        service.vector_store.delete.assert_not_called()
+        assert service.index_version == manifest["index_version"]
+
+    def test_sync_changed_documents(self, service):
+        """追加・削除されたチャンクのみが反映されることをテスト"""
+        old_documents = self._documents("内容A", "内容B")
+        old_manifest = self._save_manifest(service, old_documents)
+        new_documents = self._documents("内容A", "内容C")
+
+        with patch.object(service, "_load_documents", return_value=new_documents):
+            service._sync_vector_store()
+
+        old_ids = assign_chunk_ids(old_documents)
+        new_ids = assign_chunk_ids(new_documents)
+        service.vector_store.delete.assert_called_once_with(ids=[old_ids[1]])
+        service.vector_store.add_documents.assert_called_once_with(
+            [new_documents[1]], ids=[new_ids[1]]
+        )
+
+        # マニフェストとインデックスバージョンが更新されることを確認
+        manifest = IndexManifest(service.settings.chroma_persist_directory).load()
+        assert manifest["chunk_ids"] == new_ids
+        assert service.index_version == manifest["index_version"]
+        assert service.index_version != old_manifest["index_version"]
+
+    def test_sync_rebuilds_when_fingerprint_changes(self, service):
+        """埋め込みモデルが変わった場合は全体を再構築することをテスト"""
+        documents = self._documents("内容A")
+        IndexManifest(service.settings.chroma_persist_directory).save(
+            "other-fingerprint", assign_chunk_ids(documents)
+        )
+        vector_store = service.vector_store
+
+        with patch.object(service, "_create_vector_store") as mock_create:
+            service._sync_vector_store()
+
+        vector_store.delete_collection.assert_called_once()
+        mock_create.assert_called_once()
+
+    def test_sync_rebuilds_without_manifest(self, service):
+        """マニフェストのない旧形式のストアは再構築されることをテスト"""
+        vector_store = service.vector_store
+
+        with patch.object(service, "_create_vector_store") as mock_create:
+            service._sync_vector_store()
+
+        vector_store.delete_collection.assert_called_once()
+        mock_create.assert_called_once()
+
+    def test_sync_keeps_index_when_spec_missing(self, service):
+        """仕様書がない場合は既存のインデックスをそのまま使うことをテスト"""
+        manifest = self._save_manifest(service, self._documents("内容A"))
+        os.remove(service.settings.spec_file_path)
+
+        with patch.object(service, "_load_documents") as mock_load:
+            service._sync_vector_store()
+
+        mock_load.assert_not_called()
+        service.vector_store.delete_collection.assert_not_called()
+        assert service.index_version == manifest["index_version"]
+
+
+class TestRAGServiceAsyncSearch:
+    """RAGService.asearch のテスト"""
+
+    async def test_asearch_uses_batched_query_embedding(self, rag_service_factory):
+        """非同期検索がマイクロバッチ経由のクエリベクトルで検索することをテスト"""
+        service = rag_service_factory(similarity_threshold=0.5)
+        service.embedding_service.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        service.vector_store = Mock()
+        service.vector_store.similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content="内容1", metadata={}), 0.8),
+            (Document(page_content="内容2", metadata={}), 0.2),
+        ]
+
+        result = await service.asearch("テストクエリ", max_results=2)
+
+        service.embedding_service.aembed_query.assert_awaited_once_with("テストクエリ")
+        service.vector_store.similarity_search_by_vector_with_relevance_scores.assert_called_once_with(
+            [0.1, 0.2], k=2
+        )
+        assert [score for _, score in result] == [0.8]
+
+    async def test_asearch_without_vector_store(self, rag_service_factory):
+        """ベクトルストア未初期化の場合にエラーとなることをテスト"""
+        service = rag_service_factory()
+
+        with pytest.raises(ValueError):
+            await service.asearch("テストクエリ")
+
+
+class TestRAGServiceQuantizedIndex:
+    """量子化インデックスによる検索のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory, temp_dir):
+        service = rag_service_factory(
+            chroma_persist_directory=temp_dir,
+            vector_quantization="int8",
+            similarity_threshold=0.0,
+        )
+        service.vector_store = Mock()
+        service.vector_store.get.return_value = {
+            "ids": ["a", "b", "c"],
+            "embeddings": np.eye(3).tolist(),
+        }
+        service.vector_store.get_by_ids.side_effect = lambda ids: [
+            Document(id=chunk_id, page_content=f"内容{chunk_id}")
+            for chunk_id in reversed(ids)
+        ]
+        service.index_version = "v1"
+        return service
+
+    def test_search_uses_quantized_index(self, service):
+        """量子化インデックスの結果の順にドキュメントが返ることをテスト"""
+        service._load_quantized_index()
+        service.embedding_service.embed_query.return_value = [0.1, 1.0, 0.5]
+
+        results = service.search("テストクエリ", max_results=2)
+
+        assert [document.id for document, _ in results] == ["b", "c"]
+        assert results[0][1] == pytest.approx(2 - 2 * 1.0 / np.sqrt(1.26), abs=1e-3)
+        service.vector_store.similarity_search_by_vector_with_relevance_scores.assert_not_called()
+
+    def test_saved_index_is_reused(self, service):
+        """インデックスのバージョンが同じ場合は保存済みの量子化インデックスを使うことをテスト"""
+        service._load_quantized_index()
+        service.vector_store.get.reset_mock()
+
+        service._load_quantized_index()
+
+        service.vector_store.get.assert_not_called()
+        assert len(service.quantized_index) == 3
+
+    def test_index_rebuilt_when_version_changes(self, service):
+        """インデックスのバージョンが変わった場合は再構築されることをテスト"""
+        service._load_quantized_index()
+        service.index_version = "v2"
+
+        service._load_quantized_index()
+
+        assert service.vector_store.get.call_count == 2
+        assert service.quantized_index.index_version == "v2"
+
+
+class TestRAGServiceProjection:
+    """埋め込みの次元削減のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory, temp_dir):
+        service = rag_service_factory(
+            chroma_persist_directory=os.path.join(temp_dir, "chroma"),
+            embedding_projection_dimension=2,
+            similarity_threshold=0.0,
+        )
+        vectors = np.random.default_rng(0).standard_normal((5, 6)).tolist()
+        service.embedding_service.embed_documents.return_value = vectors
+        service.embedding_service.embed_query.return_value = vectors[0]
+        return service
+
+    @patch("src.services.rag_service.Chroma")
+    def test_create_vector_store_fits_projection(self, mock_chroma, service):
+        """インデックス構築時に射影行列を学習し、射影後のベクトルを格納することをテスト"""
+        documents = [Document(page_content=f"内容{index}") for index in range(5)]
+
+        with patch.object(service, "_load_documents", return_value=documents):
+            service._create_vector_store()
+
+        assert service.projection.output_dimension == 2
+        assert os.path.exists(
+            os.path.join(service.settings.chroma_persist_directory, "projection.npz")
+        )
+        embedding = mock_chroma.from_documents.call_args.kwargs["embedding"]
+        assert isinstance(embedding, ProjectedEmbeddings)
+        assert '"projection_dimension": 2' in service._index_fingerprint()
+
+    @patch("src.services.rag_service.Chroma")
+    def test_search_projects_query(self, mock_chroma, service):
+        """検索時のクエリベクトルも同じ射影で削減されることをテスト"""
+        documents = [Document(page_content=f"内容{index}") for index in range(5)]
+        with patch.object(service, "_load_documents", return_value=documents):
+            service._create_vector_store()
+        service.vector_store.similarity_search_by_vector_with_relevance_scores.return_value = []
+
+        service.search("テストクエリ")
+
+        query_vector = service.vector_store.similarity_search_by_vector_with_relevance_scores.call_args.args[
+            0
+        ]
+        assert len(query_vector) == 2
+
+    def test_missing_projection_triggers_rebuild(self, service):
+        """射影行列が失われた場合は全体を再構築することをテスト"""
+        manifest = IndexManifest(service.settings.chroma_persist_directory)
+        manifest.save(service._index_fingerprint(), [])
+        service.vector_store = Mock()
+
+        with (
+            patch("src.services.rag_service.resolve_spec_files", return_value=["a.md"]),
+            patch.object(service, "_create_vector_store") as mock_create,
+        ):
+            service._sync_vector_store()
+
+        service.vector_store.delete_collection.assert_called_once()
+        mock_create.assert_called_once()
+
+
+class TestRAGServiceVectorStoreBackend:
+    """ベクトルストアの実装の切り替えのテスト"""
+
+    @pytest.fixture
+    def create_service(self, rag_service_factory, temp_dir):
+        def create(**overrides):
+            service = rag_service_factory(
+                chroma_persist_directory=os.path.join(temp_dir, "store"),
+                similarity_threshold=0.0,
+                **overrides,
+            )
+            service.embedding_service.embed_documents.side_effect = lambda texts: [
+                [float(len(text)), 1.0] for text in texts
+            ]
+            service.embedding_service.embed_query.return_value = [4.0, 1.0]
+            return service
+
+        return create
+
+    def test_numpy_backend(self, create_service):
+        """numpyバックエンドで構築・検索・再読み込みできることをテスト"""
+        service = create_service(
+            vector_store_backend="numpy", numpy_vector_dtype="float16"
+        )
+        documents = [Document(page_content="あ" * length) for length in (1, 4, 9)]
+
+        with patch.object(service, "_load_documents", return_value=documents):
+            service._create_vector_store()
+            results = service.search("テストクエリ", max_results=1)
+
+        assert isinstance(service.vector_store, NumpyVectorStore)
+        assert service.vector_store.dtype == np.float16
+        assert results[0][0].page_content == "あ" * 4
+        assert '"vector_store_backend": "numpy"' in service._index_fingerprint()
+
+        with patch.object(service, "_sync_vector_store"):
+            service._initialize_vector_store()
+        assert len(service.vector_store) == 3
+
+    def test_default_backend_is_chroma(self, create_service):
+        """既定ではChromaを使い、指紋も変わらないことをテスト"""
+        service = create_service()
+
+        assert service._vector_store_class() is Chroma
+        assert service._vector_store_options() == {}
+        assert "vector_store_backend" not in service._index_fingerprint()
+
+    def test_unknown_backend(self, create_service):
+        """未対応のバックエンドを指定した場合はエラーになることをテスト"""
+        service = create_service(vector_store_backend="faiss")
+
+        with pytest.raises(ValueError, match="未対応のベクトルストア"):
+            service._vector_store_class()
+
+
+class TestRAGServiceHybridSearch:
+    """ベクトル検索と語彙検索を統合したハイブリッド検索のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory, temp_dir):
+        service = rag_service_factory(
+            chroma_persist_directory=temp_dir,
+            vector_store_backend="numpy",
+            hybrid_search=True,
+            hybrid_candidates=2,
+            similarity_threshold=0.0,
+        )
+        # 固有名詞を含むチャンクだけがクエリベクトルから遠い
+        vectors = {
+            "ガチャの排出率について": [1.0, 0.0],
+            "ガチャの天井について": [0.9, 0.1],
+            "通貨「ルミナ石」の入手方法": [0.0, 1.0],
+        }
+        service.embedding_service.embed_documents.side_effect = lambda texts: [
+            vectors[text] for text in texts
+        ]
+        service.embedding_service.embed_query.return_value = [1.0, 0.0]
+        service.vector_store = NumpyVectorStore.from_texts(
+            list(vectors), service.embedding_service, ids=["a", "b", "c"]
+        )
+        service.index_version = "v1"
+        return service
+
+    def test_lexical_match_is_fused(self, service):
+        """ベクトル検索で漏れた固有名詞のチャンクが統合結果に含まれることをテスト"""
+        service._load_lexical_index()
+
+        results = service.search("ルミナ石", max_results=2)
+
+        assert [document.id for document, _ in results] == ["a", "c"]
+        assert results[1][0].page_content == "通貨「ルミナ石」の入手方法"
+        assert results[1][1] == pytest.approx(2.0)
+
+    def test_dense_only_without_lexical_index(self, service):
+        """語彙インデックスがない場合はベクトル検索の結果のみを返すことをテスト"""
+        results = service.search("ルミナ石", max_results=2)
+
+        assert [document.id for document, _ in results] == ["a", "b"]
+
+    def test_saved_index_is_reused(self, service):
+        """インデックスのバージョンが同じ場合は保存済みの語彙インデックスを使うことをテスト"""
+        service._load_lexical_index()
+
+        with patch.object(service.vector_store, "get") as mock_get:
+            service._load_lexical_index()
+            mock_get.assert_not_called()
+
+        service.index_version = "v2"
+        service._load_lexical_index()
+        assert service.lexical_index.index_version == "v2"
+
+
+class TestRAGServiceRerank:
+    """検索結果のリランキングのテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory):
+        service = rag_service_factory(
+            reranker_model_name="test/reranker",
+            rerank_candidates=4,
+            similarity_threshold=0.3,
+        )
+        service.embedding_service.embed_query.return_value = [0.1, 0.2]
+        service.embedding_service.stats.return_value = {}
+        service.vector_store = Mock()
+        service.vector_store.similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(id=chunk_id, page_content=f"内容{chunk_id}"), distance)
+            for chunk_id, distance in [("a", 0.4), ("b", 0.5), ("c", 0.6), ("d", 0.1)]
+        ]
+        service.reranker._model = Mock()
+        service.reranker._model.predict.side_effect = lambda pairs, batch_size: [
+            {"内容a": 0.1, "内容b": 0.9, "内容c": 0.5}[text] for _, text in pairs
+        ]
+        return service
+
+    def test_search_reranks_wider_candidates(self, service):
+        """しきい値を通過した広めの候補を並べ替えて上位max_results件を返すことをテスト"""
+        results = service.search("テストクエリ", max_results=2)
+
+        service.vector_store.similarity_search_by_vector_with_relevance_scores.assert_called_once_with(
+            [0.1, 0.2], k=4
+        )
+        assert [document.id for document, _ in results] == ["b", "c"]
+        assert results[0][1] == 0.5
+
+    async def test_asearch_reranks(self, service):
+        """非同期検索でも並べ替えられることをテスト"""
+        service.embedding_service.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+
+        results = await service.asearch("テストクエリ", max_results=1)
+
+        assert [document.id for document, _ in results] == ["b"]
+
+    def test_metrics_include_reranker(self, service):
+        """メトリクスにリランキングの統計が含まれることをテスト"""
+        service.search("テストクエリ", max_results=2)
+
+        assert service.get_metrics()["reranker"]["reranks"] == 1
+
+
+class TestRAGServiceSemanticCache:
+    """回答の意味的キャッシュのテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory):
+        service = rag_service_factory(semantic_cache_size=8)
+        service.embedding_service.embed_query.side_effect = lambda text: (
+            [1.0, 0.0] if "ガチャ" in text else [0.0, 1.0]
+        )
+        service.vector_store = Mock()
+        service.index_version = "v1"
+        return service
+
+    @staticmethod
+    def _results(*chunk_ids):
+        return [
+            (Document(id=chunk_id, page_content=f"内容{chunk_id}"), 0.5)
+            for chunk_id in chunk_ids
+        ]
+
+    def test_similar_question_served_from_cache(self, service):
+        """言い回しの近い質問ではLLMを呼び出さずに同じ回答を返すことをテスト"""
+        with (
+            patch.object(
+                service, "_retrieve_and_rerank", return_value=self._results("a", "b")
+            ),
+            patch.object(service, "generate_answer", return_value="回答") as mock_gen,
+        ):
+            first = service.chat("ガチャの排出率は？")
+            second = service.chat("ガチャの排出率を教えて")
+
+        mock_gen.assert_called_once()
+        # キャッシュの参照には検索時のクエリベクトルを使い、埋め込みを計算し直さない
+        assert service.embedding_service.embed_query.call_count == 2
+        assert second.answer == first.answer == "回答"
+        assert second.sources == first.sources
+        # キャッシュから返した場合も会話はセッションに保存する
+        assert service.session_service.add_message.call_count == 4
+
+    def test_different_question_or_chunks_not_cached(self, service):
+        """意味が離れた質問や検索結果が異なる質問ではLLMを呼び出すことをテスト"""
+        with patch.object(service, "generate_answer", return_value="回答") as mock_gen:
+            with patch.object(
+                service, "_retrieve_and_rerank", return_value=self._results("a")
+            ):
+                service.chat("ガチャの排出率は？")
+                service.chat("通貨の種類は？")
+            with patch.object(
+                service, "_retrieve_and_rerank", return_value=self._results("c")
+            ):
+                service.chat("ガチャの天井は？")
+
+        assert mock_gen.call_count == 3
+
+    def test_history_bypasses_cache(self, service):
+        """会話履歴がある場合はキャッシュを使わないことをテスト"""
+        service.session_service.get_conversation_history.return_value = [
+            {"role": "user", "content": "前の質問"}
+        ]
+
+        with (
+            patch.object(
+                service, "_retrieve_and_rerank", return_value=self._results("a")
+            ),
+            patch.object(
+                service, "generate_answer_with_history", return_value="回答"
+            ) as mock_gen,
+        ):
+            service.chat("ガチャの排出率は？", session_id="session-1")
+            service.chat("ガチャの排出率は？", session_id="session-1")
+
+        assert mock_gen.call_count == 2
+        assert len(service.semantic_cache) == 0
+
+    async def test_achat_reuses_query_embedding_from_search(self, service):
+        """非同期版も検索時のクエリベクトルでキャッシュを参照し、
+        データベース用のスレッドプールで埋め込みを計算しないことをテスト"""
+        service.embedding_service.aembed_query = AsyncMock(
+            side_effect=service.embedding_service.embed_query.side_effect
+        )
+        service.agenerate_answer = AsyncMock(return_value="回答")
+
+        with patch.object(
+            service, "_retrieve_and_rerank", return_value=self._results("a")
+        ):
+            first = await service.achat("ガチャの排出率は？")
+            second = await service.achat("ガチャの排出率を教えて")
+
+        assert second.answer == first.answer == "回答"
+        service.agenerate_answer.assert_awaited_once()
+        assert service.embedding_service.aembed_query.await_count == 2
+        service.embedding_service.embed_query.assert_not_called()
+
+    def test_metrics_include_cache(self, service):
+        """メトリクスに意味的キャッシュの統計が含まれることをテスト"""
+        service.embedding_service.stats.return_value = {}
+
+        assert service.get_metrics()["semantic_answer_cache"]["max_size"] == 8
+
+
+class TestRAGServiceAnswerCache:
+    """回答の完全一致キャッシュのテスト"""
+
+    @pytest.fixture
+    def create_service(self, rag_service_factory, temp_dir):
+        def create(backend):
+            service = rag_service_factory(
+                answer_cache_backend=backend,
+                answer_cache_path=os.path.join(temp_dir, "answers.sqlite3"),
+            )
+            service.embedding_service.stats.return_value = {}
+            service.index_version = "v1"
+            return service
+
+        return create
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_repeated_question_served_from_cache(self, create_service, backend):
+        """表記ゆれのみ異なる同じ質問ではLLMを呼び出さないことをテスト"""
+        service = create_service(backend)
+        results = [
+            (Document(id="a", page_content="内容", metadata={"section": "A"}), 0.4)
+        ]
+
+        with (
+            patch.object(
+                service, "_search_with_embedding", return_value=(results, [0.1, 0.2])
+            ),
+            patch.object(service, "generate_answer", return_value="回答") as mock_gen,
+        ):
+            first = service.chat("ＨＰの上限は？")
+            second = service.chat("HPの上限は?")
+            service.index_version = "v2"
+            service.chat("HPの上限は?")
+
+        assert mock_gen.call_count == 2
+        assert second == first
+        assert service.get_metrics()["answer_cache"]["hits"] == 1
+
+    def test_unknown_backend(self, create_service):
+        """未対応のバックエンドを指定した場合はエラーになることをテスト"""
+        with pytest.raises(ValueError, match="未対応の回答キャッシュ"):
+            create_service("redis")
+
+
+class TestRAGServiceGenerationCoalescing:
+    """同時に届いた同じ質問の回答生成の共有のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory):
+        return rag_service_factory()
+
+    def test_concurrent_identical_questions_share_generation(self, service):
+        """同時の同じ質問はLLMを1回だけ呼び出し、各セッションに保存されることをテスト"""
+        release = threading.Event()
+        results = [(Document(id="a", page_content="内容"), 0.5)]
+
+        def generate(question, documents):
+            release.wait(5)
+            return "回答"
+
+        with (
+            patch.object(
+                service, "_search_with_embedding", return_value=(results, [0.1, 0.2])
+            ),
+            patch.object(service, "generate_answer", side_effect=generate) as mock_gen,
+            ThreadPoolExecutor(max_workers=2) as executor,
+        ):
+            futures = [
+                executor.submit(service.chat, "ガチャの排出率は？", 3, session_id)
+                for session_id in ("session-1", "session-2")
+            ]
+            deadline = time.monotonic() + 5
+            while service.single_flight.coalesced < 1:
+                assert time.monotonic() < deadline
+                time.sleep(0.001)
+            release.set()
+            responses = [future.result(5) for future in futures]
+
+        mock_gen.assert_called_once()
+        assert [response.answer for response in responses] == ["回答", "回答"]
+        saved_sessions = {
+            (call.kwargs["session_id"], call.kwargs["role"])
+            for call in service.session_service.add_message.call_args_list
+        }
+        assert saved_sessions == {
+            ("session-1", "user"),
+            ("session-1", "assistant"),
+            ("session-2", "user"),
+            ("session-2", "assistant"),
+        }
+
+    def test_disabled(self, rag_service_factory):
+        """無効にした場合は共有しないことをテスト"""
+        service = rag_service_factory(coalesce_generations=False)
+
+        assert service.single_flight is None
+
+
+class TestRAGServiceStreamChat:
+    """RAGService.stream_chat のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory):
+        service = rag_service_factory()
+        service.llm.stream.return_value = iter(
+            [AIMessageChunk(content=text) for text in ["回答", "", "です。"]]
+        )
+        return service
+
+    def test_stream_events(self, service):
+        """ソース・トークン・完了の順にイベントを返し、回答を1回だけ保存することをテスト"""
+        results = [
+            (Document(page_content="内容", metadata={"section": "セクション"}), 0.3)
+        ]
+
+        with patch.object(
+            service, "_search_with_embedding", return_value=(results, [0.1, 0.2])
+        ):
+            events = list(service.stream_chat("質問", max_results=1))
+
+        assert events[0] == (
+            "sources",
+            {
+                "sources": [
+                    {
+                        "content": "内容",
+                        "section": "セクション",
+                        "metadata": {"score": 0.3},
+                    }
+                ]
+            },
+        )
+        assert events[1:] == [
+            ("token", {"text": "回答"}),
+            ("token", {"text": "です。"}),
+            ("done", {"confidence": pytest.approx(0.7), "session_id": "session-1"}),
+        ]
+        # プロンプトにコンテキストと質問が含まれる
+        messages = service.llm.stream.call_args.args[0]
+        assert "【セクション】" in messages[1].content
+        assistant_calls = [
+            call
+            for call in service.session_service.add_message.call_args_list
+            if call.kwargs["role"] == "assistant"
+        ]
+        assert len(assistant_calls) == 1
+        assert assistant_calls[0].kwargs["content"] == "回答です。"
+
+    async def test_astream_chat_uses_upstream_executor_only_for_llm(self, service):
+        """非同期版がLLMの応答だけを外部呼び出し用のスレッドプールで取り出し、
+        データベースの処理はデータベース用のスレッドプールで行うことをテスト"""
+        results = [(Document(page_content="内容", metadata={}), 0.3)]
+
+        with patch.object(
+            service,
+            "_asearch_with_embedding",
+            AsyncMock(return_value=(results, [0.1, 0.2])),
+        ):
+            events = [event async for event in service.astream_chat("質問")]
+
+        assert [name for name, _ in events] == ["sources", "token", "token", "done"]
+        executors = service.executors.stats()
+        # LLMの3つのチャンクと終端の取り出し
+        assert executors["upstream"]["completed"] == 4
+        # セッションの作成、履歴の取得、質問と回答の保存、回答キャッシュの参照と登録
+        assert executors["db"]["completed"] == 6
+        assert [
+            call.kwargs["role"]
+            for call in service.session_service.add_message.call_args_list
+        ] == ["user", "assistant"]
+
+    async def test_astream_chat_closes_llm_stream_when_stopped(self, service):
+        """途中で打ち切られた場合にLLMのストリーミング応答を閉じ、回答を保存しないことをテスト"""
+        results = [(Document(page_content="内容", metadata={}), 0.3)]
+        closed = []
+
+        def chunks():
+            try:
+                yield AIMessageChunk(content="回答")
+                yield AIMessageChunk(content="です。")
+            finally:
+                closed.append(True)
+
+        service.llm.stream.return_value = chunks()
+
+        with patch.object(
+            service,
+            "_asearch_with_embedding",
+            AsyncMock(return_value=(results, [0.1, 0.2])),
+        ):
+            events = service.astream_chat("質問")
+            assert (await anext(events))[0] == "sources"
+            assert await anext(events) == ("token", {"text": "回答"})
+            await events.aclose()
+
+        assert closed == [True]
+        assert [
+            call.kwargs["role"]
+            for call in service.session_service.add_message.call_args_list
+        ] == ["user"]
+
+    def test_stream_without_results(self, service):
+        """検索結果がない場合は定型文を返し、LLMを呼び出さないことをテスト"""
+        with patch.object(
+            service, "_search_with_embedding", return_value=([], [0.1, 0.2])
+        ):
+            events = list(service.stream_chat("質問"))
+
+        assert events[1] == (
+            "token",
+            {"text": service.settings.prompt_templates.no_results_message},
+        )
+        assert events[2][0] == "done"
+        service.llm.stream.assert_not_called()
+
+
+class TestRAGServiceAsyncChat:
+    """RAGService.achat のテスト"""
+
+    @pytest.fixture
+    def service(self, rag_service_factory):
+        return rag_service_factory()
+
+    async def test_achat_fetches_history_and_searches_concurrently(self, service):
+        """会話履歴の取得と検索が並行して実行されることをテスト"""
+        search_started = threading.Event()
+        results = [(Document(page_content="内容", metadata={"section": "S"}), 0.3)]
+
+        async def asearch(question, max_results):
+            search_started.set()
+            return results, [0.1, 0.2]
+
+        def get_history(session_id, limit=None):
+            # 検索が始まるまで待つ（逐次実行ならここで待ち続ける）
+            assert search_started.wait(5)
+            return [{"role": "user", "content": "前の質問"}]
+
+        service.session_service.get_conversation_history.side_effect = get_history
+        service.agenerate_answer = AsyncMock(return_value="回答")
+
+        with patch.object(service, "_asearch_with_embedding", side_effect=asearch):
+            response = await service.achat("質問", max_results=1, session_id="s-1")
+
+        assert response.answer == "回答"
+        assert response.session_id == "s-1"
+        assert response.confidence == pytest.approx(0.7)
+        service.agenerate_answer.assert_awaited_once_with(
+            "質問", [results[0][0]], [{"role": "user", "content": "前の質問"}]
+        )
+        roles = [
+            call.kwargs["role"]
+            for call in service.session_service.add_message.call_args_list
+        ]
+        assert roles == ["user", "assistant"]
+
+    async def test_achat_creates_session_and_uses_async_llm(self, service):
+        """セッションを作成し、LLMを非同期APIで呼び出すことをテスト"""
+        results = [(Document(page_content="内容", metadata={}), 0.2)]
+
+        with (
+            patch.object(
+                service,
+                "_asearch_with_embedding",
+                AsyncMock(return_value=(results, [0.1, 0.2])),
+            ),
+            patch("src.services.prompt_registry.LLMChain") as mock_chain_class,
+        ):
+            mock_chain_class.return_value.arun = AsyncMock(return_value=" 回答 ")
+            response = await service.achat("質問")
+
+        assert response.answer == "回答"
+        assert response.session_id == "session-1"
+        mock_chain_class.return_value.arun.assert_awaited_once()
+        mock_chain_class.return_value.run.assert_not_called()
+
+    async def test_achat_without_results(self, service):
+        """検索結果がない場合は定型文を返すことをテスト"""
+        service.agenerate_answer = AsyncMock()
+
+        with patch.object(
+            service, "_asearch_with_embedding", AsyncMock(return_value=([], [0.1]))
+        ):
+            response = await service.achat("質問", session_id="s-1")
+
+        assert response.answer == service.settings.prompt_templates.no_results_message
+        assert response.confidence == 0.0
+        service.agenerate_answer.assert_not_awaited()
+
+    async def test_achat_runs_database_work_in_db_executor(self, service):
+        """会話履歴・メッセージ・回答キャッシュの処理がデータベース用のスレッドプールで
+        実行され、指標に反映されることをテスト"""
+        results = [(Document(page_content="内容", metadata={}), 0.2)]
+        service.agenerate_answer = AsyncMock(return_value="回答")
+        service.embedding_service.stats.return_value = {}
+
+        with patch.object(
+            service,
+            "_asearch_with_embedding",
+            AsyncMock(return_value=(results, [0.1, 0.2])),
+        ):
+            await service.achat("質問", session_id="s-1")
+
+        executors = service.get_metrics()["executors"]
+        # 履歴の取得、質問と回答の保存、回答キャッシュの参照と登録
+        assert executors["db"]["completed"] == 5
+        assert executors["upstream"]["submitted"] == 0
+
+    async def test_achat_coalesces_identical_questions(self, service):
+        """同時の同じ質問は回答生成を1回だけ行うことをテスト"""
+        results = [(Document(id="a", page_content="内容"), 0.5)]
+        calls = []
+
+        async def generate(question, documents):
+            calls.append(question)
+            # 2件目の呼び出しが実行中の生成に合流するまで待つ
+            deadline = time.monotonic() + 5
+            while service.single_flight.coalesced < 1:
+                assert time.monotonic() < deadline
+                await asyncio.sleep(0.001)
+            return "回答"
+
+        service.agenerate_answer = generate
+
+        with patch.object(
+            service,
+            "_asearch_with_embedding",
+            AsyncMock(return_value=(results, [0.1, 0.2])),
+        ):
+            responses = await asyncio.gather(
+                service.achat("質問", session_id="s-1"),
+                service.achat("質問", session_id="s-2"),
+            )
+
+        assert [response.answer for response in responses] == ["回答", "回答"]
+        assert len(calls) == 1
+        assert service.single_flight.stats()["coalesced"] == 1
+
+
+class TestRAGServiceTokenBudget:
+    """トークン数によるチャンクサイズ・コンテキスト長制御のテスト"""
+
+    @pytest.fixture
+    def word_counter(self):
+        """空白区切りの単語を1トークンとして数えるカウンター"""
+        counter = Mock()
+        counter.reserved_tokens = 2
+        counter.count.side_effect = lambda text: len(text.split())
+        counter.truncate.side_effect = lambda text, max_tokens: " ".join(
+            text.split()[:max_tokens]
+        )
+        return counter
+
+    @pytest.fixture
+    def create_service(self, rag_service_factory):
+        def create(**overrides):
+            return rag_service_factory(
+                embedding_model_name="test/embedding-model",
+                spec_file_path="test_spec.md",
+                **overrides,
+            )
+
+        return create
+
+    @patch("src.services.rag_service.CorpusLoader")
+    @patch("src.services.rag_service.get_embedding_token_counter")
+    def test_load_documents_clamps_chunk_size_to_embedding_window(
+        self, mock_get_counter, mock_corpus_loader, word_counter, create_service
+    ):
+        """トークン単位ではチャンクサイズが埋め込みモデルの上限に収まることをテスト"""
+        mock_get_counter.return_value = word_counter
+        service = create_service(
+            chunk_size_unit="tokens",
+            chunk_size=1000,
+            chunk_overlap=600,
+            embedding_max_tokens=512,
+        )
+
+        service._load_documents()
+
+        mock_get_counter.assert_called_once_with("test/embedding-model")
+        mock_corpus_loader.assert_called_once_with(
+            "test_spec.md",
+            510,
+            509,
+            asset_directory="data/assets",
+            token_counter_model="test/embedding-model",
+            max_workers=None,
+        )
+
+    @patch("src.services.rag_service.CorpusLoader")
+    def test_load_documents_rejects_unknown_chunk_size_unit(
+        self, mock_corpus_loader, create_service
+    ):
+        """未対応のチャンクサイズの単位は文字数にフォールバックせずエラーになることをテスト"""
+        service = create_service(chunk_size_unit="token")
+
+        with pytest.raises(ValueError, match="未対応のチャンクサイズの単位です: token"):
+            service._load_documents()
+
+        mock_corpus_loader.assert_not_called()
+
+    @patch("src.services.rag_service.get_tiktoken_counter")
+    def test_context_packed_to_token_budget(
+        self, mock_get_counter, word_counter, create_service
+    ):
+        """コンテキストが関連度順にトークン予算いっぱいまで詰められることをテスト"""
+        mock_get_counter.return_value = word_counter
+        service = create_service(max_context_tokens=10)
+        documents = [
+            Document(page_content="a b c d", metadata={}),
+            Document(page_content="e f g h i j", metadata={}),
+            Document(page_content="k l", metadata={}),
+        ]
+
+        context = service._build_context(documents)
+
+        mock_get_counter.assert_called_once_with("gpt-4o-mini")
+        # 1件目(見出し込み5トークン)の後、2件目は残り5トークンに切り詰められ、
+        # 3件目は含まれない
+        assert context == "【不明】\na b c d\n\n【不明】 e f g h"
+        assert word_counter.count(context) <= 10
+
+    @patch("src.services.rag_service.get_tiktoken_counter")
+    def test_context_budget_excludes_history(
+        self, mock_get_counter, word_counter, create_service
+    ):
+        """会話履歴のトークン数がコンテキストの予算から差し引かれることをテスト"""
+        mock_get_counter.return_value = word_counter
+        service = create_service(max_context_tokens=10)
+        documents = [Document(page_content=" ".join(["x"] * 20), metadata={})]
+
+        context = service._build_context(documents, history_text="USER: a b c")
+
+        assert word_counter.count(context) <= 10 - 4
+
+
 @pytest.mark.parametrize("max_results", [1, 2, 3, 5, 10])
 @patch("src.services.rag_service.EmbeddingService")
 @patch("src.services.rag_service.ChatOpenAI")
@@ -530,13 +1572,16 @@ def test_search_max_results_parameter(
         (Document(page_content=f"内容{i}", metadata={"section": f"セクション{i}"}), 0.8)
         for i in range(max_results)
     ]
-    mock_vector_store.similarity_search_with_score.return_value = test_documents
+    mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = (
+        test_documents
+    )
 
     result = service.search("テストクエリ", max_results=max_results)
 
-    # similarity_search_with_scoreが正しいk値で呼ばれることを確認
-    mock_vector_store.similarity_search_with_score.assert_called_once_with(
-        "テストクエリ", k=max_results
+    # クエリベクトルで検索が正しいk値で呼ばれることを確認
+    service.embedding_service.embed_query.assert_called_once_with("テストクエリ")
+    mock_vector_store.similarity_search_by_vector_with_relevance_scores.assert_called_once_with(
+        service.embedding_service.embed_query.return_value, k=max_results
     )
 
     # 結果の数が正しいことを確認
@@ -577,7 +1622,9 @@ def test_search_similarity_threshold_filtering(
         (Document(page_content="内容3", metadata={"section": "セクション3"}), 0.3),
         (Document(page_content="内容4", metadata={"section": "セクション4"}), 0.1),
     ]
-    mock_vector_store.similarity_search_with_score.return_value = test_documents
+    mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = (
+        test_documents
+    )
 
     result = service.search("テストクエリ")
 
@@ -84,8 +84,8 @@ class TestRAGServiceConversationHistory:
             )
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results, [0.1, 0.2])
 
             with patch.object(service, "generate_answer") as mock_generate:
                 mock_generate.return_value = "生成された回答"
@@ -129,8 +129,8 @@ class TestRAGServiceConversationHistory:
             )
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results, [0.1, 0.2])
 
             with patch.object(
                 service, "generate_answer_with_history"
@@ -178,8 +178,8 @@ class TestRAGServiceConversationHistory:
             )
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results, [0.1, 0.2])
 
             with patch.object(service, "generate_answer") as mock_generate:
                 mock_generate.return_value = "生成された回答"
@@ -213,7 +213,7 @@ class TestRAGServiceConversationHistory:
         ]
 
         # LLMChainのモック
-        with patch("src.services.rag_service.LLMChain") as mock_llm_chain:
+        with patch("src.services.prompt_registry.LLMChain") as mock_llm_chain:
             mock_chain_instance = Mock()
             mock_llm_chain.return_value = mock_chain_instance
             mock_chain_instance.run.return_value = "履歴を考慮した回答です。"
@@ -251,41 +251,26 @@ class TestRAGServiceConversationHistory:
             Document(page_content="関連情報", metadata={"section": "セクション"})
         ]
 
-        # システムプロンプトをキャプチャするための変数
-        captured_system_prompt = None
-
-        # ChatPromptTemplateのモック
-        with patch(
-            "src.services.rag_service.ChatPromptTemplate"
-        ) as mock_prompt_template:
-            # from_messagesをモック
-            def capture_messages(messages):
-                nonlocal captured_system_prompt
-                captured_system_prompt = messages[0][
-                    1
-                ]  # システムプロンプトをキャプチャ
-                return Mock()
-
-            mock_prompt_template.from_messages.side_effect = capture_messages
-
-            # LLMChainのモック
-            with patch("src.services.rag_service.LLMChain") as mock_llm_chain:
-                mock_chain_instance = Mock()
-                mock_llm_chain.return_value = mock_chain_instance
-                mock_chain_instance.run.return_value = "回答"
-
-                service.generate_answer_with_history(
-                    query, context_documents, conversation_history
-                )
+        # LLMChainのモック
+        with patch("src.services.prompt_registry.LLMChain") as mock_llm_chain:
+            mock_chain_instance = Mock()
+            mock_llm_chain.return_value = mock_chain_instance
+            mock_chain_instance.run.return_value = "回答"
+
+            service.generate_answer_with_history(
+                query, context_documents, conversation_history
+            )
 
-        # システムプロンプトが正しくキャプチャされたことを確認
-        assert captured_system_prompt is not None
+        # 会話履歴はシステムプロンプトの変数として渡される
+        captured_history = mock_chain_instance.run.call_args[1]["history"]
+        prompt = mock_llm_chain.call_args[1]["prompt"]
+        assert "{history}" in prompt.messages[0].prompt.template
 
         # 最新10件の履歴のみが含まれることを確認
         # 40件の履歴があるので、最後の10件は30-39のインデックス
-        assert "質問19" in captured_system_prompt  # 最新の質問
-        assert "質問15" in captured_system_prompt  # 10件前の質問
-        assert "質問14" not in captured_system_prompt  # 11件前の質問は含まれない
+        assert "質問19" in captured_history  # 最新の質問
+        assert "質問15" in captured_history  # 10件前の質問
+        assert "質問14" not in captured_history  # 11件前の質問は含まれない
 
     def test_chat_conversation_flow(self, mock_dependencies):
         """実際の会話フローをシミュレートしたテスト"""
@@ -309,8 +294,8 @@ class TestRAGServiceConversationHistory:
             )
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results, [0.1, 0.2])
 
             with patch.object(service, "generate_answer") as mock_generate:
                 mock_generate.return_value = "ゲームの基本ルールは..."
@@ -337,8 +322,8 @@ class TestRAGServiceConversationHistory:
             )
         ]
 
-        with patch.object(service, "search") as mock_search:
-            mock_search.return_value = test_search_results2
+        with patch.object(service, "_search_with_embedding") as mock_search:
+            mock_search.return_value = (test_search_results2, [0.1, 0.2])
 
             with patch.object(
                 service, "generate_answer_with_history"
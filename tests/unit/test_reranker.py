@@ -0,0 +1,70 @@
+import pytest
+from langchain.schema import Document
+
+from src.services.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """クエリとの共通文字数をスコアとするテスト用のクロスエンコーダー"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32):
+        self.calls.append(list(pairs))
+        return [float(len(set(query) & set(text))) for query, text in pairs]
+
+
+@pytest.fixture
+def reranker():
+    reranker = CrossEncoderReranker("test/reranker")
+    reranker._model = FakeCrossEncoder()
+    return reranker
+
+
+@pytest.fixture
+def results():
+    return [
+        (Document(id="a", page_content="ガチャの仕様"), 0.40),
+        (Document(id="b", page_content="ルミナ石の入手方法"), 0.45),
+        (Document(id="c", page_content="ルミナ石"), 0.50),
+    ]
+
+
+class TestCrossEncoderReranker:
+    """CrossEncoderReranker クラスのテスト"""
+
+    def test_rerank_orders_by_score(self, reranker, results):
+        """関連度スコアの高い順に上位k件が距離を保ったまま返ることをテスト"""
+        reranked = reranker.rerank("ルミナ石の入手方法は？", results, k=2)
+
+        assert [document.id for document, _ in reranked] == ["b", "c"]
+        assert reranked[0][1] == 0.45
+
+    def test_scores_are_cached(self, reranker, results):
+        """同じクエリ（表記ゆれを含む）ではキャッシュ済みの組を再採点しないことをテスト"""
+        reranker.rerank("ルミナ石", results[:2], k=2)
+
+        reranker.rerank("ルミナ石 ", results, k=2)
+
+        assert [len(call) for call in reranker._model.calls] == [2, 1]
+        assert reranker._model.calls[1][0][1] == "ルミナ石"
+        stats = reranker.stats()
+        assert stats["reranks"] == 2
+        assert stats["scored_pairs"] == 3
+        assert stats["score_cache"]["hits"] == 2
+
+    def test_documents_without_id(self, reranker):
+        """IDのないドキュメントは内容でキャッシュされることをテスト"""
+        documents = [Document(page_content="内容A"), Document(page_content="内容B")]
+
+        reranker.score("内容", documents)
+        reranker.score("内容", documents)
+
+        assert len(reranker._model.calls) == 1
+
+    def test_empty_results(self, reranker):
+        """候補がない場合はモデルを呼び出さないことをテスト"""
+        assert reranker.rerank("クエリ", [], k=3) == []
+        assert reranker._model.calls == []
+        assert reranker.stats()["average_latency_ms"] == 0.0
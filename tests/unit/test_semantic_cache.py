@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.services.semantic_cache import SemanticAnswerCache
+
+
+def _vector(angle):
+    """単位円上の角度（ラジアン）に対応する2次元ベクトル"""
+    return [float(np.cos(angle)), float(np.sin(angle))]
+
+
+class TestSemanticAnswerCache:
+    """SemanticAnswerCache クラスのテスト"""
+
+    def test_hit_within_distance(self):
+        """コサイン距離がしきい値以内の質問にヒットすることをテスト"""
+        cache = SemanticAnswerCache(max_size=8, max_distance=0.01)
+        cache.put(_vector(0.0), ["a", "b"], "v1", "回答")
+
+        # 1 - cos(0.1) ≈ 0.005
+        assert cache.get(_vector(0.1), ["b", "a"], "v1") == "回答"
+        # 1 - cos(0.2) ≈ 0.02
+        assert cache.get(_vector(0.2), ["a", "b"], "v1") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_requires_same_chunk_set(self):
+        """検索されたチャンクの集合が異なる場合はヒットしないことをテスト"""
+        cache = SemanticAnswerCache(max_size=8)
+        cache.put(_vector(0.0), ["a", "b"], "v1", "回答")
+
+        assert cache.get(_vector(0.0), ["a", "c"], "v1") is None
+        assert cache.get(_vector(0.0), ["a"], "v1") is None
+
+    def test_returns_nearest_entry(self):
+        """複数の候補から最も近い質問の値を返すことをテスト"""
+        cache = SemanticAnswerCache(max_size=8, max_distance=0.05)
+        cache.put(_vector(0.0), ["a"], "v1", "回答1")
+        cache.put(_vector(0.2), ["a"], "v1", "回答2")
+
+        assert cache.get(_vector(0.15), ["a"], "v1") == "回答2"
+
+    def test_lru_eviction(self):
+        """上限を超えると最も使われていないエントリが破棄されることをテスト"""
+        cache = SemanticAnswerCache(max_size=2, max_distance=0.001)
+        cache.put(_vector(0.0), ["a"], "v1", "回答1")
+        cache.put(_vector(1.0), ["a"], "v1", "回答2")
+        cache.get(_vector(0.0), ["a"], "v1")
+
+        cache.put(_vector(2.0), ["a"], "v1", "回答3")
+
+        assert cache.get(_vector(0.0), ["a"], "v1") == "回答1"
+        assert cache.get(_vector(1.0), ["a"], "v1") is None
+        assert len(cache) == 2
+
+    def test_ttl_expiration(self):
+        """有効期限を過ぎたエントリにはヒットしないことをテスト"""
+        cache = SemanticAnswerCache(max_size=8, ttl_seconds=10)
+        with patch("src.services.semantic_cache.time.monotonic", return_value=100.0):
+            cache.put(_vector(0.0), ["a"], "v1", "回答")
+
+        with patch("src.services.semantic_cache.time.monotonic", return_value=111.0):
+            assert cache.get(_vector(0.0), ["a"], "v1") is None
+        assert len(cache) == 0
+
+    def test_invalidated_on_index_version_change(self):
+        """インデックスのバージョンが変わるとすべて破棄されることをテスト"""
+        cache = SemanticAnswerCache(max_size=8)
+        cache.put(_vector(0.0), ["a"], "v1", "回答")
+
+        assert cache.get(_vector(0.0), ["a"], "v2") is None
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("max_size", [0, -1])
+    def test_disabled(self, max_size):
+        """件数0以下では登録されないことをテスト"""
+        cache = SemanticAnswerCache(max_size=max_size)
+        cache.put(_vector(0.0), ["a"], "v1", "回答")
+
+        assert cache.get(_vector(0.0), ["a"], "v1") is None
@@ -1,7 +1,9 @@
+import threading
+
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime
-from src.services.session_service import SessionService
+from src.services.session_service import AsyncSessionService, SessionService
 from src.models.database import DatabaseManager, Session, Message
 
 
@@ -257,3 +259,39 @@ class TestSessionService:
 
         # Assert
         assert result is None
+
+
+class TestAsyncSessionService:
+    """非同期セッションサービスのテスト"""
+
+    async def test_runs_sync_service_in_thread_pool(self):
+        """同期版の処理をイベントループ外のスレッドで実行することをテスト"""
+        session_service = Mock(spec=SessionService)
+        threads = []
+
+        def get_history(session_id, limit=None):
+            threads.append(threading.get_ident())
+            return [{"role": "user", "content": "質問"}]
+
+        session_service.get_conversation_history.side_effect = get_history
+        session_service.create_session.return_value = {"id": "session-id"}
+        session_service.add_message.return_value = {"id": "message-id"}
+        async_service = AsyncSessionService(session_service)
+
+        history = await async_service.get_conversation_history("session-id", limit=5)
+        created = await async_service.create_session("タイトル")
+        message = await async_service.add_message(
+            "session-id", "assistant", "回答", metadata={"confidence": 0.5}
+        )
+
+        assert history == [{"role": "user", "content": "質問"}]
+        assert threads and threads[0] != threading.get_ident()
+        assert created == {"id": "session-id"}
+        assert message == {"id": "message-id"}
+        session_service.create_session.assert_called_once_with("タイトル")
+        session_service.add_message.assert_called_once_with(
+            session_id="session-id",
+            role="assistant",
+            content="回答",
+            metadata={"confidence": 0.5},
+        )
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "条件を満たしませんでした"
+        time.sleep(0.001)
+
+
+class TestSingleFlight:
+    """SingleFlight クラスのテスト"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """実行中の同じキーの呼び出しが1回の実行結果を共有することをテスト"""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait(5)
+            return "結果"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(flight.do, "key", work) for _ in range(4)]
+            _wait_until(lambda: flight.coalesced == 3)
+            release.set()
+            results = [future.result(5) for future in futures]
+
+        assert results == ["結果"] * 4
+        assert len(calls) == 1
+        assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 3}
+
+    def test_different_keys_run_separately(self):
+        """キーが異なる呼び出しはそれぞれ実行されることをテスト"""
+        flight = SingleFlight()
+
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        assert flight.do("a", lambda: 3) == 3
+        assert flight.executions == 3
+
+    def test_error_is_shared(self):
+        """実行中の処理の例外が待っていた呼び出し元にも送出されることをテスト"""
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def work():
+            release.wait(5)
+            raise RuntimeError("上流のエラー")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(flight.do, "key", work) for _ in range(2)]
+            _wait_until(lambda: flight.coalesced == 1)
+            release.set()
+            for future in futures:
+                with pytest.raises(RuntimeError, match="上流のエラー"):
+                    future.result(5)
+
+        assert flight.do("key", lambda: "再実行") == "再実行"
+
+    async def test_ado_shares_one_execution(self):
+        """非同期版でも同時に待っている呼び出しが結果を共有することをテスト"""
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "結果"
+
+        results = await asyncio.gather(*(flight.ado("key", work) for _ in range(3)))
+
+        assert results == ["結果"] * 3
+        assert len(calls) == 1
+        assert flight.stats()["in_flight"] == 0
+
+    async def test_ado_caller_cancellation(self):
+        """呼び出し元の1つがキャンセルされても他の呼び出し元は結果を受け取ることをテスト"""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "結果"
+
+        first = asyncio.ensure_future(flight.ado("key", work))
+        second = asyncio.ensure_future(flight.ado("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "結果"
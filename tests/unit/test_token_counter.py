@@ -0,0 +1,158 @@
+import re
+import pytest
+from typing import List
+from unittest.mock import patch
+
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from tokenizers.processors import TemplateProcessing
+
+from src.services.token_counter import (
+    HuggingFaceTokenCounter,
+    TiktokenCounter,
+    TokenCounter,
+    get_embedding_token_counter,
+)
+
+
+class WordTokenCounter(TokenCounter):
+    """空白区切りの単語を1トークンとして数えるテスト用カウンター"""
+
+    def token_offsets(self, text: str) -> List[int]:
+        return [match.start() for match in re.finditer(r"\S+", text)]
+
+
+def _build_word_tokenizer() -> Tokenizer:
+    """ダウンロード不要な単語単位のトークナイザーを作成"""
+    vocab = {"[UNK]": 0, "<s>": 1, "</s>": 2}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.post_processor = TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 1), ("</s>", 2)]
+    )
+    return tokenizer
+
+
+class TestTokenCounter:
+    """TokenCounter 基底クラスのテスト"""
+
+    def test_base_class_is_abstract(self):
+        """token_offsetsを実装しない基底クラスはインスタンス化できないことをテスト"""
+        with pytest.raises(TypeError):
+            TokenCounter()
+
+    def test_count(self):
+        """トークン数の計測をテスト"""
+        counter = WordTokenCounter()
+        assert counter.count("a b  c") == 3
+        assert counter.count("") == 0
+
+    def test_split_short_text_is_unchanged(self):
+        """上限以下のテキストは分割されないことをテスト"""
+        counter = WordTokenCounter()
+        assert list(counter.split("a b c", max_tokens=3)) == ["a b c"]
+
+    def test_split_respects_max_tokens(self):
+        """分割後の各断片が上限以下になることをテスト"""
+        counter = WordTokenCounter()
+        text = " ".join(f"w{i}" for i in range(10))
+
+        pieces = list(counter.split(text, max_tokens=4))
+
+        assert all(counter.count(piece) <= 4 for piece in pieces)
+        assert "".join(pieces) == text
+
+    def test_split_with_overlap(self):
+        """オーバーラップ分のトークンが次の断片に引き継がれることをテスト"""
+        counter = WordTokenCounter()
+        text = " ".join(f"w{i}" for i in range(6))
+
+        pieces = [piece.split() for piece in counter.split(text, 4, 2)]
+
+        assert pieces == [["w0", "w1", "w2", "w3"], ["w2", "w3", "w4", "w5"]]
+
+    def test_split_invalid_max_tokens(self):
+        """max_tokensが0以下の場合にエラーとなることをテスト"""
+        with pytest.raises(ValueError):
+            list(WordTokenCounter().split("a b", max_tokens=0))
+
+    def test_truncate(self):
+        """先頭から上限トークン数に切り詰められることをテスト"""
+        counter = WordTokenCounter()
+        assert counter.truncate("a b c d", 2).split() == ["a", "b"]
+        assert counter.truncate("a b c d", 0) == ""
+
+
+class TestHuggingFaceTokenCounter:
+    """HuggingFaceTokenCounter のテスト"""
+
+    @patch("tokenizers.Tokenizer.from_pretrained")
+    def test_counts_without_special_tokens(self, mock_from_pretrained):
+        """特殊トークンを除いて数え、その数をreserved_tokensに保持することをテスト"""
+        mock_from_pretrained.return_value = _build_word_tokenizer()
+
+        counter = HuggingFaceTokenCounter("test/model")
+
+        mock_from_pretrained.assert_called_once_with("test/model")
+        assert counter.reserved_tokens == 2
+        assert counter.count("ゲーム 仕様 書") == 3
+        assert counter.token_offsets("ゲーム 仕様") == [0, 4]
+
+    @patch("tokenizers.Tokenizer.from_pretrained")
+    def test_count_is_not_truncated(self, mock_from_pretrained):
+        """モデルの最大長を超えるテキストも切り詰めずに数えることをテスト"""
+        tokenizer = _build_word_tokenizer()
+        tokenizer.enable_truncation(max_length=4)
+        mock_from_pretrained.return_value = tokenizer
+
+        counter = HuggingFaceTokenCounter("test/model")
+
+        assert counter.count(" ".join(["単語"] * 10)) == 10
+
+
+class TestGetEmbeddingTokenCounter:
+    """get_embedding_token_counter のテスト"""
+
+    def setup_method(self):
+        get_embedding_token_counter.cache_clear()
+
+    def teardown_method(self):
+        get_embedding_token_counter.cache_clear()
+
+    @patch("src.services.token_counter.HuggingFaceTokenCounter")
+    def test_is_cached(self, mock_counter_class):
+        """同じモデルのトークナイザーは一度だけ読み込まれることをテスト"""
+        first = get_embedding_token_counter("test/model")
+        second = get_embedding_token_counter("test/model")
+
+        assert first is second
+        mock_counter_class.assert_called_once_with("test/model")
+
+    @patch("src.services.token_counter.get_tiktoken_counter")
+    @patch("src.services.token_counter.HuggingFaceTokenCounter")
+    def test_falls_back_to_tiktoken(self, mock_counter_class, mock_get_tiktoken):
+        """トークナイザーを読み込めない場合はtiktokenで代用することをテスト"""
+        mock_counter_class.side_effect = OSError("not found")
+
+        result = get_embedding_token_counter("test/model")
+
+        mock_get_tiktoken.assert_called_once_with("test/model")
+        assert result is mock_get_tiktoken.return_value
+
+
+class TestTiktokenCounter:
+    """TiktokenCounter のテスト"""
+
+    @patch("tiktoken.get_encoding")
+    @patch("tiktoken.encoding_for_model")
+    def test_unknown_model_uses_default_encoding(
+        self, mock_encoding_for_model, mock_get_encoding
+    ):
+        """未知のモデル名では既定のエンコーディングを使用することをテスト"""
+        mock_encoding_for_model.side_effect = KeyError("unknown")
+
+        counter = TiktokenCounter("unknown-model")
+
+        mock_get_encoding.assert_called_once_with("o200k_base")
+        assert counter.encoding is mock_get_encoding.return_value